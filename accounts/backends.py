@@ -0,0 +1,10 @@
+from django.contrib.auth.backends import ModelBackend
+from .cache import get_user_snapshot
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads the session's user from the cached snapshot"""
+
+    def get_user(self, user_id):
+        user = get_user_snapshot(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,73 @@
+"""
+Cached snapshot of the authenticated user.
+
+AuthenticationMiddleware loads request.user by primary key on every
+request. CachedModelBackend (accounts.backends) serves it from a slim
+snapshot in the `sessions` cache instead: just the fields the session check,
+permission flags and templates use. Any other field is deferred and loaded
+from the database on first access. accounts.signals writes the snapshot
+through whenever the user is saved (login stamps last_login, profile and
+password changes) and drops it when the user is deleted.
+
+The cache has to be shared by every worker process: a snapshot or session
+that only one process rewrites or drops stays valid in the others' memory.
+check_shared_cache() refuses a LocMem cache at startup.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from .models import User
+
+# In model field order, which from_db() expects
+SNAPSHOT_FIELDS = ('id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name',
+                   'email', 'is_staff', 'is_active', 'date_joined', 'user_type')
+USER_TIMEOUT = 15 * 60
+CACHED_SESSION_ENGINES = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+
+def _cache():
+    return caches['sessions']
+
+
+def check_shared_cache():
+    """Raise ImproperlyConfigured if cached sessions or user snapshots would live in per-process memory"""
+    aliases = set()
+    if 'accounts.backends.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS:
+        aliases.add('sessions')
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        aliases.add(settings.SESSION_CACHE_ALIAS)
+    for alias in sorted(aliases):
+        if isinstance(caches[alias], LocMemCache):
+            raise ImproperlyConfigured(
+                f"The '{alias}' cache holds sessions or user snapshots and must be shared between worker "
+                f"processes; set SESSION_CACHE_DIR or configure a shared cache backend"
+            )
+
+
+def _user_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def get_user_snapshot(user_id):
+    """The user with SNAPSHOT_FIELDS loaded, or None if there is no such user"""
+    values = _cache().get(_user_key(user_id))
+    if values is None:
+        user = User.objects.only(*SNAPSHOT_FIELDS).filter(pk=user_id).first()
+        if user is not None:
+            cache_user(user)
+        return user
+    return User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, values)
+
+
+def cache_user(user):
+    if user.get_deferred_fields() & set(SNAPSHOT_FIELDS):
+        # Loading the missing fields here would cost the query the snapshot saves
+        invalidate_user(user.pk)
+        return
+    _cache().set(_user_key(user.pk), [getattr(user, field) for field in SNAPSHOT_FIELDS], USER_TIMEOUT)
+
+
+def invalidate_user(user_id):
+    _cache().delete(_user_key(user_id))
@@ -14,6 +14,12 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Student management listing pages on (date_joined, id)
+            models.Index(fields=['user_type', '-date_joined', '-id'], name='user_type_joined_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.username} ({self.user_type})"
     
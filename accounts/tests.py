@@ -1,3 +1,85 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from analytics.services import refresh_snapshot
+from lms_platform.query_budget import QueryBudgetTestMixin
+from .cache import check_shared_cache, get_user_snapshot
+from .models import User
+from . import urls
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        # Budgets cover the steady state, not the one-off snapshot build
+        refresh_snapshot()
+
+    def test_every_url_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            self.assertIn(pattern.name, settings.QUERY_BUDGETS)
+
+    def test_anonymous_views(self):
+        self.assertWithinBudget('admin_login', 'get', '/accounts/admin-login/')
+        self.assertWithinBudget('user_login', 'get', '/accounts/login/')
+        self.assertWithinBudget('user_register', 'get', '/accounts/register/')
+
+    def test_admin_views(self):
+        self.client.force_login(self.admin)
+        self.assertWithinBudget('admin_dashboard', 'get', '/accounts/admin-dashboard/')
+        self.assertWithinBudget('user_logout', 'get', '/accounts/logout/')
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        caches['sessions'].clear()
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        refresh_snapshot()
+
+    def auth_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, [q['sql'] for q in queries if 'django_session' in q['sql'] or 'accounts_user' in q['sql']]
+
+    def test_session_and_user_come_from_the_cache(self):
+        self.client.force_login(self.admin)
+        response, queries = self.auth_queries('/accounts/admin-dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+        # A cold cache falls back to the database once, then is warm again
+        caches['sessions'].clear()
+        self.client.force_login(self.admin)
+        caches['sessions'].clear()
+        self.assertEqual(len(self.auth_queries('/accounts/admin-dashboard/')[1]), 2)
+        self.assertEqual(self.auth_queries('/accounts/admin-dashboard/')[1], [])
+
+    def test_profile_changes_are_written_through(self):
+        self.admin.first_name = 'Ada'
+        self.admin.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_snapshot(self.admin.pk).first_name, 'Ada')
+
+    def test_password_change_and_logout_end_the_session(self):
+        self.client.force_login(self.admin)
+        self.admin.set_password('y')
+        self.admin.save()
+        self.assertEqual(self.client.get('/accounts/admin-dashboard/').status_code, 302)
+
+        self.client.force_login(self.admin)
+        self.client.get('/accounts/logout/')
+        self.assertEqual(self.client.get('/accounts/admin-dashboard/').status_code, 302)
+
+    def test_per_process_cache_is_refused(self):
+        check_shared_cache()
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES={**settings.CACHES, 'sessions': local}):
+            with self.assertRaises(ImproperlyConfigured):
+                check_shared_cache()
+            with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db',
+                                   AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend']):
+                check_shared_cache()
@@ -7,6 +7,8 @@ from .forms import AdminLoginForm, UserLoginForm, UserRegistrationForm
 from .models import User
 from courses.models import Course, Enrollment
 from payments.models import Payment
+from analytics.services import get_snapshot
+from lms_platform.routers import use_replica
 import csv
 from django.http import HttpResponse
 from datetime import datetime, timedelta
@@ -38,27 +40,23 @@ def admin_login(request):
 
 # Admin Dashboard View
 @login_required
+@use_replica
 def admin_dashboard(request):
     if not request.user.is_admin_user:
         messages.error(request, 'Access denied. Admin only.')
         return redirect('user_dashboard')
     
-    # Get statistics
-    total_courses = Course.objects.count()
-    total_users = User.objects.filter(user_type='student').count()
-    total_enrollments = Enrollment.objects.count()
-    total_revenue = Payment.objects.filter(payment_status='completed').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    # Get statistics from the precomputed snapshot
+    snapshot = get_snapshot()
     
     # Get recent courses
     recent_courses = Course.objects.all()[:5]
     
     context = {
-        'total_courses': total_courses,
-        'total_users': total_users,
-        'total_enrollments': total_enrollments,
-        'total_revenue': total_revenue,
+        'total_courses': snapshot.total_courses,
+        'total_users': snapshot.total_students,
+        'total_enrollments': snapshot.total_enrollments,
+        'total_revenue': snapshot.total_revenue,
         'recent_courses': recent_courses,
     }
     
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import AnalyticsSnapshot, DailyRollup
+
+@admin.register(AnalyticsSnapshot)
+class AnalyticsSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('total_courses', 'total_students', 'total_enrollments', 'total_revenue', 'updated_at', 'refreshed_at')
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'course', 'new_enrollments', 'completions', 'revenue', 'refunds')
+    list_filter = ('date',)
+    search_fields = ('course__title',)
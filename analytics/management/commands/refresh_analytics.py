@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from analytics import services
+
+
+class Command(BaseCommand):
+    help = 'Recompute the analytics snapshot and daily rollups from the raw tables (run from cron)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only rebuild rollups for the last N days (default: all history)')
+        parser.add_argument('--since', type=date.fromisoformat, default=None,
+                            help='Backfill rollups from this date (YYYY-MM-DD) onwards')
+        parser.add_argument('--until', type=date.fromisoformat, default=None,
+                            help='Backfill rollups up to this date (YYYY-MM-DD)')
+        parser.add_argument('--snapshot-only', action='store_true')
+    
+    def handle(self, *args, **options):
+        snapshot = services.refresh_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot refreshed: {snapshot.total_courses} courses, {snapshot.total_students} students, '
+            f'{snapshot.total_enrollments} enrollments, revenue {snapshot.total_revenue}'
+        ))
+        if options['snapshot_only']:
+            return
+        
+        start_date = options['since']
+        if options['days'] is not None:
+            start_date = timezone.localdate() - timedelta(days=options['days'])
+        rows = services.rebuild_rollups(start_date, options['until'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily rollup row(s)'))
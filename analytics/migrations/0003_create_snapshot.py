@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+SNAPSHOT_ID = 1
+
+
+def create_snapshot(apps, schema_editor):
+    # Created here so the signal receivers only ever apply deltas to an existing row
+    AnalyticsSnapshot = apps.get_model('analytics', 'AnalyticsSnapshot')
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Payment = apps.get_model('payments', 'Payment')
+    User = apps.get_model('accounts', 'User')
+    enrollment_totals = Enrollment.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+    AnalyticsSnapshot.objects.update_or_create(
+        pk=SNAPSHOT_ID,
+        defaults={
+            'total_courses': Course.objects.count(),
+            'total_students': User.objects.filter(user_type='student').count(),
+            'total_enrollments': enrollment_totals['total'],
+            'active_enrollments': enrollment_totals['active'],
+            'total_revenue': Payment.objects.filter(payment_status='completed').aggregate(
+                total=Sum('amount')
+            )['total'] or 0,
+            'refreshed_at': timezone.now(),
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_rollup_completions_refunds'),
+        ('accounts', '0002_query_indexes'),
+        ('courses', '0010_transcode_heartbeat'),
+        ('payments', '0004_event_lease_and_sweep_backoff'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_snapshot, migrations.RunPython.noop),
+    ]
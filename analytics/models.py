@@ -0,0 +1,35 @@
+from django.db import models
+from courses.models import Course
+
+
+class AnalyticsSnapshot(models.Model):
+    """Single-row summary of platform-wide metrics read by the admin dashboards"""
+    SNAPSHOT_ID = 1
+    
+    total_courses = models.PositiveIntegerField(default=0)
+    total_students = models.PositiveIntegerField(default=0)
+    total_enrollments = models.PositiveIntegerField(default=0)
+    active_enrollments = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField(blank=True, null=True, help_text="Last full recomputation")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Analytics snapshot ({self.updated_at:%Y-%m-%d %H:%M})"
+
+
+class DailyRollup(models.Model):
+    """Per-day, per-course counters maintained from enrollment and payment events"""
+    date = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_rollups')
+    new_enrollments = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ('date', 'course')
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.date} - {self.course_id}"
@@ -0,0 +1,155 @@
+"""
+Maintenance and read helpers for the analytics summary tables.
+
+Event handlers in analytics.signals apply small F-expression deltas; the
+refresh_analytics management command recomputes everything from the raw
+tables to correct any drift.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+from accounts.models import User
+from courses.models import Course, Enrollment
+from payments.models import Payment
+from .models import AnalyticsSnapshot, DailyRollup
+
+
+def refresh_snapshot():
+    """Recompute the snapshot row from the raw tables"""
+    enrollment_totals = Enrollment.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+    snapshot, _ = AnalyticsSnapshot.objects.update_or_create(
+        pk=AnalyticsSnapshot.SNAPSHOT_ID,
+        defaults={
+            'total_courses': Course.objects.count(),
+            'total_students': User.objects.filter(user_type='student').count(),
+            'total_enrollments': enrollment_totals['total'],
+            'active_enrollments': enrollment_totals['active'],
+            'total_revenue': Payment.objects.filter(payment_status='completed').aggregate(
+                total=Sum('amount')
+            )['total'] or 0,
+            'refreshed_at': timezone.now(),
+        },
+    )
+    return snapshot
+
+
+def get_snapshot():
+    snapshot = AnalyticsSnapshot.objects.filter(pk=AnalyticsSnapshot.SNAPSHOT_ID).first()
+    return snapshot or refresh_snapshot()
+
+
+def _delta_expressions(deltas):
+    # Clamp decrements at zero so a drifted counter never violates the unsigned column
+    return {field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+
+
+def bump_snapshot(**deltas):
+    """
+    Apply counter deltas to the snapshot row (created by migration
+    analytics.0003). If the row is missing, get_snapshot() builds it from the
+    raw tables on the next read, which already includes this change, so
+    event handlers never pay for that full recompute themselves.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    AnalyticsSnapshot.objects.filter(pk=AnalyticsSnapshot.SNAPSHOT_ID).update(
+        updated_at=timezone.now(), **_delta_expressions(deltas)
+    )
+
+
+def bump_rollup(date, course_id, **deltas):
+    """Add deltas to the (date, course) rollup row, inserting it if needed"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    expressions = _delta_expressions(deltas)
+    if DailyRollup.objects.filter(date=date, course_id=course_id).update(**expressions):
+        return
+    if all(delta < 0 for delta in deltas.values()):
+        # Nothing was counted on that day to take it back from
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(date=date, course_id=course_id, **deltas)
+    except IntegrityError:
+        # A concurrent event created the row first
+        DailyRollup.objects.filter(date=date, course_id=course_id).update(**expressions)
+
+
+def rebuild_rollups(start_date=None, end_date=None):
+    """Recompute daily rollups from the raw tables, optionally for a date range only"""
+    sources = [
+        ('new_enrollments', Enrollment.objects.all(), 'enrolled_at', Count('id')),
+        ('completions', Enrollment.objects.filter(completed_at__isnull=False), 'completed_at', Count('id')),
+        ('revenue', Payment.objects.filter(payment_status='completed'), 'transaction_date', Sum('amount')),
+        ('refunds', Payment.objects.filter(payment_status='refunded'), 'updated_at', Sum('amount')),
+    ]
+    rollups = DailyRollup.objects.all()
+    if start_date:
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date:
+        rollups = rollups.filter(date__lte=end_date)
+    
+    rows = {}
+    for field, queryset, date_field, aggregate in sources:
+        queryset = queryset.annotate(day=TruncDate(date_field))
+        if start_date:
+            queryset = queryset.filter(day__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(day__lte=end_date)
+        for row in queryset.values('day', 'course_id').annotate(value=aggregate).order_by():
+            rows.setdefault((row['day'], row['course_id']), {})[field] = row['value']
+    
+    with transaction.atomic():
+        rollups.delete()
+        DailyRollup.objects.bulk_create(
+            [DailyRollup(date=day, course_id=course_id, **values) for (day, course_id), values in rows.items()],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def revenue_since(start_date):
+    return DailyRollup.objects.filter(date__gte=start_date).aggregate(
+        total=Sum('revenue')
+    )['total'] or Decimal('0')
+
+
+SERIES_FIELDS = ('new_enrollments', 'completions', 'revenue', 'refunds')
+
+
+def daily_series(start_date, end_date, course_id=None):
+    """
+    Per-day totals between start_date and end_date (inclusive), zero-filled.
+    
+    Reads at most one rollup row per course per day, so the cost depends on
+    the window length rather than on the number of raw enrollments or payments.
+    """
+    rollups = DailyRollup.objects.filter(date__gte=start_date, date__lte=end_date)
+    if course_id:
+        rollups = rollups.filter(course_id=course_id)
+    totals = {
+        row['date']: row
+        for row in rollups.values('date').annotate(
+            **{field: Sum(field) for field in SERIES_FIELDS}
+        ).order_by()
+    }
+    
+    series = {'dates': []}
+    series.update({field: [] for field in SERIES_FIELDS})
+    day = start_date
+    while day <= end_date:
+        row = totals.get(day, {})
+        series['dates'].append(day.isoformat())
+        for field in SERIES_FIELDS:
+            value = row.get(field) or 0
+            series[field].append(float(value) if isinstance(value, Decimal) else value)
+        day += timedelta(days=1)
+    return series
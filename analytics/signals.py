@@ -0,0 +1,94 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from accounts.models import User
+from courses.models import Course, Enrollment
+from courses.services import enrollment_completed
+from payments.models import Payment
+from . import services
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        services.bump_snapshot(total_courses=1)
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    services.bump_snapshot(total_courses=-1)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_type == 'student':
+        services.bump_snapshot(total_students=1)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    if instance.user_type == 'student':
+        services.bump_snapshot(total_students=-1)
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        services.bump_snapshot(total_enrollments=1, active_enrollments=1 if instance.is_active else 0)
+        services.bump_rollup(timezone.localdate(instance.enrolled_at), instance.course_id, new_enrollments=1)
+        return
+    
+    if getattr(instance, '_is_active_changed', False):
+        services.bump_snapshot(active_enrollments=1 if instance.is_active else -1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    was_active = getattr(instance, '_loaded_is_active', instance.is_active)
+    services.bump_snapshot(total_enrollments=-1, active_enrollments=-1 if was_active else 0)
+    # Take it back out of the days it was counted on, as rebuild_rollups would
+    services.bump_rollup(timezone.localdate(instance.enrolled_at), instance.course_id, new_enrollments=-1)
+    if instance.completed_at:
+        services.bump_rollup(timezone.localdate(instance.completed_at), instance.course_id, completions=-1)
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_payment_status', None)
+    if previous == instance.payment_status:
+        return
+    
+    # Revenue counts completed payments only, bucketed by transaction date
+    if instance.payment_status == 'completed':
+        delta = instance.amount
+    elif previous == 'completed':
+        delta = -instance.amount
+    else:
+        delta = 0
+    if delta:
+        services.bump_snapshot(total_revenue=delta)
+        services.bump_rollup(timezone.localdate(instance.transaction_date), instance.course_id, revenue=delta)
+    
+    # Refunds are bucketed by the day the refund was recorded, whatever the payment moved from
+    if instance.payment_status == 'refunded':
+        services.bump_rollup(timezone.localdate(instance.updated_at), instance.course_id, refunds=instance.amount)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    status = getattr(instance, '_loaded_payment_status', None) or instance.payment_status
+    if status == 'completed':
+        services.bump_snapshot(total_revenue=-instance.amount)
+        services.bump_rollup(timezone.localdate(instance.transaction_date), instance.course_id,
+                             revenue=-instance.amount)
+    elif status == 'refunded':
+        services.bump_rollup(timezone.localdate(instance.updated_at), instance.course_id, refunds=-instance.amount)
+
+
+@receiver(enrollment_completed)
+def enrollment_completed_handler(sender, enrollment, completed_at, **kwargs):
+    services.bump_rollup(timezone.localdate(completed_at), enrollment.course_id, completions=1)
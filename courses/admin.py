@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Module, Enrollment, ModuleProgress
+from .models import Course, Module, Enrollment, ModuleProgress, VideoTranscode, ChunkedUpload
 
 class ModuleInline(admin.TabularInline):
     model = Module
@@ -7,9 +7,10 @@ class ModuleInline(admin.TabularInline):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ('title', 'course_type', 'price', 'created_by', 'is_active', 'created_at')
+    list_display = ('title', 'course_type', 'price', 'created_by', 'is_active', 'enrollment_count', 'created_at')
     list_filter = ('course_type', 'is_active', 'created_at')
     search_fields = ('title', 'description')
+    readonly_fields = ('enrollment_count', 'active_enrollment_count')
     inlines = [ModuleInline]
 
 @admin.register(Module)
@@ -28,3 +29,15 @@ class EnrollmentAdmin(admin.ModelAdmin):
 class ModuleProgressAdmin(admin.ModelAdmin):
     list_display = ('enrollment', 'module', 'is_completed', 'completed_at')
     list_filter = ('is_completed',)
+
+@admin.register(VideoTranscode)
+class VideoTranscodeAdmin(admin.ModelAdmin):
+    list_display = ('source_name', 'module', 'course', 'status', 'progress', 'attempts', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('output_dir', 'renditions', 'duration_seconds', 'last_error', 'locked_by')
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'kind', 'user', 'offset', 'size', 'status', 'updated_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('offset', 'sha256')
@@ -1,27 +1,49 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from courses.models import Course, Module, Enrollment
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from courses.models import Course, Module, Enrollment, VideoTranscode
 from courses.forms import CourseForm, ModuleForm
+from courses.pagination import paginate_keyset
+from courses.uploads import UploadError
+from courses.views import course_to_dict
 from accounts.models import User
 from payments.models import Payment
-from django.db.models import Count, Sum, Q
+from django.db.models import Count
+from django.utils import timezone
+from analytics.services import get_snapshot, revenue_since, daily_series
+from lms_platform.routers import use_replica
 import csv
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+
+def save_form(form):
+    """Save a valid course/module form; an upload another request attached first becomes a form error"""
+    try:
+        return form.save()
+    except UploadError as e:
+        form.add_error(None, str(e))
+        return None
 
 @login_required
+@use_replica
 def admin_course_list(request):
     if not request.user.is_admin_user:
         messages.error(request, 'Access denied. Admin only.')
         return redirect('user_dashboard')
     
-    courses = Course.objects.all().annotate(
-        enrollment_count=Count('enrollments')
-    ).order_by('-created_at')
+    page = paginate_keyset(request, Course.objects.all())
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [course_to_dict(course) for course in page],
+            'next_cursor': page.next_cursor,
+            'has_next': page.has_next,
+        })
     
     context = {
-        'courses': courses
+        'courses': page,
+        'page': page,
     }
     
     return render(request, 'courses/admin_course_list.html', context)
@@ -33,15 +55,14 @@ def admin_course_create(request):
         return redirect('user_dashboard')
     
     if request.method == 'POST':
-        form = CourseForm(request.POST, request.FILES)
+        form = CourseForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
-            course = form.save(commit=False)
-            course.created_by = request.user
-            course.save()
-            messages.success(request, 'Course created successfully!')
-            return redirect('admin_course_edit', course_id=course.id)
-        else:
-            messages.error(request, 'Please correct the errors below.')
+            form.instance.created_by = request.user
+            course = save_form(form)
+            if course:
+                messages.success(request, 'Course created successfully!')
+                return redirect('admin_course_edit', course_id=course.id)
+        messages.error(request, 'Please correct the errors below.')
     else:
         form = CourseForm()
     
@@ -62,13 +83,11 @@ def admin_course_edit(request, course_id):
     modules = course.modules.all()
     
     if request.method == 'POST':
-        form = CourseForm(request.POST, request.FILES, instance=course)
-        if form.is_valid():
-            form.save()
+        form = CourseForm(request.POST, request.FILES, instance=course, user=request.user)
+        if form.is_valid() and save_form(form):
             messages.success(request, 'Course updated successfully!')
             return redirect('admin_course_edit', course_id=course.id)
-        else:
-            messages.error(request, 'Please correct the errors below.')
+        messages.error(request, 'Please correct the errors below.')
     else:
         form = CourseForm(instance=course)
     
@@ -103,15 +122,13 @@ def admin_module_create(request, course_id):
     course = get_object_or_404(Course, id=course_id)
     
     if request.method == 'POST':
-        form = ModuleForm(request.POST, request.FILES)
+        form = ModuleForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
-            module = form.save(commit=False)
-            module.course = course
-            module.save()
-            messages.success(request, 'Module added successfully!')
-            return redirect('admin_course_edit', course_id=course.id)
-        else:
-            messages.error(request, 'Please correct the errors below.')
+            form.instance.course = course
+            if save_form(form):
+                messages.success(request, 'Module added successfully!')
+                return redirect('admin_course_edit', course_id=course.id)
+        messages.error(request, 'Please correct the errors below.')
     else:
         # Set default order to last
         next_order = course.modules.count() + 1
@@ -134,13 +151,11 @@ def admin_module_edit(request, module_id):
     module = get_object_or_404(Module, id=module_id)
     
     if request.method == 'POST':
-        form = ModuleForm(request.POST, request.FILES, instance=module)
-        if form.is_valid():
-            form.save()
+        form = ModuleForm(request.POST, request.FILES, instance=module, user=request.user)
+        if form.is_valid() and save_form(form):
             messages.success(request, 'Module updated successfully!')
             return redirect('admin_course_edit', course_id=module.course.id)
-        else:
-            messages.error(request, 'Please correct the errors below.')
+        messages.error(request, 'Please correct the errors below.')
     else:
         form = ModuleForm(instance=module)
     
@@ -148,11 +163,31 @@ def admin_module_edit(request, module_id):
         'form': form,
         'module': module,
         'course': module.course,
-        'is_edit': True
+        'is_edit': True,
+        'transcode': VideoTranscode.objects.filter(module=module).first(),
     }
     
     return render(request, 'courses/admin_module_form.html', context)
 
+def _transcode_to_dict(transcode):
+    return {
+        'status': transcode.status,
+        'status_display': transcode.get_status_display(),
+        'progress': transcode.progress,
+        'renditions': transcode.renditions,
+        'duration_seconds': transcode.duration_seconds,
+        'error': transcode.last_error if transcode.status == 'failed' else '',
+    }
+
+# Polled by the module form while a video is being transcoded
+@login_required
+def admin_module_transcode_status(request, module_id):
+    if not request.user.is_admin_user:
+        return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
+    
+    transcode = get_object_or_404(VideoTranscode, module_id=module_id)
+    return JsonResponse(_transcode_to_dict(transcode))
+
 @login_required
 def admin_module_delete(request, module_id):
     if not request.user.is_admin_user:
@@ -171,124 +206,216 @@ def admin_module_delete(request, module_id):
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
 
+ANALYTICS_MAX_DAYS = 366
+
+
+def _analytics_days(request, default=30):
+    """The `days` window from the query string clamped to 1..ANALYTICS_MAX_DAYS, or None if it is not a number"""
+    try:
+        days = int(request.GET.get('days', default))
+    except ValueError:
+        return None
+    return max(1, min(days, ANALYTICS_MAX_DAYS))
+
 @login_required
+@use_replica
 def admin_analytics(request):
     if not request.user.is_admin_user:
         messages.error(request, 'Access denied. Admin only.')
         return redirect('user_dashboard')
     
-    # Get date range from request or default to last 30 days
-    days = int(request.GET.get('days', 30))
-    start_date = datetime.now() - timedelta(days=days)
+    # Students for management, one keyset page at a time
+    users = paginate_keyset(
+        request,
+        User.objects.filter(user_type='student').annotate(enrollment_count=Count('enrollments')),
+        field='date_joined',
+        cursor_param='users_cursor',
+    )
     
-    # Statistics
-    total_courses = Course.objects.count()
-    total_users = User.objects.filter(user_type='student').count()
-    total_enrollments = Enrollment.objects.count()
-    active_enrollments = Enrollment.objects.filter(is_active=True).count()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [{
+                'id': user_obj.id,
+                'username': user_obj.username,
+                'email': user_obj.email,
+                'enrollment_count': user_obj.enrollment_count,
+                'date_joined': user_obj.date_joined.isoformat(),
+                'is_active': user_obj.is_active,
+            } for user_obj in users],
+            'next_cursor': users.next_cursor,
+            'has_next': users.has_next,
+        })
     
-    total_revenue = Payment.objects.filter(
-        payment_status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Get date range from request or default to last 30 days
+    days = _analytics_days(request) or 30
+    start_date = timezone.localdate() - timedelta(days=days)
     
-    recent_revenue = Payment.objects.filter(
-        payment_status='completed',
-        transaction_date__gte=start_date
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Platform totals come from the precomputed snapshot; the window from daily rollups
+    snapshot = get_snapshot()
+    recent_revenue = revenue_since(start_date)
+    timeseries = daily_series(start_date, timezone.localdate())
     
     # Top courses by enrollment
-    top_courses = Course.objects.annotate(
-        enrollment_count=Count('enrollments')
-    ).order_by('-enrollment_count')[:5]
+    top_courses = Course.objects.order_by('-enrollment_count')[:5]
     
     # Recent enrollments
     recent_enrollments = Enrollment.objects.select_related(
         'user', 'course'
     ).order_by('-enrolled_at')[:10]
     
-    # All users for management
-    users = User.objects.filter(user_type='student').annotate(
-        enrollment_count=Count('enrollments')
-    ).order_by('-date_joined')
-    
     # Recent payments
     recent_payments = Payment.objects.select_related(
         'user', 'course'
     ).order_by('-transaction_date')[:10]
     
     context = {
-        'total_courses': total_courses,
-        'total_users': total_users,
-        'total_enrollments': total_enrollments,
-        'active_enrollments': active_enrollments,
-        'total_revenue': total_revenue,
+        'total_courses': snapshot.total_courses,
+        'total_users': snapshot.total_students,
+        'total_enrollments': snapshot.total_enrollments,
+        'active_enrollments': snapshot.active_enrollments,
+        'total_revenue': snapshot.total_revenue,
         'recent_revenue': recent_revenue,
         'top_courses': top_courses,
         'recent_enrollments': recent_enrollments,
         'users': users,
         'recent_payments': recent_payments,
         'days': days,
+        'timeseries': timeseries,
+        'window_choices': [7, 30, 365],
     }
     
     return render(request, 'courses/admin_analytics.html', context)
 
 @login_required
+@use_replica
+def admin_analytics_timeseries(request):
+    """JSON daily series (enrollments, completions, revenue, refunds) for the analytics charts"""
+    if not request.user.is_admin_user:
+        return JsonResponse({'success': False, 'message': 'Access denied'})
+    
+    days = _analytics_days(request)
+    course = request.GET.get('course', '')
+    if days is None or (course and not course.isdigit()):
+        return JsonResponse({'success': False, 'message': 'Invalid parameters'})
+    course_id = int(course) if course else None
+    
+    end_date = timezone.localdate()
+    series = daily_series(end_date - timedelta(days=days), end_date, course_id=course_id)
+    return JsonResponse({'success': True, 'days': days, **series})
+
+class Echo:
+    """Pseudo-buffer whose write() returns the value instead of storing it"""
+    def write(self, value):
+        return value
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_SECTIONS = {
+    'courses': {
+        'title': 'COURSES',
+        'header': ['ID', 'Title', 'Type', 'Price', 'Enrollments', 'Created By', 'Created At'],
+        'date_field': 'created_at',
+    },
+    'enrollments': {
+        'title': 'ENROLLMENTS',
+        'header': ['ID', 'User', 'Course', 'Enrolled At', 'Progress', 'Status'],
+        'date_field': 'enrolled_at',
+    },
+    'payments': {
+        'title': 'PAYMENTS',
+        'header': ['ID', 'User', 'Course', 'Amount', 'Status', 'Transaction Date'],
+        'date_field': 'transaction_date',
+    },
+}
+
+
+def _export_queryset(section, start_date=None, end_date=None):
+    """values_list queryset for one export section, filtered to the date range"""
+    if section == 'courses':
+        queryset = Course.objects.values_list(
+            'id', 'title', 'course_type', 'price', 'enrollment_count',
+            'created_by__username', 'created_at'
+        )
+    elif section == 'enrollments':
+        queryset = Enrollment.objects.values_list(
+            'id', 'user__username', 'course__title', 'enrolled_at', 'progress', 'is_active'
+        )
+    else:
+        queryset = Payment.objects.values_list(
+            'id', 'user__username', 'course__title', 'amount', 'payment_status', 'transaction_date'
+        )
+    
+    # Compare against datetime bounds (not __date) so the date column index is usable
+    date_field = EXPORT_SECTIONS[section]['date_field']
+    if start_date:
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        queryset = queryset.filter(**{f'{date_field}__gte': start})
+    if end_date and end_date < date.max:
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        queryset = queryset.filter(**{f'{date_field}__lt': end})
+    return queryset.order_by(date_field, 'id')
+
+
+def _export_rows(section, start_date=None, end_date=None):
+    """Yield CSV rows for one export section, reading the table in bounded chunks"""
+    queryset = _export_queryset(section, start_date, end_date)
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        if section == 'courses':
+            yield [*row[:6], row[6].strftime('%Y-%m-%d %H:%M')]
+        elif section == 'enrollments':
+            yield [
+                row[0], row[1], row[2],
+                row[3].strftime('%Y-%m-%d %H:%M'),
+                f"{row[4]}%",
+                'Active' if row[5] else 'Inactive'
+            ]
+        else:
+            yield [*row[:5], row[5].strftime('%Y-%m-%d %H:%M')]
+
+
+def _export_csv_lines(writer, sections, start_date=None, end_date=None):
+    for index, section in enumerate(sections):
+        if index:
+            yield writer.writerow([])
+        yield writer.writerow([EXPORT_SECTIONS[section]['title']])
+        yield writer.writerow(EXPORT_SECTIONS[section]['header'])
+        for row in _export_rows(section, start_date, end_date):
+            yield writer.writerow(row)
+
+
+@login_required
+@use_replica
 def export_data_csv(request):
     if not request.user.is_admin_user:
         messages.error(request, 'Access denied. Admin only.')
         return redirect('user_dashboard')
     
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="lms_data_{datetime.now().strftime("%Y%m%d")}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Courses data
-    writer.writerow(['COURSES'])
-    writer.writerow(['ID', 'Title', 'Type', 'Price', 'Enrollments', 'Created By', 'Created At'])
-    courses = Course.objects.annotate(enrollment_count=Count('enrollments'))
-    for course in courses:
-        writer.writerow([
-            course.id,
-            course.title,
-            course.course_type,
-            course.price,
-            course.enrollment_count,
-            course.created_by.username,
-            course.created_at.strftime('%Y-%m-%d %H:%M')
-        ])
-    
-    writer.writerow([])
-    
-    # Enrollments data
-    writer.writerow(['ENROLLMENTS'])
-    writer.writerow(['ID', 'User', 'Course', 'Enrolled At', 'Progress', 'Status'])
-    enrollments = Enrollment.objects.select_related('user', 'course')
-    for enrollment in enrollments:
-        writer.writerow([
-            enrollment.id,
-            enrollment.user.username,
-            enrollment.course.title,
-            enrollment.enrolled_at.strftime('%Y-%m-%d %H:%M'),
-            f"{enrollment.progress}%",
-            'Active' if enrollment.is_active else 'Inactive'
-        ])
-    
-    writer.writerow([])
-    
-    # Payments data
-    writer.writerow(['PAYMENTS'])
-    writer.writerow(['ID', 'User', 'Course', 'Amount', 'Status', 'Transaction Date'])
-    payments = Payment.objects.select_related('user', 'course')
-    for payment in payments:
-        writer.writerow([
-            payment.id,
-            payment.user.username,
-            payment.course.title,
-            payment.amount,
-            payment.payment_status,
-            payment.transaction_date.strftime('%Y-%m-%d %H:%M')
-        ])
+    # Optional section and date range filters, e.g. ?section=payments&start_date=2025-01-01
+    section = request.GET.get('section', '')
+    if section and section not in EXPORT_SECTIONS:
+        return HttpResponse('Invalid export section', status=400)
+    sections = [section] if section else list(EXPORT_SECTIONS)
+    
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        value = request.GET.get(name, '')
+        try:
+            # parse_date returns None for a string that isn't YYYY-MM-DD and raises for one that isn't a real date
+            dates[name] = parse_date(value) if value else None
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return HttpResponse('Invalid date range', status=400)
+    start_date, end_date = dates['start_date'], dates['end_date']
+    
+    # Stream rows as they are read so memory stays flat regardless of table size
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        _export_csv_lines(writer, sections, start_date, end_date),
+        content_type='text/csv'
+    )
+    filename = f'lms_{section or "data"}_{datetime.now().strftime("%Y%m%d")}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     
     return response
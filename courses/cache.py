@@ -0,0 +1,77 @@
+"""
+Per-course and per-enrollment caches for the learning page and dashboard.
+
+The course outline (ordered modules) is shared by every learner and dropped
+whenever a module of the course is saved or deleted. The set of completed
+module ids is cached per enrollment and dropped when a module is completed.
+The recommendation candidates (newest active course ids) are shared by every
+dashboard and dropped whenever a course is saved or deleted.
+
+Invalidation only reaches the cache it runs against, so with several worker
+processes the `default` cache must be shared between them (DEFAULT_CACHE_DIR);
+the LocMem fallback is for a single development server.
+"""
+from django.core.cache import cache
+from .models import Course, Module, ModuleProgress
+
+OUTLINE_TIMEOUT = 60 * 60
+COMPLETED_TIMEOUT = 15 * 60
+CANDIDATES_TIMEOUT = 60 * 60
+CANDIDATES_LIMIT = 200
+CANDIDATES_KEY = 'courses:candidates'
+
+
+def _outline_key(course_id):
+    return f'courses:outline:{course_id}'
+
+
+def _completed_key(enrollment_id):
+    return f'courses:completed:{enrollment_id}'
+
+
+def get_course_outline(course_id):
+    """Ordered list of the course's modules"""
+    key = _outline_key(course_id)
+    modules = cache.get(key)
+    if modules is None:
+        modules = list(Module.objects.filter(course_id=course_id).order_by('order', 'id'))
+        cache.set(key, modules, OUTLINE_TIMEOUT)
+    return modules
+
+
+def invalidate_course_outline(course_id):
+    cache.delete(_outline_key(course_id))
+
+
+def get_completed_module_ids(enrollment_id):
+    """Set of module ids the enrollment has completed"""
+    key = _completed_key(enrollment_id)
+    completed = cache.get(key)
+    if completed is None:
+        completed = set(ModuleProgress.objects.filter(
+            enrollment_id=enrollment_id,
+            is_completed=True
+        ).values_list('module_id', flat=True))
+        cache.set(key, completed, COMPLETED_TIMEOUT)
+    return completed
+
+
+def invalidate_completed_modules(enrollment_id):
+    cache.delete(_completed_key(enrollment_id))
+
+
+def get_recommendation_candidates():
+    """(active course count, newest active course ids up to CANDIDATES_LIMIT)"""
+    candidates = cache.get(CANDIDATES_KEY)
+    if candidates is None:
+        active = Course.objects.filter(is_active=True)
+        candidates = (
+            active.count(),
+            list(active.order_by('-created_at', '-id').values_list('id', flat=True)[:CANDIDATES_LIMIT]),
+        )
+        cache.set(CANDIDATES_KEY, candidates, CANDIDATES_TIMEOUT)
+    return candidates
+
+
+def invalidate_recommendation_candidates():
+    cache.delete(CANDIDATES_KEY)
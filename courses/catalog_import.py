@@ -0,0 +1,240 @@
+"""
+Streaming bulk import of a partner course catalog (`manage.py import_catalog`).
+
+Input is JSON Lines or CSV, one record per line. A record is a course or a
+module: modules carry the `course_external_id` of their course, and in JSON
+Lines a course may also nest its modules in a `modules` list. A module may
+come before its course: modules whose course is not known yet are held back
+and written after every course in the file. Records are
+matched on `external_id`, so re-running an import updates courses and
+modules in place. A record replaces every imported field, and fields it leaves
+out fall back to the model defaults.
+
+Rows are validated a batch at a time with the model fields' own clean(),
+memoised per distinct value since catalogs repeat most of them. Invalid rows
+are reported and skipped. Each batch is written in its own transaction, with
+one executemany() per model of the upsert statement bulk_create would build
+(INSERT ... ON CONFLICT (external_id) DO UPDATE). That avoids bulk_create's
+per-object compilation, which costs more than the database work at this
+scale. Model signals do not fire, so the search index, caches and enrollment
+module totals of the touched courses (including the previous course of a
+module that moved), and the analytics course count, are brought up to date
+once, after the last batch.
+"""
+import csv
+import json
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+from analytics.services import bump_snapshot
+from .cache import invalidate_course_outline, invalidate_recommendation_candidates
+from .models import Course, Module
+from .page_cache import bump_version
+from .services import recount_module_totals
+from . import search
+
+COURSE_FIELDS = ('title', 'description', 'short_description', 'video_url', 'course_type', 'price', 'is_active')
+MODULE_FIELDS = ('title', 'description', 'module_type', 'order', 'video_url', 'text_content',
+                 'duration_minutes', 'is_preview')
+REFRESH_CHUNK = 500
+BOOLEAN_STRINGS = {'true': True, 't': True, 'yes': True, 'y': True, '1': True,
+                   'false': False, 'f': False, 'no': False, 'n': False, '0': False}
+
+
+def read_records(stream, fmt):
+    """Yield (line number, record dict) from a text stream of JSON Lines or CSV"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # Empty cells mean "not given", so the model default applies
+            yield reader.line_num, {key: value for key, value in record.items() if key and value != ''}
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, {'_error': f'Invalid JSON: {e}'}
+            continue
+        yield line_number, record if isinstance(record, dict) else {'_error': 'Expected a JSON object'}
+
+
+def upsert(model, rows, update_fields):
+    """
+    Insert or update (on external_id) rows given as {attname: database value} dicts.
+
+    Columns missing from a row get the field default.
+    """
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    defaults = {field.attname: field.get_db_prep_save(field.get_default(), connection) for field in fields}
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({}) {}'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        connection.ops.on_conflict_suffix_sql(
+            fields, OnConflict.UPDATE,
+            [model._meta.get_field(name).column for name in update_fields],
+            [model._meta.get_field('external_id').column],
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [[row.get(field.attname, defaults[field.attname]) for field in fields] for row in rows])
+
+
+class CatalogImporter:
+    """Validates and upserts catalog records in batches; feed() it records, then call finish()"""
+
+    def __init__(self, owner, batch_size=2000):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.course_ids = {}  # external_id -> pk of every course seen so far
+        self.touched_course_ids = set()
+        self.errors = []
+        self.stats = {'courses_created': 0, 'courses_updated': 0, 'modules_created': 0, 'modules_updated': 0}
+        self._courses = {}
+        self._modules = {}
+        self._unresolved = {}  # modules whose course was not known when their batch was written
+        self._cleaned = {}
+
+    def feed(self, records):
+        for line_number, record in records:
+            self.add(line_number, record)
+            if len(self._courses) + len(self._modules) >= self.batch_size:
+                self.flush()
+        self.flush()
+        # Modules listed before their course; anything still unknown now is an error
+        unresolved = list(self._unresolved.items())
+        self._unresolved = {}
+        for start in range(0, len(unresolved), self.batch_size):
+            self._modules = dict(unresolved[start:start + self.batch_size])
+            self.flush(final=True)
+
+    def add(self, line_number, record):
+        if '_error' in record:
+            self.errors.append((line_number, record['_error']))
+            return
+        kind = record.get('record') or ('module' if 'course_external_id' in record else 'course')
+        external_id = str(record.get('external_id') or '').strip()
+        if kind not in ('course', 'module'):
+            self.errors.append((line_number, f'Unknown record type "{kind}"'))
+            return
+        if not external_id:
+            self.errors.append((line_number, 'external_id is required'))
+            return
+
+        if kind == 'course':
+            # A later row with the same key wins; one upsert may not touch a row twice
+            self._courses[external_id] = (line_number, record)
+            for module in record.get('modules') or []:
+                self.add(line_number, {**module, 'record': 'module', 'course_external_id': external_id})
+        else:
+            course_key = str(record.get('course_external_id') or '').strip()
+            if not course_key:
+                self.errors.append((line_number, 'course_external_id is required for modules'))
+                return
+            self._modules[external_id] = (line_number, {**record, 'course_external_id': course_key})
+            # A later row with the same key wins over one held back for its course
+            self._unresolved.pop(external_id, None)
+
+    def _clean_value(self, field, raw):
+        try:
+            return self._cleaned[field, raw]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable JSON (a list or object) is never a valid value here
+            raise ValidationError(f'Unexpected {type(raw).__name__}')
+        value = raw
+        if isinstance(field, models.BooleanField) and isinstance(raw, str):
+            value = BOOLEAN_STRINGS.get(raw.strip().lower(), raw)
+        value = field.get_db_prep_save(field.clean(value, None), connection)
+        self._cleaned[field, raw] = value
+        return value
+
+    def clean(self, model, fields, line_number, record):
+        """{attname: database value} for the record's fields, or None (and an error) if any is invalid"""
+        row, errors = {}, []
+        for name in fields:
+            field = model._meta.get_field(name)
+            try:
+                row[field.attname] = self._clean_value(field, record[name] if name in record else field.get_default())
+            except ValidationError as e:
+                errors.append(f'{name}: {" ".join(e.messages)}')
+        if errors:
+            self.errors.append((line_number, '; '.join(errors)))
+            return None
+        return row
+
+    def flush(self, final=False):
+        courses, modules = self._courses, self._modules
+        self._courses, self._modules = {}, {}
+        if not courses and not modules:
+            return
+        now = Course._meta.get_field('created_at').get_db_prep_save(timezone.now(), connection)
+        stamps = {'created_at': now, 'updated_at': now}
+
+        course_rows = []
+        for key, (line_number, record) in courses.items():
+            row = self.clean(Course, COURSE_FIELDS, line_number, record)
+            if row is not None:
+                course_rows.append({**row, **stamps, 'external_id': key, 'created_by_id': self.owner.pk})
+
+        with transaction.atomic():
+            if course_rows:
+                keys = [row['external_id'] for row in course_rows]
+                existing = Course.objects.filter(external_id__in=keys).count()
+                upsert(Course, course_rows, [*COURSE_FIELDS, 'updated_at'])
+                self.course_ids.update(Course.objects.filter(external_id__in=keys).values_list('external_id', 'id'))
+                self.touched_course_ids.update(self.course_ids[key] for key in keys)
+                self.stats['courses_updated'] += existing
+                self.stats['courses_created'] += len(keys) - existing
+
+            missing = {record['course_external_id'] for _, record in modules.values()} - self.course_ids.keys()
+            if missing:
+                self.course_ids.update(Course.objects.filter(external_id__in=missing).values_list('external_id', 'id'))
+
+            module_rows = []
+            for key, (line_number, record) in modules.items():
+                course_id = self.course_ids.get(record['course_external_id'])
+                if course_id is None:
+                    if final:
+                        self.errors.append((line_number, f'Unknown course "{record["course_external_id"]}"'))
+                    else:
+                        self._unresolved[key] = (line_number, record)
+                    continue
+                row = self.clean(Module, MODULE_FIELDS, line_number, record)
+                if row is not None:
+                    module_rows.append({**row, **stamps, 'external_id': key, 'course_id': course_id})
+
+            if module_rows:
+                keys = [row['external_id'] for row in module_rows]
+                # Previous courses too, in case a module moved
+                previous = list(Module.objects.filter(external_id__in=keys).values_list('course_id', flat=True))
+                upsert(Module, module_rows, [*MODULE_FIELDS, 'course', 'updated_at'])
+                self.touched_course_ids.update(row['course_id'] for row in module_rows)
+                self.touched_course_ids.update(previous)
+                self.stats['modules_updated'] += len(previous)
+                self.stats['modules_created'] += len(keys) - len(previous)
+        # Unique titles and descriptions would otherwise pile up for the whole import
+        self._cleaned.clear()
+
+    def finish(self):
+        """Do the signal work the bulk writes skipped, once per touched course"""
+        course_ids = sorted(self.touched_course_ids)
+        for start in range(0, len(course_ids), REFRESH_CHUNK):
+            chunk = course_ids[start:start + REFRESH_CHUNK]
+            with transaction.atomic():
+                search.index_courses(chunk)
+                recount_module_totals(chunk)
+            for course_id in chunk:
+                invalidate_course_outline(course_id)
+            bump_version(*(f'course:{course_id}' for course_id in chunk))
+        if course_ids:
+            invalidate_recommendation_candidates()
+            bump_version('catalog')
+        # What the analytics post_save receiver would have counted
+        bump_snapshot(total_courses=self.stats['courses_created'])
@@ -0,0 +1,131 @@
+"""
+ffmpeg/ffprobe wrappers for the video transcoding worker.
+
+This module deliberately imports nothing from Django: `manage.py
+transcode_videos` runs transcode_to_hls() in spawned worker processes and
+records the results (and the progress messages they put on a queue) itself.
+"""
+import json
+import os
+import subprocess
+import tempfile
+
+# (name, height, video bitrate, audio bitrate), best first
+RENDITIONS = [
+    ('1080p', 1080, '5000k', '192k'),
+    ('720p', 720, '2800k', '128k'),
+    ('480p', 480, '1400k', '128k'),
+    ('360p', 360, '800k', '96k'),
+]
+SEGMENT_SECONDS = 6
+MANIFEST_NAME = 'master.m3u8'
+POSTER_NAME = 'poster.jpg'
+
+
+class TranscodeError(Exception):
+    """ffmpeg or ffprobe failed on the source file"""
+
+
+def _run(command):
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise TranscodeError(result.stderr.strip()[-2000:] or f'{command[0]} exited with {result.returncode}')
+    return result.stdout
+
+
+def probe(source, ffprobe='ffprobe'):
+    """Return (duration in seconds, video height, has audio) for a media file"""
+    output = _run([
+        ffprobe, '-v', 'error', '-print_format', 'json',
+        '-show_entries', 'format=duration:stream=codec_type,height', source,
+    ])
+    info = json.loads(output)
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video is None:
+        raise TranscodeError('No video stream found')
+    duration = float(info.get('format', {}).get('duration') or 0)
+    has_audio = any(s.get('codec_type') == 'audio' for s in streams)
+    return duration, int(video.get('height') or 0), has_audio
+
+
+def select_renditions(source_height):
+    """Renditions no taller than the source, always keeping the smallest one"""
+    selected = [r for r in RENDITIONS if r[1] <= source_height]
+    return selected or RENDITIONS[-1:]
+
+
+def build_hls_command(source, output_dir, renditions, has_audio, ffmpeg='ffmpeg', threads=0):
+    """One ffmpeg invocation that scales, encodes and segments every rendition"""
+    count = len(renditions)
+    splits = ''.join(f'[v{i}]' for i in range(count))
+    filters = [f'[0:v]split={count}{splits}']
+    filters += [f'[v{i}]scale=-2:{height}[v{i}out]' for i, (_, height, _, _) in enumerate(renditions)]
+
+    command = [ffmpeg, '-y', '-v', 'error', '-nostats', '-progress', 'pipe:1', '-i', source,
+               '-filter_complex', ';'.join(filters), '-threads', str(threads)]
+    stream_map = []
+    for i, (_, height, video_bitrate, audio_bitrate) in enumerate(renditions):
+        command += [
+            '-map', f'[v{i}out]', f'-c:v:{i}', 'libx264', '-preset', 'veryfast',
+            f'-b:v:{i}', video_bitrate, f'-maxrate:v:{i}', video_bitrate, f'-bufsize:v:{i}', video_bitrate,
+            # Keyframes on segment boundaries so every rendition switches cleanly
+            '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})',
+        ]
+        if has_audio:
+            command += ['-map', 'a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', audio_bitrate, '-ac', '2']
+            stream_map.append(f'v:{i},a:{i},name:{renditions[i][0]}')
+        else:
+            stream_map.append(f'v:{i},name:{renditions[i][0]}')
+    command += [
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output_dir, '%v', 'segment_%05d.ts'),
+        '-master_pl_name', MANIFEST_NAME,
+        '-var_stream_map', ' '.join(stream_map),
+        os.path.join(output_dir, '%v', 'index.m3u8'),
+    ]
+    return command
+
+
+def extract_poster(source, output_dir, duration, ffmpeg='ffmpeg'):
+    # A frame a little way in is more representative than the (often black) first one
+    offset = min(max(duration * 0.1, 0), 5)
+    poster = os.path.join(output_dir, POSTER_NAME)
+    _run([ffmpeg, '-y', '-v', 'error', '-ss', f'{offset:.2f}', '-i', source, '-frames:v', '1',
+          '-vf', 'scale=1280:-2', '-q:v', '3', poster])
+    return poster
+
+
+def transcode_to_hls(job_id, source, output_dir, progress=None, ffmpeg='ffmpeg', ffprobe='ffprobe', threads=0):
+    """
+    Produce the HLS renditions, master manifest and poster for one video.
+
+    Progress percentages are put on the `progress` queue as (job_id, percent).
+    Returns a dict with the duration and the renditions produced.
+    """
+    duration, height, has_audio = probe(source, ffprobe)
+    renditions = select_renditions(height)
+    os.makedirs(output_dir, exist_ok=True)
+    extract_poster(source, output_dir, duration, ffmpeg)
+
+    command = build_hls_command(source, output_dir, renditions, has_audio, ffmpeg, threads)
+    # stderr goes to a file: a pipe nobody reads while stdout is consumed fills up and stalls ffmpeg
+    with tempfile.TemporaryFile(mode='w+') as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        last_reported = -1
+        for line in process.stdout:
+            # -progress reports out_time_us (microseconds) as encoding advances
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_us' and duration and progress is not None and value.isdigit():
+                percent = min(int(int(value) / 1e6 / duration * 100), 99)
+                if percent >= last_reported + 5:
+                    progress.put((job_id, percent))
+                    last_reported = percent
+        if process.wait() != 0:
+            stderr.seek(0)
+            raise TranscodeError(stderr.read().strip()[-2000:] or f'ffmpeg exited with {process.returncode}')
+
+    return {
+        'duration': duration,
+        'renditions': [name for name, _, _, _ in renditions],
+    }
@@ -1,7 +1,61 @@
 from django import forms
+from django.db import transaction
 from .models import Course, Module
+from .uploads import attach_upload, attachable_upload, upload_target_name
 
-class CourseForm(forms.ModelForm):
+class ChunkedUploadMixin:
+    """
+    Lets file fields be filled from a completed courses.uploads upload.
+
+    The page uploads large files in chunks and submits only the upload id in
+    the hidden `<field>_upload` input, which takes precedence over the file input.
+    Only the requesting user's own uploads are accepted (pass `user=`), and the
+    file is moved into place after the instance is saved, so always save with
+    commit=True.
+    """
+    chunked_fields = {}  # model field -> upload kind
+    
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self._chunked_uploads = {}
+        for field_name, kind in self.chunked_fields.items():
+            self.fields[f'{field_name}_upload'] = forms.UUIDField(
+                required=False,
+                widget=forms.HiddenInput(attrs={'data-chunked-for': field_name, 'data-kind': kind}),
+            )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for field_name, kind in self.chunked_fields.items():
+            upload_id = cleaned_data.get(f'{field_name}_upload')
+            if not upload_id:
+                continue
+            upload = attachable_upload(upload_id, self.user, kind) if self.user else None
+            if upload is None:
+                self.add_error(f'{field_name}_upload', 'The uploaded file is missing or incomplete. Please upload it again.')
+            else:
+                self._chunked_uploads[field_name] = upload
+        return cleaned_data
+    
+    def save(self, commit=True):
+        if not self._chunked_uploads:
+            return super().save(commit)
+        if not commit:
+            raise ValueError('A form with a chunked upload moves the file after saving; use commit=True')
+        with transaction.atomic():
+            names = {}
+            for field_name, upload in self._chunked_uploads.items():
+                names[field_name] = upload_target_name(upload, self.instance, field_name)
+                setattr(self.instance, field_name, names[field_name])
+            instance = super().save()
+            for field_name, upload in self._chunked_uploads.items():
+                attach_upload(upload, instance, field_name, names[field_name])
+        return instance
+
+class CourseForm(ChunkedUploadMixin, forms.ModelForm):
+    chunked_fields = {'video_file': 'video'}
+    
     class Meta:
         model = Course
         fields = ['title', 'description', 'short_description', 'image', 'video_url', 
@@ -18,7 +72,9 @@ class CourseForm(forms.ModelForm):
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
-class ModuleForm(forms.ModelForm):
+class ModuleForm(ChunkedUploadMixin, forms.ModelForm):
+    chunked_fields = {'video_file': 'video', 'pdf_file': 'pdf'}
+    
     class Meta:
         model = Module
         fields = ['title', 'description', 'module_type', 'order', 'video_url', 
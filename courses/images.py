@@ -0,0 +1,166 @@
+"""
+Resized WebP/JPEG derivatives of uploaded images.
+
+Course images are served as a srcset of variants named after a hash of the
+source bytes (derivatives/ab/<digest>-<width>.<ext> under MEDIA_ROOT), so a
+re-upload never collides with a cached variant. Variants are generated in the
+background when an image is uploaded, or the first time the
+{% responsive_image %} tag meets an image without them; the tag falls back to
+the original until they exist. Which variants exist is recorded in a manifest
+next to the original (<name>.variants.json), which every process and restart
+sees; the cache only saves re-reading it. `manage.py generate_image_variants`
+backfills existing uploads with a process pool.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps
+
+WIDTHS = (320, 640, 960, 1280)
+FORMATS = (('webp', 'WEBP', 'image/webp'), ('jpg', 'JPEG', 'image/jpeg'))
+VARIANTS_DIR = 'derivatives'
+VARIANTS_TIMEOUT = 24 * 60 * 60
+PENDING_TIMEOUT = 5 * 60
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _variants_key(name):
+    return f'images:variants:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def manifest_path(path):
+    return f'{path}.variants.json'
+
+
+def read_manifest(path):
+    try:
+        with open(manifest_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:20]
+
+
+def generate_variants(path, media_root):
+    """
+    Write every missing variant of the image at `path`; safe to run in any process.
+
+    Returns {'digest': ..., 'widths': [...]} describing the variants available.
+    """
+    digest = file_digest(path)
+    out_dir = os.path.join(media_root, VARIANTS_DIR, digest[:2])
+    os.makedirs(out_dir, exist_ok=True)
+
+    with Image.open(path) as original:
+        # Decode at reduced size where the codec allows it (JPEG draft mode)
+        original.draft('RGB', (WIDTHS[-1], WIDTHS[-1]))
+        image = ImageOps.exif_transpose(original)
+        # Never upscale: widths above the source collapse to the source width
+        widths = sorted({min(width, image.width) for width in WIDTHS})
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = None
+            for ext, pil_format, _ in FORMATS:
+                target = os.path.join(out_dir, f'{digest}-{width}.{ext}')
+                if os.path.exists(target):
+                    continue
+                if resized is None:
+                    resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image.copy()
+                variant = resized
+                if pil_format == 'JPEG' and variant.mode != 'RGB':
+                    variant = variant.convert('RGB')
+                elif pil_format == 'WEBP' and variant.mode not in ('RGB', 'RGBA'):
+                    variant = variant.convert('RGBA' if 'A' in variant.getbands() else 'RGB')
+                options = {'quality': 80, 'method': 4} if pil_format == 'WEBP' else {
+                    'quality': 82, 'optimize': True, 'progressive': True}
+                # Write then rename so a half-written file is never served
+                tmp = f'{target}.{os.getpid()}.tmp'
+                variant.save(tmp, pil_format, **options)
+                os.replace(tmp, target)
+    return {'digest': digest, 'widths': widths}
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+        return _pool
+
+
+def remember_variants(name, path, variants):
+    """Write the manifest of the image at `path` (stored as `name`) and cache it"""
+    target = manifest_path(path)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(variants, f)
+    os.replace(tmp, target)
+    cache.set(_variants_key(name), variants, VARIANTS_TIMEOUT)
+
+
+def _generate_and_remember(name, path):
+    try:
+        variants = generate_variants(path, str(settings.MEDIA_ROOT))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Unreadable upload: remember that so the tag stops retrying
+        variants = {'digest': '', 'widths': []}
+    remember_variants(name, path, variants)
+    return variants
+
+
+def schedule_variants(field_file):
+    """Queue variant generation for an image field unless it is done or already queued"""
+    if not field_file:
+        return None
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        return None
+    key = _variants_key(field_file.name)
+    if cache.get(key) is not None or os.path.exists(manifest_path(path)):
+        return None
+    if not cache.add(f'{key}:pending', True, PENDING_TIMEOUT):
+        return None
+    return _get_pool().submit(_generate_and_remember, field_file.name, path)
+
+
+def get_variants(field_file):
+    """
+    [(mime type, srcset)] for an image field, best format first.
+
+    Empty until the variants have been generated (which this schedules).
+    """
+    if not field_file:
+        return []
+    key = _variants_key(field_file.name)
+    variants = cache.get(key)
+    if variants is None:
+        try:
+            variants = read_manifest(field_file.path)
+        except NotImplementedError:
+            return []
+        if variants is None:
+            schedule_variants(field_file)
+            return []
+        cache.set(key, variants, VARIANTS_TIMEOUT)
+    digest = variants['digest']
+    if not digest:
+        return []
+    base = f'{settings.MEDIA_URL}{VARIANTS_DIR}/{digest[:2]}/{digest}'
+    return [
+        (mime, ', '.join(f'{base}-{width}.{ext} {width}w' for width in variants['widths']))
+        for ext, _, mime in FORMATS
+    ]
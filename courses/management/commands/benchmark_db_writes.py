@@ -0,0 +1,166 @@
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import SUPPRESS
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import setup_databases, teardown_databases
+from courses.models import Course, Enrollment, Module, ModuleProgress
+from courses.services import complete_module
+from lms_platform import scale_data
+
+# Environment for each configuration, on top of the caller's DB_* variables
+CONFIGS = {
+    # What every connection got before lms_platform.database: Django's own SQLite defaults
+    'sqlite-rollback': {'DB_ENGINE': 'sqlite', 'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+                        'SQLITE_TRANSACTION_MODE': 'DEFERRED', 'DB_CONN_MAX_AGE': '0'},
+    'sqlite-wal': {'DB_ENGINE': 'sqlite'},
+    'postgresql': {'DB_ENGINE': 'postgresql'},
+    'postgresql-pool': {'DB_ENGINE': 'postgresql', 'DB_POOL_MAX_SIZE': '{threads}'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Measure progress-update write throughput with concurrent writers (and readers) under each database '
+            'configuration, each in its own throwaway database')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--configs', nargs='+', choices=sorted(CONFIGS), default=['sqlite-rollback', 'sqlite-wal'],
+                            help='The postgresql ones use DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT from the '
+                                 'environment and create a test_ database next to it')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers')
+        parser.add_argument('--readers', type=int, default=2, help='Concurrent dashboard-style readers')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--users', type=int, default=400)
+        parser.add_argument('--modules-per-course', type=int, default=50)
+        parser.add_argument('--worker', action='store_true', help=SUPPRESS)
+    
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(options)))
+            return
+        
+        results = {}
+        for name in options['configs']:
+            results[name] = self.run_config(name, options)
+        
+        self.stdout.write(f'\n{"config":<18}{"writes/s":>10}{"writes":>9}{"locked":>8}{"p50 ms":>9}{"p95 ms":>9}'
+                          f'{"reads/s":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<18}{result["writes_per_second"]:>10.0f}{result["writes"]:>9}{result["locked"]:>8}'
+                f'{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["reads_per_second"]:>10.0f}'
+            )
+    
+    def run_config(self, name, options):
+        """Run the worker in a fresh process so the settings pick up this configuration's environment"""
+        env = {**os.environ, **{key: value.format(**options) for key, value in CONFIGS[name].items()}}
+        with tempfile.TemporaryDirectory() as tmp:
+            if env['DB_ENGINE'] == 'sqlite':
+                env['DB_NAME'] = env['DB_TEST_NAME'] = os.path.join(tmp, 'bench.sqlite3')
+            command = [
+                sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_db_writes', '--worker',
+                '--threads', str(options['threads']), '--readers', str(options['readers']),
+                '--seconds', str(options['seconds']), '--users', str(options['users']),
+                '--modules-per-course', str(options['modules_per_course']),
+            ]
+            self.stdout.write(f'{name}: running {options["threads"]} writers and {options["readers"]} readers '
+                              f'for {options["seconds"]:g}s')
+            process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f'{name} failed:\n{process.stderr}')
+        return json.loads(process.stdout.strip().splitlines()[-1])
+    
+    def run_worker(self, options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.seed(options)
+            return self.measure(options)
+        finally:
+            connection.close()
+            teardown_databases(old_config, verbosity=0)
+    
+    def seed(self, options):
+        scale_data.generate(users=options['users'], courses=20, modules_per_course=options['modules_per_course'],
+                            enrollments_per_user=2)
+        # Start every enrollment from zero so each writer has a full list of modules to complete
+        ModuleProgress.objects.all().delete()
+        Enrollment.objects.update(completed_modules=0, progress=0, completed_at=None)
+    
+    def measure(self, options):
+        modules = {}
+        for module in Module.objects.order_by('order'):
+            modules.setdefault(module.course_id, []).append(module)
+        enrollments = list(Enrollment.objects.order_by('id'))
+        student_ids = sorted({enrollment.user_id for enrollment in enrollments})
+        deadline = time.perf_counter() + options['seconds']
+        writers = options['threads']
+        stats = {'latencies': [], 'locked': 0, 'reads': 0}
+        lock = threading.Lock()
+        
+        def write(slice_index):
+            latencies, locked = [], 0
+            try:
+                for enrollment in enrollments[slice_index::writers]:
+                    for module in modules[enrollment.course_id]:
+                        if time.perf_counter() >= deadline:
+                            return
+                        started = time.perf_counter()
+                        try:
+                            complete_module(enrollment, module)
+                        except OperationalError:
+                            # "database is locked": the busy timeout ran out or a lock upgrade deadlocked
+                            locked += 1
+                            continue
+                        latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                with lock:
+                    stats['latencies'] += latencies
+                    stats['locked'] += locked
+                connection.close()
+        
+        def read(reader_index):
+            reads = 0
+            try:
+                while time.perf_counter() < deadline:
+                    user_id = student_ids[(reader_index + reads) % len(student_ids)]
+                    try:
+                        list(Enrollment.objects.filter(user_id=user_id).select_related('course')
+                             .values_list('course__title', 'progress'))
+                        Course.objects.filter(is_active=True).count()
+                    except OperationalError:
+                        continue
+                    reads += 1
+            finally:
+                with lock:
+                    stats['reads'] += reads
+                connection.close()
+        
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=read, args=(i,)) for i in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        latencies = sorted(stats['latencies'])
+        
+        def percentile(fraction):
+            return latencies[max(0, math.ceil(fraction * len(latencies)) - 1)] if latencies else 0
+        
+        return {
+            'writes': len(latencies),
+            'locked': stats['locked'],
+            'writes_per_second': len(latencies) / elapsed,
+            'reads_per_second': stats['reads'] / elapsed,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+        }
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from courses.recommendations import DEFAULT_MIN_OVERLAP, DEFAULT_TOP_K, compute_neighbours
+
+
+class Command(BaseCommand):
+    help = 'Time the co-enrollment similarity build on synthetic enrollments (no database access)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--enrollments', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=200_000)
+        parser.add_argument('--courses', type=int, default=2_000)
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+        parser.add_argument('--min-overlap', type=int, default=DEFAULT_MIN_OVERLAP)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        import numpy as np
+        
+        rng = np.random.default_rng(options['seed'])
+        # Zipf-like course popularity so a few courses dominate, as in a real catalog
+        popularity = 1.0 / np.arange(1, options['courses'] + 1)
+        popularity /= popularity.sum()
+        user_ids = rng.integers(1, options['users'] + 1, size=options['enrollments'])
+        course_ids = rng.choice(np.arange(1, options['courses'] + 1), size=options['enrollments'], p=popularity)
+        
+        self.stdout.write(f'{options["enrollments"]} enrollments, {options["users"]} users, '
+                          f'{options["courses"]} courses, top-{options["top_k"]}')
+        timings = []
+        for run in range(options['repeat']):
+            started = time.perf_counter()
+            sources, _, _, _ = compute_neighbours(user_ids, course_ids, options['top_k'], options['min_overlap'])
+            timings.append(time.perf_counter() - started)
+            self.stdout.write(f'  run {run + 1}: {timings[-1]:.3f}s, {len(sources)} neighbour rows')
+        self.stdout.write(self.style.SUCCESS(f'Best build time: {min(timings):.3f}s'))
@@ -0,0 +1,32 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from courses import search
+
+
+class Command(BaseCommand):
+    help = 'Compare the full-text search index against the icontains lookup'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=['python', 'web dev', 'data', 'machine learning'])
+        parser.add_argument('--repeat', type=int, default=20)
+    
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), max(timings), len(result)
+    
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f'{"query":<24}{"backend":<12}{"median ms":>12}{"max ms":>12}{"hits":>8}')
+        for query in options['queries']:
+            runs = [
+                ('fts', lambda: search.search_course_ids(query)),
+                ('icontains', lambda: list(search.icontains_search(query).values_list('id', flat=True))),
+            ]
+            for backend, func in runs:
+                median, worst, hits = self._time(func, repeat)
+                self.stdout.write(f'{query:<24}{backend:<12}{median:>12.2f}{worst:>12.2f}{hits:>8}')
@@ -0,0 +1,100 @@
+import logging
+import shutil
+import sys
+import tempfile
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, setup_test_environment, \
+    teardown_databases, teardown_test_environment
+from lms_platform import benchmarks, scale_data
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every courses, payments and accounts URL on generated data in a throwaway database, '
+            'failing when a view runs over its query budget or is slower than the local baseline')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', choices=sorted(scale_data.SCALES), default=['small'])
+        parser.add_argument('--repeat', type=int, default=30, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario first')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--baseline', default=benchmarks.BASELINE_PATH,
+                            help='Timings recorded on this machine; latency is only compared against these')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store these results as the new local baseline instead of comparing latency')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed median slowdown as a fraction of the baseline')
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help='Median slowdowns smaller than this are never regressions')
+    
+    def handle(self, *args, **options):
+        baseline = benchmarks.load_baseline(options['baseline'])
+        media_root = tempfile.mkdtemp()
+        setup_test_environment()
+        # Sampled query logging would add noise to the timings
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, QUERY_BUDGET_SAMPLE_RATE=0,
+            RAZORPAY_WEBHOOK_SECRET=settings.RAZORPAY_WEBHOOK_SECRET or benchmarks.WEBHOOK_SECRET,
+        )
+        settings_override.enable()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # The 4xx scenarios (bad webhook signatures and the like) would log a warning per request
+        request_logger = logging.getLogger('django.request')
+        log_level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        regressions = []
+        try:
+            for scale in options['scales']:
+                regressions += self.run_scale(scale, baseline, options)
+        finally:
+            request_logger.setLevel(log_level)
+            teardown_databases(old_config, verbosity=0)
+            settings_override.disable()
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+        
+        if options['update_baseline']:
+            benchmarks.save_baseline(baseline, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(regression))
+            raise CommandError(f'{len(regressions)} regression(s)')
+        self.stdout.write(self.style.SUCCESS('All views within their query budgets' + (
+            '' if options['update_baseline'] or not baseline else ' and the latency baseline'
+        )))
+    
+    def run_scale(self, scale, baseline, options):
+        call_command('flush', interactive=False, verbosity=0)
+        for cache in caches.all():
+            cache.clear()
+        counts = scale_data.generate(seed=options['seed'], **scale_data.SCALES[scale])
+        self.stdout.write(f'\n{scale}: ' + ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items()))
+        
+        fixtures = benchmarks.prepare_fixtures()
+        scenarios = benchmarks.build_scenarios(fixtures)
+        missing = benchmarks.missing_scenarios(scenarios)
+        if missing:
+            raise CommandError(f'No benchmark scenario for: {", ".join(missing)}')
+        
+        results = benchmarks.run_scenarios(scenarios, fixtures, options['repeat'], options['warmup'])
+        previous = baseline.get(scale, {})
+        self.stdout.write(f'{"scenario":<32}{"status":>7}{"queries":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+                          f'{"base p50":>10}')
+        for name, result in results.items():
+            base = previous.get(name, {}).get('p50_ms')
+            self.stdout.write(
+                f'{name:<32}{result["status"]:>7}{result["queries"]:>9}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}{base if base is not None else "-":>10}'
+            )
+        sys.stdout.flush()
+        
+        # Query counts do not depend on the machine, so they are always gated
+        regressions = benchmarks.over_budget(results)
+        if options['update_baseline']:
+            baseline[scale] = results
+        else:
+            regressions += benchmarks.compare(results, previous, options['tolerance'], options['min_delta_ms'])
+        return [f'{scale} {message}' for message in regressions]
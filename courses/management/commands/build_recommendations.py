@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from courses.recommendations import DEFAULT_MIN_OVERLAP, DEFAULT_TOP_K, rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the co-enrollment course neighbours used for dashboard recommendations'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                            help='Neighbours kept per course')
+        parser.add_argument('--min-overlap', type=int, default=DEFAULT_MIN_OVERLAP,
+                            help='Minimum shared enrollments for two courses to be neighbours')
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_recommendations(
+            top_k=options['top_k'],
+            min_overlap=options['min_overlap'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} course neighbours in {elapsed:.2f}s'))
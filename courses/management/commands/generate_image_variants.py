@@ -0,0 +1,40 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from courses.images import generate_variants, remember_variants
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized WebP/JPEG variants of every course image'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS)
+    
+    def handle(self, *args, **options):
+        names = set(Course.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+        
+        started = time.perf_counter()
+        failed = 0
+        media_root = str(settings.MEDIA_ROOT)
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(generate_variants, os.path.join(media_root, name), media_root): name
+                for name in sorted(names)
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    variants = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f'{name}: {e}'))
+                    continue
+                remember_variants(name, os.path.join(media_root, name), variants)
+        
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(names) - failed} image(s) in {elapsed:.2f}s ({failed} failed)'
+        ))
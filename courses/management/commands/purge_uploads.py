@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from courses.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were abandoned or never attached to a course or module'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Age in hours after which an untouched upload is removed')
+    
+    def handle(self, *args, **options):
+        count = purge_stale_uploads(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} stale uploads'))
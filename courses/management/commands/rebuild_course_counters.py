@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from courses.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or verify) the denormalized enrollment counters on Course'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report courses whose counters are out of date')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        # One grouped pass over Enrollment instead of a COUNT per course
+        counts = {
+            row['course_id']: (row['total'], row['active'])
+            for row in Enrollment.objects.values('course_id').annotate(
+                total=Count('id'),
+                active=Count('id', filter=Q(is_active=True)),
+            ).order_by()
+        }
+        
+        stale = []
+        for course in Course.objects.only('id', 'enrollment_count', 'active_enrollment_count').iterator(
+                chunk_size=options['batch_size']):
+            total, active = counts.get(course.id, (0, 0))
+            if course.enrollment_count != total or course.active_enrollment_count != active:
+                course.enrollment_count = total
+                course.active_enrollment_count = active
+                stale.append(course)
+        
+        if options['verify']:
+            for course in stale:
+                self.stdout.write(f'Course {course.id}: expected {course.enrollment_count} total / '
+                                  f'{course.active_enrollment_count} active')
+            if stale:
+                self.stdout.write(self.style.WARNING(f'{len(stale)} course(s) have stale counters'))
+            else:
+                self.stdout.write(self.style.SUCCESS('All course counters are consistent'))
+            return
+        
+        with transaction.atomic():
+            Course.objects.bulk_update(
+                stale, ['enrollment_count', 'active_enrollment_count'],
+                batch_size=options['batch_size']
+            )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {len(stale)} course(s)'))
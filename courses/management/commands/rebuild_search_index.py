@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from courses import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text course search index from Course and Module text'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            self.stdout.write(self.style.WARNING('Full-text index is only used on SQLite; nothing to rebuild'))
+            return
+        
+        started = time.perf_counter()
+        indexed = search.rebuild_index(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} course(s) in {elapsed:.2f}s'))
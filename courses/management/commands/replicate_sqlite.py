@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from lms_platform.replication import replicate
+
+
+class Command(BaseCommand):
+    help = ('Copy the primary SQLite database onto the replica (DB_REPLICA_NAME) to stand in for replication '
+            'during local development')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds between copies, i.e. the largest replica lag')
+        parser.add_argument('--once', action='store_true', help='Copy once and exit')
+    
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                replicate()
+            except ValueError as e:
+                raise CommandError(str(e))
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Replica updated in {time.perf_counter() - started:.2f}s'))
+                return
+            time.sleep(max(0.0, options['interval'] - (time.perf_counter() - started)))
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from courses import ffmpeg, transcoding
+
+
+class Command(BaseCommand):
+    help = 'Transcode queued module and course videos into HLS renditions with a bounded process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.TRANSCODE_WORKERS,
+                            help='Videos transcoded in parallel (each is one ffmpeg process)')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        # Spawned workers start clean instead of inheriting this process's DB connections
+        context = multiprocessing.get_context('spawn')
+        with context.Manager() as manager, ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            progress = manager.Queue()
+            running = {}
+            last_heartbeat = time.monotonic()
+            while True:
+                free = workers - len(running)
+                for job in (transcoding.claim_jobs(free) if free else []):
+                    source, output_dir = transcoding.job_paths(job)
+                    future = pool.submit(
+                        ffmpeg.transcode_to_hls, job.id, source, os.path.join(settings.MEDIA_ROOT, output_dir),
+                        progress, settings.FFMPEG_BINARY, settings.FFPROBE_BINARY, settings.TRANSCODE_FFMPEG_THREADS,
+                    )
+                    running[future] = (job, output_dir)
+                    self.stdout.write(f'Transcoding {job.source_name}')
+
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+                self.record_progress(progress)
+                if time.monotonic() - last_heartbeat >= settings.TRANSCODE_LEASE_SECONDS / 5:
+                    transcoding.heartbeat(job for job, _ in running.values())
+                    last_heartbeat = time.monotonic()
+                for future in done:
+                    job, output_dir = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        transcoding.fail_job(job, output_dir, e)
+                        self.stderr.write(self.style.ERROR(f'{job.source_name} failed: {e}'))
+                    else:
+                        transcoding.complete_job(job, output_dir, result)
+                        self.stdout.write(self.style.SUCCESS(
+                            f'{job.source_name}: {", ".join(result["renditions"])}, {result["duration"]:.0f}s'
+                        ))
+
+    def record_progress(self, progress):
+        latest = {}
+        while True:
+            try:
+                job_id, percent = progress.get_nowait()
+            except queue.Empty:
+                break
+            latest[job_id] = percent
+        for job_id, percent in latest.items():
+            transcoding.record_progress(job_id, percent)
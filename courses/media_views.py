@@ -0,0 +1,204 @@
+"""
+Access-checked serving of course and module media files.
+
+Full-file responses go out as FileResponse, which lets the WSGI server use
+sendfile(). Byte ranges (video seeking) are answered with 206 Partial Content,
+and ETag / If-None-Match / If-Modified-Since / If-Range are honoured. With
+MEDIA_OFFLOAD set, the view only checks access and hands the transfer to the
+front end through X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd).
+
+For nginx, MEDIA_ACCEL_PREFIX must be an `internal` location, so clients
+cannot request it directly, and MEDIA_URL must expose only PUBLIC_MEDIA_DIRS:
+
+    location /protected-media/ {
+        internal;
+        alias /path/to/media/;  # MEDIA_ROOT
+    }
+    location ~ ^/media/((course_images|profile_pics|derivatives)/.*)$ {
+        alias /path/to/media/$1;
+    }
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from .models import Course, Enrollment, Module, VideoTranscode
+
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+MODULE_FILE_FIELDS = {'video': 'video_file', 'pdf': 'pdf_file'}
+
+
+def _can_access_module(user, module):
+    if user.is_authenticated and user.is_admin_user:
+        return True
+    if not module.course.is_active:
+        return False
+    if module.is_preview:
+        return True
+    return user.is_authenticated and Enrollment.objects.filter(
+        user=user, course_id=module.course_id, is_active=True
+    ).exists()
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, None to send the whole file, False if unsatisfiable"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: a full 200 response is always allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _range_iterator(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, field_file, private=True):
+    """Serve a FieldFile with conditional and range request support"""
+    try:
+        path = field_file.path
+    except (ValueError, NotImplementedError):
+        raise Http404('File not found')
+    return serve_path(request, path, field_file.name, private)
+
+
+def serve_path(request, path, name, private=True):
+    """Serve the file at `path` (`name` relative to MEDIA_ROOT) with conditional and range request support"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404('File not found')
+
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    filename = os.path.basename(path)
+
+    offload = getattr(settings, 'MEDIA_OFFLOAD', '')
+    if offload:
+        # The front end does ranges and conditional requests itself
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            byte_range = None
+            if_range = request.headers.get('If-Range')
+            range_valid = not if_range or if_range == etag or parse_http_date_safe(if_range) == last_modified
+            if 'Range' in request.headers and range_valid:
+                byte_range = _parse_range(request.headers['Range'], size)
+
+            if byte_range is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+            if byte_range:
+                start, end = byte_range
+                length = end - start + 1
+                response = StreamingHttpResponse(
+                    _range_iterator(path, start, length), status=206, content_type=content_type
+                )
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+                response['Content-Length'] = str(length)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+    if private:
+        patch_cache_control(response, private=True, max_age=3600)
+    else:
+        patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+
+@require_safe
+def module_media(request, module_id, kind):
+    field_name = MODULE_FILE_FIELDS.get(kind)
+    if not field_name:
+        raise Http404('Unknown media type')
+    module = get_object_or_404(
+        Module.objects.select_related('course').only('id', 'is_preview', field_name, 'course', 'course__is_active'),
+        id=module_id,
+    )
+    field_file = getattr(module, field_name)
+    if not field_file:
+        raise Http404('No file uploaded')
+    if not _can_access_module(request.user, module):
+        # 404 rather than 403 so file existence is not disclosed
+        raise Http404('File not found')
+    return serve_file(request, field_file, private=not module.is_preview)
+
+
+@require_safe
+def course_video(request, course_id):
+    course = get_object_or_404(Course.objects.only('id', 'video_file'), id=course_id, is_active=True)
+    if not course.video_file:
+        raise Http404('No file uploaded')
+    # The course intro video is part of the public course page
+    return serve_file(request, course.video_file, private=False)
+
+
+def _serve_rendition(request, transcode, name, private):
+    """Serve a manifest, segment or poster from a finished transcode's output directory"""
+    if transcode is None:
+        raise Http404('No renditions available')
+    relative = os.path.normpath(os.path.join(transcode.output_dir, name))
+    if not relative.startswith(transcode.output_dir + os.sep):
+        raise Http404('File not found')
+    return serve_path(request, os.path.join(settings.MEDIA_ROOT, relative), relative, private)
+
+
+@require_safe
+def module_hls(request, module_id, name):
+    module = get_object_or_404(
+        Module.objects.select_related('course').only('id', 'is_preview', 'course', 'course__is_active'),
+        id=module_id,
+    )
+    if not _can_access_module(request.user, module):
+        raise Http404('File not found')
+    transcode = VideoTranscode.objects.filter(module_id=module.id, status='done').only('output_dir').first()
+    return _serve_rendition(request, transcode, name, private=not module.is_preview)
+
+
+@require_safe
+def course_hls(request, course_id, name):
+    get_object_or_404(Course.objects.only('id'), id=course_id, is_active=True)
+    transcode = VideoTranscode.objects.filter(course_id=course_id, status='done').only('output_dir').first()
+    return _serve_rendition(request, transcode, name, private=False)
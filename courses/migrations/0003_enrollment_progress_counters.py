@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Module = apps.get_model('courses', 'Module')
+    ModuleProgress = apps.get_model('courses', 'ModuleProgress')
+    module_counts = Module.objects.filter(course_id=OuterRef('course_id')).values('course_id').annotate(
+        n=Count('id')
+    ).values('n')
+    completed_counts = ModuleProgress.objects.filter(
+        enrollment_id=OuterRef('pk'), is_completed=True
+    ).values('enrollment_id').annotate(n=Count('id')).values('n')
+    Enrollment.objects.update(
+        total_modules=Coalesce(Subquery(module_counts), 0),
+        completed_modules=Coalesce(Subquery(completed_counts), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_enrollment_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_modules',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_modules',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS courses_search_index USING fts5(
+    title, short_description, description, module_text,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+POPULATE_INDEX = """
+INSERT INTO courses_search_index (rowid, title, short_description, description, module_text)
+SELECT c.id, c.title, c.short_description, c.description,
+       COALESCE((SELECT group_concat(m.title || ' ' || m.text_content, ' ')
+                 FROM courses_module m WHERE m.course_id = c.id), '')
+FROM courses_course c
+"""
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other backends use the icontains fallback in courses.search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_INDEX)
+    schema_editor.execute(POPULATE_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS courses_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_enrollment_progress_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Key in a partner catalog, used by `manage.py import_catalog`', max_length=100, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Key in a partner catalog, used by `manage.py import_catalog`', max_length=100, null=True, unique=True),
+        ),
+    ]
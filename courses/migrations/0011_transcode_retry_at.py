@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_transcode_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videotranscode',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, help_text='A failed job is not claimed again before this', null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 
@@ -20,9 +21,21 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True,
+                                   help_text="Key in a partner catalog, used by `manage.py import_catalog`")
+    
+    # Denormalized counters maintained by courses.signals (rebuild with `manage.py rebuild_course_counters`)
+    enrollment_count = models.PositiveIntegerField(default=0, editable=False)
+    active_enrollment_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Catalog keyset pages only ever read active courses
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_active=True), name='course_active_recent_idx'),
+            models.Index(fields=['-created_at', '-id'], name='course_recent_idx'),
+            models.Index(fields=['-enrollment_count'], name='course_enrollment_count_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -33,7 +46,21 @@ class Course(models.Model):
     
     @property
     def enrolled_count(self):
-        return self.enrollments.filter(is_active=True).count()
+        return self.active_enrollment_count
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored files so a new upload can be transcoded / resized
+        loaded = dict(zip(field_names, values))
+        instance._loaded_video_file = loaded.get('video_file')
+        instance._loaded_image = loaded.get('image')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_video_file = self.video_file.name
+        self._loaded_image = self.image.name
 
 
 class Module(models.Model):
@@ -58,6 +85,8 @@ class Module(models.Model):
     
     duration_minutes = models.PositiveIntegerField(default=0, help_text="Estimated duration in minutes")
     is_preview = models.BooleanField(default=False, help_text="Can be viewed without enrollment")
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True,
+                                   help_text="Key in a partner catalog, used by `manage.py import_catalog`")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -66,6 +95,32 @@ class Module(models.Model):
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_video_file = dict(zip(field_names, values)).get('video_file')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_video_file = self.video_file.name
+
+
+class EnrollmentQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        Bulk updates skip the post_save receivers that keep the Course enrollment
+        counters in step, so one that sets is_active recounts the courses it touched.
+        """
+        if 'is_active' not in kwargs:
+            return super().update(**kwargs)
+        from .services import recount_enrollment_counters
+        course_ids = set(self.values_list('course_id', flat=True))
+        with transaction.atomic(using=self.db):
+            rows = super().update(**kwargs)
+            recount_enrollment_counters(course_ids)
+        return rows
 
 
 class Enrollment(models.Model):
@@ -76,12 +131,46 @@ class Enrollment(models.Model):
     progress = models.PositiveIntegerField(default=0, validators=[MinValueValidator(0)], help_text="Percentage of completion")
     completed_at = models.DateTimeField(blank=True, null=True)
     
+    # Progress counters updated atomically by courses.services
+    completed_modules = models.PositiveIntegerField(default=0, editable=False)
+    total_modules = models.PositiveIntegerField(default=0, editable=False)
+    
+    objects = EnrollmentQuerySet.as_manager()
+    
     class Meta:
         unique_together = ('user', 'course')
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='enrollment_user_active_idx'),
+            models.Index(fields=['course', 'is_active'], name='enrollment_course_active_idx'),
+            models.Index(fields=['-enrolled_at'], name='enrollment_recent_idx'),
+            models.Index(fields=['completed_at'], condition=models.Q(completed_at__isnull=False), name='enrollment_completed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.course.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored active flag so the counter signals can detect changes
+        instance._loaded_is_active = dict(zip(field_names, values)).get('is_active')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        was_active = getattr(self, '_loaded_is_active', None)
+        update_fields = kwargs.get('update_fields')
+        self._is_active_changed = False
+        if (not self._state.adding and was_active is not None and was_active != self.is_active
+                and (update_fields is None or 'is_active' in update_fields)):
+            # Flip the flag with a conditional UPDATE first: of two concurrent saves making the
+            # same change only one matches the row, and only that one moves the counters
+            self._is_active_changed = bool(type(self)._base_manager.filter(
+                pk=self.pk, is_active=was_active
+            ).update(is_active=self.is_active))
+        super().save(*args, **kwargs)
+        # Reset after every post_save receiver has looked at _is_active_changed
+        self._loaded_is_active = self.is_active
 
 
 class ModuleProgress(models.Model):
@@ -92,6 +181,94 @@ class ModuleProgress(models.Model):
     
     class Meta:
         unique_together = ('enrollment', 'module')
+        indexes = [
+            # Completed-only rows, covering the completed module id lookups
+            models.Index(fields=['enrollment', 'module'], condition=models.Q(is_completed=True), name='progress_completed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.enrollment.user.username} - {self.module.title}"
+
+
+class CourseSimilarity(models.Model):
+    """Top-K co-enrollment neighbours of a course, rebuilt by `manage.py build_recommendations`"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='neighbours')
+    similar_course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField(help_text="Cosine similarity of the two courses' enrolled users")
+    co_enrollments = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('course', 'similar_course')
+        verbose_name_plural = 'course similarities'
+    
+    def __str__(self):
+        return f"{self.course_id} -> {self.similar_course_id} ({self.score:.3f})"
+
+
+class VideoTranscode(models.Model):
+    """HLS renditions of an uploaded module or course video, produced by `manage.py transcode_videos`"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    module = models.OneToOneField(Module, on_delete=models.CASCADE, null=True, blank=True, related_name='transcode')
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='transcode')
+    source_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percentage of the current run")
+    attempts = models.PositiveIntegerField(default=0)
+    locked_by = models.CharField(max_length=32, blank=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True, help_text="Last sign of life from the worker processing it")
+    retry_at = models.DateTimeField(blank=True, null=True, help_text="A failed job is not claimed again before this")
+    
+    # Output, relative to MEDIA_ROOT
+    output_dir = models.CharField(max_length=255, blank=True)
+    renditions = models.JSONField(default=list, blank=True)
+    duration_seconds = models.FloatField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='transcode_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source_name} ({self.status})"
+
+
+class ChunkedUpload(models.Model):
+    """A large media file uploaded in Content-Range chunks through courses.upload_views"""
+    KIND_CHOICES = (
+        ('video', 'Video'),
+        ('pdf', 'PDF Document'),
+    )
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+        ('attached', 'Attached'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0, help_text="Bytes received so far")
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected checksum of the whole file, if known")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='chunked_upload_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
@@ -0,0 +1,93 @@
+"""
+Whole-page cache for the public catalog pages.
+
+Anonymous visitors all see the same course list and course detail pages, so
+those responses are stored in the `pages` cache under keys that embed a
+version token. courses.signals bumps the catalog token when a course is saved
+or deleted and the course's own token when the course or one of its modules
+changes, which orphans every stale page at once. Cached pages carry an ETag
+and a Last-Modified taken from Course.updated_at, so conditional GETs are
+answered with 304 without touching the database or the template engine.
+"""
+import hashlib
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from lms_platform.routers import use_primary
+
+PAGE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 5 * 60)
+
+
+def _cache():
+    return caches['pages']
+
+
+def _version_key(scope):
+    return f'courses:version:{scope}'
+
+
+def get_version(scope):
+    """Current version token for a scope ('catalog' or 'course:<id>')"""
+    key = _version_key(scope)
+    version = _cache().get(key)
+    if version is None:
+        _cache().add(key, uuid.uuid4().hex[:12], None)
+        version = _cache().get(key)
+    return version
+
+
+def bump_version(*scopes):
+    for scope in scopes:
+        _cache().set(_version_key(scope), uuid.uuid4().hex[:12], None)
+
+
+def cache_anonymous_page(scopes, last_modified):
+    """
+    Serve anonymous GETs of a view from the page cache.
+
+    scopes(**kwargs) lists the version scopes the page depends on;
+    last_modified(**kwargs) returns the datetime sent as Last-Modified and is
+    only called when the page has to be rendered.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            # Logged-in pages are personalised, and pending flash messages are per-visitor
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or len(messages.get_messages(request))):
+                return view_func(request, *args, **kwargs)
+
+            versions = '-'.join(get_version(scope) for scope in scopes(**kwargs))
+            path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f'courses:page:{view_func.__name__}:{versions}:{path_hash}'
+            entry = _cache().get(key)
+            if entry is None:
+                # A page cached for minutes must not be rendered from a lagging replica
+                with use_primary():
+                    response = view_func(request, *args, **kwargs)
+                    if response.status_code != 200 or response.streaming:
+                        return response
+                    modified = last_modified(**kwargs)
+                entry = {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'etag': f'"{hashlib.md5(response.content).hexdigest()}"',
+                    'last_modified': int(modified.timestamp()) if modified else None,
+                }
+                _cache().set(key, entry, PAGE_TIMEOUT)
+
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            response['ETag'] = entry['etag']
+            if entry['last_modified'] is not None:
+                response['Last-Modified'] = http_date(entry['last_modified'])
+            patch_vary_headers(response, ('Cookie',))
+            return get_conditional_response(
+                request, etag=entry['etag'], last_modified=entry['last_modified'], response=response
+            )
+        return wrapper
+    return decorator
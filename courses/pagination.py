@@ -0,0 +1,125 @@
+"""
+Keyset (cursor) pagination for the catalog and admin listings.
+
+Pages are ordered by (field, id) descending and the cursor encodes the last
+row of the previous page, so each page is an index range scan instead of an
+OFFSET scan and stays stable while rows are inserted.
+"""
+import base64
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, request, cursor_param):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self._request = request
+        self._cursor_param = cursor_param
+    
+    def __iter__(self):
+        return iter(self.items)
+    
+    def __len__(self):
+        return len(self.items)
+    
+    @property
+    def next_query(self):
+        """Current query string with the cursor advanced to the next page"""
+        params = self._request.GET.copy()
+        params[self._cursor_param] = self.next_cursor
+        return params.urlencode()
+    
+    @property
+    def first_query(self):
+        params = self._request.GET.copy()
+        params.pop(self._cursor_param, None)
+        return params.urlencode()
+    
+    @property
+    def is_first(self):
+        return not self._request.GET.get(self._cursor_param)
+
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat() if hasattr(value, "isoformat") else value}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse=None):
+    """
+    Return (value, pk) or None for a missing or malformed cursor.
+    
+    parse(value) converts the value and raises ValueError or ValidationError
+    (or returns None) when it is not a value the cursor can hold.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        pk = int(pk)
+        if parse is not None:
+            value = parse(value)
+    except (ValueError, TypeError, ValidationError, UnicodeDecodeError):
+        return None
+    if value is None or pk < 0:
+        return None
+    return value, pk
+
+
+def _parse_rank(value):
+    return value if value == 'rank' else None
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate_keyset(request, queryset, field='created_at', page_size=None, cursor_param='cursor'):
+    """Return one KeysetPage of queryset ordered by -field, -id"""
+    page_size = page_size or get_page_size(request)
+    queryset = queryset.order_by(f'-{field}', '-id')
+    
+    # A cursor from another listing, or a hand-edited one, falls back to the first page
+    position = decode_cursor(request.GET.get(cursor_param), queryset.model._meta.get_field(field).to_python)
+    if position:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+    
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(items, next_cursor, request, cursor_param)
+
+
+def paginate_ranked(request, queryset, ranked_ids, page_size=None, cursor_param='cursor'):
+    """
+    Page through queryset rows in the order of an already-ranked id list
+    (e.g. search results). The cursor is the rank position of the next page.
+    """
+    page_size = page_size or get_page_size(request)
+    visible = set(queryset.filter(id__in=ranked_ids).values_list('id', flat=True))
+    ranked_ids = [pk for pk in ranked_ids if pk in visible]
+    
+    position = decode_cursor(request.GET.get(cursor_param), _parse_rank)
+    start = position[1] if position else 0
+    page_ids = ranked_ids[start:start + page_size]
+    
+    rows = {obj.pk: obj for obj in queryset.filter(id__in=page_ids)} if page_ids else {}
+    items = [rows[pk] for pk in page_ids if pk in rows]
+    next_cursor = None
+    if start + page_size < len(ranked_ids):
+        next_cursor = encode_cursor('rank', start + page_size)
+    return KeysetPage(items, next_cursor, request, cursor_param)
@@ -0,0 +1,98 @@
+"""
+Co-enrollment course recommendations.
+
+`manage.py build_recommendations` turns the active enrollments into a sparse
+user x course matrix X, takes the course co-occurrence counts X.T @ X, scales
+them to cosine similarity and keeps the top-K neighbours of every course in
+CourseSimilarity. The dashboard then ranks a user's candidates with one query
+over that table. NumPy and SciPy are only needed by the batch job.
+"""
+from itertools import chain
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import Course, CourseSimilarity, Enrollment, Module
+
+DEFAULT_TOP_K = 20
+DEFAULT_MIN_OVERLAP = 2
+
+
+def compute_neighbours(user_ids, course_ids, top_k=DEFAULT_TOP_K, min_overlap=DEFAULT_MIN_OVERLAP):
+    """
+    Top-K cosine neighbours from parallel arrays of (user id, course id) pairs.
+
+    Returns (course ids, neighbour ids, scores, co-enrollment counts) arrays,
+    grouped by course and best neighbour first.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    courses, course_idx = np.unique(course_ids, return_inverse=True)
+    _, user_idx = np.unique(user_ids, return_inverse=True)
+    n_users, n_courses = int(user_idx.max()) + 1, len(courses)
+
+    users_by_course = sparse.csr_matrix(
+        (np.ones(len(user_idx), dtype=np.int32), (user_idx, course_idx)), shape=(n_users, n_courses)
+    )
+    # Duplicate pairs were summed on construction; a user counts once per course
+    users_by_course.data[:] = 1
+    overlap = (users_by_course.T @ users_by_course).tocsr()
+    enrolled = overlap.diagonal().astype(np.float64)
+    overlap.setdiag(0)
+    overlap.data[overlap.data < min_overlap] = 0
+    overlap.eliminate_zeros()
+
+    rows = np.repeat(np.arange(n_courses), np.diff(overlap.indptr))
+    cols = overlap.indices
+    scores = overlap.data / np.sqrt(enrolled[rows] * enrolled[cols])
+
+    # Sort each row by descending score (ties by overlap) and keep the first top_k
+    order = np.lexsort((-overlap.data, -scores, rows))
+    rank = np.arange(len(order)) - overlap.indptr[rows[order]]
+    keep = order[rank < top_k]
+    return courses[rows[keep]], courses[cols[keep]], scores[keep], overlap.data[keep]
+
+
+def rebuild_recommendations(top_k=DEFAULT_TOP_K, min_overlap=DEFAULT_MIN_OVERLAP, batch_size=5000):
+    """Recompute CourseSimilarity from the active enrollments; returns the number of rows written"""
+    import numpy as np
+
+    pairs = Enrollment.objects.filter(
+        is_active=True, course__is_active=True
+    ).order_by().values_list('user_id', 'course_id')
+    # Stream the pairs straight into one array rather than a list of tuples
+    flat = np.fromiter(chain.from_iterable(pairs.iterator(chunk_size=batch_size)), dtype=np.int64)
+
+    rows = []
+    if len(flat):
+        pairs = flat.reshape(-1, 2)
+        sources, targets, scores, overlaps = compute_neighbours(pairs[:, 0], pairs[:, 1], top_k, min_overlap)
+        rows = [
+            CourseSimilarity(course_id=source, similar_course_id=target, score=score, co_enrollments=count)
+            for source, target, score, count in zip(
+                sources.tolist(), targets.tolist(), scores.tolist(), overlaps.tolist()
+            )
+        ]
+
+    with transaction.atomic():
+        CourseSimilarity.objects.all().delete()
+        CourseSimilarity.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def recommend_courses(enrolled_course_ids, limit=6):
+    """Active courses most similar to the given ones, best first, with module_count annotated"""
+    if not enrolled_course_ids:
+        return []
+    module_count = Module.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(
+        total=Count('id')
+    ).values('total')
+    return list(Course.objects.filter(
+        is_active=True,
+        neighbour_of__course_id__in=enrolled_course_ids,
+    ).exclude(
+        id__in=enrolled_course_ids
+    ).annotate(
+        recommendation_score=Sum('neighbour_of__score'),
+        module_count=Coalesce(Subquery(module_count), 0),
+    ).order_by('-recommendation_score', '-id')[:limit])
@@ -0,0 +1,135 @@
+"""
+Full-text search over course and module text.
+
+On SQLite the index is an FTS5 virtual table keyed by course id (rowid), kept
+in sync by the signals in courses.signals. Other database backends fall back
+to the icontains lookups the catalog used before.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import strip_tags
+from .models import Course, Module
+
+SEARCH_TABLE = 'courses_search_index'
+
+# bm25 column weights: title, short_description, description, module_text
+COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+MAX_RESULTS = 500
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query where every term is a quoted prefix match"""
+    terms = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _document_rows(course_ids):
+    """Yield (course_id, title, short_description, description, module_text) tuples"""
+    module_text = {}
+    modules = Module.objects.filter(course_id__in=course_ids).values_list(
+        'course_id', 'title', 'text_content'
+    ).order_by('course_id', 'order')
+    for course_id, title, text_content in modules:
+        module_text.setdefault(course_id, []).extend([title, strip_tags(text_content)])
+    
+    courses = Course.objects.filter(id__in=course_ids).values_list(
+        'id', 'title', 'short_description', 'description'
+    )
+    for course_id, title, short_description, description in courses:
+        yield (
+            course_id,
+            title,
+            short_description,
+            strip_tags(description),
+            ' '.join(module_text.get(course_id, [])),
+        )
+
+
+def index_courses(course_ids):
+    """(Re)index the given courses, dropping any that no longer exist"""
+    if not fts_enabled() or not course_ids:
+        return
+    course_ids = list(course_ids)
+    placeholders = ', '.join(['%s'] * len(course_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', course_ids)
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, short_description, description, module_text) '
+            f'VALUES (%s, %s, %s, %s, %s)',
+            list(_document_rows(course_ids)),
+        )
+
+
+def remove_course(course_id):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [course_id])
+
+
+def rebuild_index(batch_size=500):
+    """Rebuild the whole index; returns the number of indexed courses"""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    
+    indexed = 0
+    batch = []
+    for course_id in Course.objects.values_list('id', flat=True).order_by('id').iterator(chunk_size=batch_size):
+        batch.append(course_id)
+        if len(batch) == batch_size:
+            index_courses(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        index_courses(batch)
+        indexed += len(batch)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def search_course_ids(query, limit=MAX_RESULTS, queryset=None):
+    """
+    Return ids of the courses in `queryset` (default: all) matching the query,
+    best match first. The queryset's filters are applied inside the search, so
+    the limit counts only courses the caller can show.
+    """
+    if queryset is None:
+        queryset = Course.objects.all()
+    if not fts_enabled():
+        return list(icontains_search(query, queryset).values_list('id', flat=True)[:limit])
+    
+    match = build_match_query(query)
+    if not match:
+        return []
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    candidates, params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid IN ({candidates}) '
+            f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s',
+            [match, *params, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def icontains_search(query, queryset=None):
+    """The unindexed LIKE '%q%' lookup, kept as a fallback and benchmark baseline"""
+    if queryset is None:
+        queryset = Course.objects.all()
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(short_description__icontains=query) |
+        Q(description__icontains=query) |
+        Q(modules__title__icontains=query) |
+        Q(modules__text_content__icontains=query)
+    ).distinct()
@@ -0,0 +1,160 @@
+from django.db import IntegrityError, transaction
+from django.dispatch import Signal
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import Course, Enrollment, Module, ModuleProgress
+from .cache import invalidate_completed_modules
+
+
+# Sent once when an enrollment first reaches 100% (args: enrollment, completed_at)
+enrollment_completed = Signal()
+
+
+def _progress_expression(completed):
+    """SQL expression for the integer completion percentage"""
+    return Case(
+        When(total_modules__gt=0, then=completed * 100 / F('total_modules')),
+        default=Value(0),
+    )
+
+
+def complete_module(enrollment, module):
+    """
+    Mark a module complete for an enrollment and bump its progress counters.
+    
+    Returns the new progress percentage. A repeat completion is a no-op that
+    writes nothing and returns the enrollment's current progress.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            ModuleProgress.objects.create(
+                enrollment=enrollment,
+                module=module,
+                is_completed=True,
+                completed_at=now,
+            )
+    except IntegrityError:
+        # Row already exists; only flip it if it was never completed
+        newly_completed = ModuleProgress.objects.filter(
+            enrollment=enrollment,
+            module=module,
+            is_completed=False,
+        ).update(is_completed=True, completed_at=now)
+        if not newly_completed:
+            return enrollment.progress
+    
+    invalidate_completed_modules(enrollment.pk)
+    
+    # Single UPDATE: SET expressions see the pre-update column values
+    completed = F('completed_modules') + 1
+    Enrollment.objects.filter(pk=enrollment.pk).update(
+        completed_modules=completed,
+        progress=_progress_expression(completed),
+    )
+    # Only the request that moves completed_at from NULL gets a row back, so the signal fires once
+    first_completion = Enrollment.objects.filter(
+        pk=enrollment.pk,
+        completed_at__isnull=True,
+        total_modules__gt=0,
+        completed_modules__gte=F('total_modules'),
+    ).update(completed_at=now)
+    
+    # Concurrent completions and module changes may have moved the counters since the enrollment was loaded
+    current = Enrollment.objects.filter(pk=enrollment.pk).values(
+        'completed_modules', 'progress', 'completed_at'
+    ).get()
+    enrollment.completed_modules = current['completed_modules']
+    enrollment.progress = current['progress']
+    enrollment.completed_at = current['completed_at']
+    if first_completion:
+        enrollment_completed.send(sender=Enrollment, enrollment=enrollment, completed_at=now)
+    return enrollment.progress
+
+
+def enroll_user(user, course):
+    """
+    Idempotently enroll a user in a course; safe under concurrent calls.
+    
+    The common case is a single INSERT. If the (user, course) row already
+    exists the unique constraint rejects the insert inside a savepoint and the
+    existing row is returned, reactivated if it had been deactivated.
+    Returns (enrollment, created).
+    """
+    try:
+        with transaction.atomic():
+            return Enrollment.objects.create(user=user, course=course), True
+    except IntegrityError:
+        pass
+    
+    with transaction.atomic():
+        enrollment = Enrollment.objects.select_for_update().get(user=user, course=course)
+        if not enrollment.is_active:
+            enrollment.is_active = True
+            enrollment.save(update_fields=['is_active'])
+    return enrollment, False
+
+
+def recount_module_totals(course_ids):
+    """
+    Reset the module counters and progress of every enrollment in the given courses.
+    
+    total_modules comes from the course's modules and completed_modules from
+    the completed progress rows on them, so a module that moved to another
+    course counts only there.
+    """
+    module_count = Module.objects.filter(course_id=OuterRef('course_id')).order_by().values(
+        'course_id'
+    ).annotate(count=Count('id')).values('count')
+    completed_count = ModuleProgress.objects.filter(
+        enrollment_id=OuterRef('pk'), is_completed=True, module__course_id=OuterRef('course_id'),
+    ).order_by().values('enrollment_id').annotate(count=Count('id')).values('count')
+    enrollments = Enrollment.objects.filter(course_id__in=course_ids)
+    enrollments.update(
+        total_modules=Coalesce(Subquery(module_count), 0),
+        completed_modules=Coalesce(Subquery(completed_count), 0),
+    )
+    enrollments.update(progress=_progress_expression(F('completed_modules')))
+    enrollments.filter(
+        completed_at__isnull=False,
+        completed_modules__lt=F('total_modules'),
+    ).update(completed_at=None)
+
+
+def recount_enrollment_counters(course_ids):
+    """Reset enrollment_count and active_enrollment_count of the given courses from their enrollments"""
+    enrollments = Enrollment.objects.filter(course_id=OuterRef('pk')).order_by().values('course_id')
+    Course.objects.filter(id__in=course_ids).update(
+        enrollment_count=Coalesce(Subquery(enrollments.annotate(count=Count('id')).values('count')), 0),
+        active_enrollment_count=Coalesce(Subquery(
+            enrollments.filter(is_active=True).annotate(count=Count('id')).values('count')
+        ), 0),
+    )
+
+
+def set_initial_module_total(enrollment):
+    """Seed a new enrollment's total_modules from its course"""
+    module_count = Module.objects.filter(course_id=enrollment.course_id).count()
+    if module_count:
+        Enrollment.objects.filter(pk=enrollment.pk).update(total_modules=module_count)
+    enrollment.total_modules = module_count
+
+
+def adjust_module_totals(course_id, delta, removed_module_id=None):
+    """Shift total_modules for every enrollment in a course and recompute progress in bulk"""
+    enrollments = Enrollment.objects.filter(course_id=course_id)
+    
+    if removed_module_id is not None:
+        enrollments.filter(
+            module_progress__module_id=removed_module_id,
+            module_progress__is_completed=True,
+        ).update(completed_modules=Greatest(F('completed_modules') - 1, 0))
+    
+    enrollments.update(total_modules=Greatest(F('total_modules') + delta, 0))
+    enrollments.update(progress=_progress_expression(F('completed_modules')))
+    # A new module reopens a finished course; finish_course stamps it again
+    enrollments.filter(
+        completed_at__isnull=False,
+        completed_modules__lt=F('total_modules'),
+    ).update(completed_at=None)
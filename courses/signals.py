@@ -0,0 +1,92 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Course, Module, Enrollment
+from . import search
+from .cache import invalidate_course_outline, invalidate_recommendation_candidates
+from .page_cache import bump_version
+from .transcoding import drop_transcode, queue_transcode
+from .images import schedule_variants
+from .services import adjust_module_totals, set_initial_module_total
+
+
+def _adjust_course_counters(course_id, total=0, active=0):
+    # Clamp at zero so a drifted counter never violates the unsigned column
+    updates = {}
+    if total:
+        updates['enrollment_count'] = Greatest(F('enrollment_count') + total, 0)
+    if active:
+        updates['active_enrollment_count'] = Greatest(F('active_enrollment_count') + active, 0)
+    if updates:
+        Course.objects.filter(pk=course_id).update(**updates)
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    
+    if created:
+        _adjust_course_counters(instance.course_id, total=1, active=1 if instance.is_active else 0)
+        set_initial_module_total(instance)
+    elif getattr(instance, '_is_active_changed', False):
+        _adjust_course_counters(instance.course_id, active=1 if instance.is_active else -1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    was_active = getattr(instance, '_loaded_is_active', instance.is_active)
+    _adjust_course_counters(instance.course_id, total=-1, active=-1 if was_active else 0)
+
+
+@receiver(post_save, sender=Module)
+def module_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_module_totals(instance.course_id, 1)
+
+
+@receiver(pre_delete, sender=Module)
+def module_deleting(sender, instance, **kwargs):
+    # Runs before the cascade removes the ModuleProgress rows we need to count
+    adjust_module_totals(instance.course_id, -1, removed_module_id=instance.pk)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_courses([instance.pk])
+        invalidate_recommendation_candidates()
+        bump_version('catalog', f'course:{instance.pk}')
+        if instance.image.name != getattr(instance, '_loaded_image', None):
+            schedule_variants(instance.image)
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    search.remove_course(instance.pk)
+    invalidate_recommendation_candidates()
+    bump_version('catalog', f'course:{instance.pk}')
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def module_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_courses([instance.course_id])
+        invalidate_course_outline(instance.course_id)
+        # Module edits count as course edits for Last-Modified and the detail page cache
+        Course.objects.filter(pk=instance.course_id).update(updated_at=timezone.now())
+        bump_version(f'course:{instance.course_id}')
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Course)
+def video_uploaded(sender, instance, raw=False, **kwargs):
+    if raw or instance.video_file.name == getattr(instance, '_loaded_video_file', None):
+        return
+    if instance.video_file:
+        queue_transcode(instance)
+    elif getattr(instance, '_loaded_video_file', None):
+        drop_transcode(instance)
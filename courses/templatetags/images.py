@@ -0,0 +1,29 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+from courses.images import get_variants
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 576px) 100vw, (max-width: 992px) 50vw, 33vw'
+
+
+@register.simple_tag
+def responsive_image(field_file, alt='', css_class='', sizes=DEFAULT_SIZES, style=''):
+    """
+    <picture> with WebP and JPEG srcsets for an uploaded image.
+
+    Falls back to a plain <img> of the original until the variants exist.
+    """
+    if not field_file:
+        return ''
+    variants = get_variants(field_file)
+    if not variants:
+        return format_html('<img src="{}" class="{}" alt="{}" style="{}" loading="lazy">',
+                           field_file.url, css_class, alt, style)
+    (_, fallback_srcset) = variants[-1]
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">',
+                               ((mime, srcset, sizes) for mime, srcset in variants[:-1]))
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="lazy"></picture>',
+        sources, field_file.url, fallback_srcset, sizes, css_class, alt, style,
+    )
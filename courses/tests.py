@@ -1,3 +1,1076 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import User
+from lms_platform import benchmarks, scale_data
+from lms_platform.database import database_config
+from lms_platform.replication import replicate
+from lms_platform.routers import PIN_COOKIE, ReplicaRoutingMiddleware
+from lms_platform.query_budget import QueryBudgetMiddleware, QueryBudgetTestMixin
+from . import uploads, urls
+from analytics.models import DailyRollup
+from analytics.services import get_snapshot
+from payments import gateway
+from payments.models import Payment, PaymentEvent
+from .models import ChunkedUpload, Course, CourseSimilarity, Enrollment, Module, ModuleProgress, VideoTranscode
+from .services import complete_module, enroll_user, enrollment_completed
+from .recommendations import rebuild_recommendations, recommend_courses
+from .forms import ModuleForm
+from .images import schedule_variants
+from .pagination import encode_cursor
+from .search import search_course_ids
+from . import ffmpeg, transcoding
+from .admin_views import _export_queryset
+
+
+class EnrollUserTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.student = User.objects.create_user('student', password='x')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+
+    def test_second_call_returns_existing_enrollment(self):
+        first, created = enroll_user(self.student, self.course)
+        second, created_again = enroll_user(self.student, self.course)
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, second.pk)
+
+    def test_inactive_enrollment_is_reactivated(self):
+        enrollment, _ = enroll_user(self.student, self.course)
+        enrollment.is_active = False
+        enrollment.save()
+
+        enrollment, created = enroll_user(self.student, self.course)
+        self.assertFalse(created)
+        self.assertTrue(enrollment.is_active)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 1)
+        self.assertEqual(self.course.active_enrollment_count, 1)
+
+
+class CourseCounterTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.students = [User.objects.create_user(f'student{i}', password='x') for i in range(3)]
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+
+    def counters(self):
+        self.course.refresh_from_db()
+        return self.course.enrollment_count, self.course.active_enrollment_count
+
+    def test_counters_follow_enrollment_changes(self):
+        enrollments = [enroll_user(student, self.course)[0] for student in self.students]
+        self.assertEqual(self.counters(), (3, 3))
+        enrollments[0].is_active = False
+        enrollments[0].save()
+        self.assertEqual(self.counters(), (3, 2))
+        enroll_user(self.students[0], self.course)
+        self.assertEqual(self.counters(), (3, 3))
+        enrollments[1].is_active = False
+        enrollments[1].save()
+        enrollments[1].delete()
+        enrollments[2].delete()
+        self.assertEqual(self.counters(), (1, 1))
+
+    def test_concurrent_deactivations_count_once(self):
+        enrollment, _ = enroll_user(self.students[0], self.course)
+        enroll_user(self.students[1], self.course)
+        first = Enrollment.objects.get(pk=enrollment.pk)
+        second = Enrollment.objects.get(pk=enrollment.pk)
+        for copy in (first, second):
+            copy.is_active = False
+            copy.save()
+        self.assertEqual(self.counters(), (2, 1))
+        self.assertEqual(get_snapshot().active_enrollments, 1)
+
+    def test_bulk_update_recounts(self):
+        for student in self.students:
+            enroll_user(student, self.course)
+        self.assertEqual(Enrollment.objects.filter(user__in=self.students[:2]).update(is_active=False), 2)
+        self.assertEqual(self.counters(), (3, 1))
+
+    def test_rebuild_command_repairs_drift(self):
+        for student in self.students:
+            enroll_user(student, self.course)
+        Course.objects.filter(pk=self.course.pk).update(enrollment_count=7, active_enrollment_count=0)
+
+        stdout = io.StringIO()
+        call_command('rebuild_course_counters', verify=True, stdout=stdout)
+        self.assertIn(f'Course {self.course.id}: expected 3 total / 3 active', stdout.getvalue())
+        self.assertEqual(self.counters(), (7, 0))
+
+        call_command('rebuild_course_counters', stdout=io.StringIO())
+        self.assertEqual(self.counters(), (3, 3))
+        stdout = io.StringIO()
+        call_command('rebuild_course_counters', verify=True, stdout=stdout)
+        self.assertIn('All course counters are consistent', stdout.getvalue())
+
+
+class EnrollmentAnalyticsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.student = User.objects.create_user('student', password='x')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        Module.objects.create(course=self.course, title='Variables', order=1)
+
+    def rollup(self):
+        return DailyRollup.objects.filter(course=self.course).values_list('new_enrollments', 'completions').get()
+
+    def test_deleted_enrollment_is_taken_out_of_the_rollups(self):
+        enrollment, _ = enroll_user(self.student, self.course)
+        complete_module(enrollment, self.course.modules.get())
+        self.assertEqual(self.rollup(), (1, 1))
+        self.assertEqual(get_snapshot().total_enrollments, 1)
+
+        with self.assertNumQueries(6):
+            # The delete, progress cascade, course counters, snapshot and two rollup rows; no recompute
+            enrollment.delete()
+        self.assertEqual(self.rollup(), (0, 0))
+        self.assertEqual(get_snapshot().total_enrollments, 0)
+
+
+class ModuleCompletionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.student = User.objects.create_user('student', password='x')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        self.first = Module.objects.create(course=self.course, title='Variables', order=1)
+        self.second = Module.objects.create(course=self.course, title='Loops', order=2)
+        self.enrollment, _ = enroll_user(self.student, self.course)
+        self.completions = []
+        enrollment_completed.connect(self.on_completed)
+        self.addCleanup(enrollment_completed.disconnect, self.on_completed)
+
+    def on_completed(self, sender, enrollment, completed_at, **kwargs):
+        self.completions.append(enrollment.pk)
+
+    def stored(self):
+        return Enrollment.objects.values_list('completed_modules', 'total_modules', 'progress').get(pk=self.enrollment.pk)
+
+    def test_repeat_completion_is_a_no_op(self):
+        self.assertEqual(complete_module(self.enrollment, self.first), 50)
+        self.assertEqual(complete_module(self.enrollment, self.first), 50)
+        self.assertEqual(self.stored(), (1, 2, 50))
+
+    def test_completion_fires_once_from_stale_instances(self):
+        stale = Enrollment.objects.get(pk=self.enrollment.pk)
+        complete_module(self.enrollment, self.first)
+        # Loaded before the first completion; the counters come back from the database
+        self.assertEqual(complete_module(stale, self.second), 100)
+        self.assertEqual(stale.completed_modules, 2)
+        self.assertIsNotNone(stale.completed_at)
+        self.assertEqual(self.completions, [self.enrollment.pk])
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(completed_modules=1)
+        ModuleProgress.objects.filter(module=self.second).update(is_completed=False)
+        complete_module(stale, self.second)
+        self.assertEqual(self.completions, [self.enrollment.pk])
+
+    def test_added_module_reopens_and_deleted_module_adjusts_totals(self):
+        complete_module(self.enrollment, self.first)
+        complete_module(self.enrollment, self.second)
+        third = Module.objects.create(course=self.course, title='Functions', order=3)
+        self.assertEqual(self.stored(), (2, 3, 66))
+        self.assertIsNone(Enrollment.objects.get(pk=self.enrollment.pk).completed_at)
+
+        self.first.delete()
+        self.assertEqual(self.stored(), (1, 2, 50))
+        third.delete()
+        self.assertEqual(self.stored(), (1, 1, 100))
+        self.client.force_login(self.student)
+        self.client.post(reverse('finish_course', args=[self.course.id]))
+        self.assertIsNotNone(Enrollment.objects.get(pk=self.enrollment.pk).completed_at)
+        self.assertEqual(self.completions, [self.enrollment.pk, self.enrollment.pk])
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.python, self.django, self.sql, self.design = [
+            Course.objects.create(title=title, description='x', created_by=self.admin)
+            for title in ('Python', 'Django', 'SQL', 'Design')
+        ]
+        # Python learners mostly go on to Django, sometimes SQL, never Design
+        plans = [
+            (self.python, self.django), (self.python, self.django), (self.python, self.django, self.sql),
+            (self.python, self.sql), (self.design,), (self.design,),
+        ]
+        for i, courses in enumerate(plans):
+            user = User.objects.create_user(f'learner{i}', password='x')
+            for course in courses:
+                enroll_user(user, course)
+
+    def test_neighbours_ranked_by_co_enrollment(self):
+        rebuild_recommendations(top_k=5, min_overlap=1)
+        neighbours = list(CourseSimilarity.objects.filter(course=self.python).order_by('-score'))
+        self.assertEqual([n.similar_course_id for n in neighbours], [self.django.id, self.sql.id])
+        self.assertEqual(neighbours[0].co_enrollments, 3)
+        self.assertFalse(CourseSimilarity.objects.filter(course=self.design).exists())
+
+    def test_recommendations_exclude_enrolled_courses(self):
+        rebuild_recommendations(top_k=5, min_overlap=1)
+        self.assertEqual(recommend_courses([self.python.id]), [self.django, self.sql])
+        self.assertEqual(recommend_courses([self.python.id, self.django.id]), [self.sql])
+        self.assertEqual(recommend_courses([]), [])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        for i in range(3):
+            Course.objects.create(title=f'Course {i}', description='Basics', created_by=self.admin)
+
+    def test_malformed_cursors_serve_the_first_page(self):
+        self.client.force_login(self.admin)
+        first = self.client.get(reverse('course_list'), {'format': 'json', 'page_size': 2}).json()
+        bad_cursors = ['garbage|5', 'rank|24', '2025-13-45T00:00|3', 'not base64 at all', f'{timezone.now().isoformat()}|-1']
+        for raw in bad_cursors:
+            cursor = encode_cursor(*raw.rsplit('|', 1)) if '|' in raw else raw
+            for url_name in ('course_list', 'admin_course_list'):
+                with self.subTest(cursor=raw, url=url_name):
+                    response = self.client.get(reverse(url_name), {'cursor': cursor, 'format': 'json', 'page_size': 2})
+                    self.assertEqual(response.status_code, 200)
+                    if url_name == 'course_list':
+                        self.assertEqual(response.json()['results'], first['results'])
+
+    def test_cursors_walk_every_page(self):
+        titles, cursor = [], ''
+        while True:
+            page = self.client.get(reverse('course_list'), {'format': 'json', 'page_size': 2, 'cursor': cursor}).json()
+            titles += [course['title'] for course in page['results']]
+            if not page['has_next']:
+                break
+            cursor = page['next_cursor']
+        self.assertEqual(sorted(titles), ['Course 0', 'Course 1', 'Course 2'])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+
+    def test_filters_apply_before_the_result_limit(self):
+        for i in range(3):
+            Course.objects.create(title=f'Python {i}', description='Basics', created_by=self.admin, is_active=False)
+        Course.objects.create(title='Python paid', description='Basics', created_by=self.admin, course_type='paid')
+        visible = Course.objects.create(title='Web', description='Python for the web', created_by=self.admin)
+
+        queryset = Course.objects.filter(is_active=True, course_type='free')
+        self.assertEqual(search_course_ids('python', limit=1, queryset=queryset), [visible.id])
+        self.assertEqual(len(search_course_ids('python')), 5)
+        response = self.client.get(reverse('course_list'), {'search': 'python', 'type': 'free', 'format': 'json'})
+        self.assertEqual([course['id'] for course in response.json()['results']], [visible.id])
+
+
+class CatalogPageCacheTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        self.url = f'/courses/{self.course.id}/'
+
+    def test_anonymous_page_is_cached_and_revalidated(self):
+        first = self.client.get(self.url)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_module_change_invalidates_page(self):
+        first = self.client.get(self.url)
+        Module.objects.create(course=self.course, title='Variables', order=1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Variables')
+
+    def test_logged_in_users_bypass_page_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        self.assertNotIn('ETag', response)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.student = User.objects.create_user('student', password='x')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        self.module = Module.objects.create(course=self.course, title='Intro', order=1, module_type='video')
+        self.module.video_file.save('intro.mp4', ContentFile(bytes(range(256)) * 4))
+        self.url = f'/courses/media/module/{self.module.id}/video/'
+
+    def test_requires_enrollment_unless_preview(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.module.is_preview = True
+        self.module.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_range_and_conditional_requests(self):
+        enroll_user(self.student, self.course)
+        self.client.force_login(self.student)
+
+        full = self.client.get(self.url)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(b''.join(full.streaming_content), bytes(range(256)) * 4)
+
+        partial = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(partial.streaming_content), bytes(range(10, 20)))
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-6')
+        self.assertEqual(b''.join(suffix.streaming_content), bytes(range(250, 256)))
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=5000-').status_code, 416)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=full['ETag']).status_code, 304)
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect')
+    def test_offload_to_front_end(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.module.video_file.name)
+        self.assertEqual(response.content, b'')
+
+
+class TranscodeQueueTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        self.module = Module.objects.create(course=self.course, title='Intro', order=1, module_type='video')
+
+    def test_upload_queues_job_once(self):
+        self.module.video_file.save('intro.mp4', ContentFile(b'video'))
+        self.module.title = 'Introduction'
+        self.module.save()
+        job = VideoTranscode.objects.get(module=self.module)
+        self.assertEqual((job.status, job.source_name), ('pending', self.module.video_file.name))
+
+        self.module.video_file = None
+        self.module.save()
+        self.assertFalse(VideoTranscode.objects.exists())
+
+    def test_completed_job_is_served_and_sets_duration(self):
+        self.module.video_file.save('intro.mp4', ContentFile(b'video'))
+        job, = transcoding.claim_jobs(5)
+        _, output_dir = transcoding.job_paths(job)
+        # Stand in for the ffmpeg worker
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, output_dir))
+        with open(os.path.join(settings.MEDIA_ROOT, output_dir, 'master.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n')
+        transcoding.complete_job(job, output_dir, {'duration': 125.0, 'renditions': ['360p']})
+
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.duration_minutes, 3)
+        self.client.force_login(self.admin)
+        response = self.client.get(f'/courses/media/module/{self.module.id}/hls/master.m3u8')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        traversal = self.client.get(f'/courses/media/module/{self.module.id}/hls/../../../../settings.py')
+        self.assertEqual(traversal.status_code, 404)
+
+    def test_job_of_a_silent_worker_is_claimed_again(self):
+        self.module.video_file.save('intro.mp4', ContentFile(b'video'))
+        job, = transcoding.claim_jobs(5)
+        self.assertEqual(transcoding.claim_jobs(5), [])
+        silent = timezone.now() - timedelta(seconds=settings.TRANSCODE_LEASE_SECONDS + 1)
+        VideoTranscode.objects.filter(id=job.id).update(heartbeat_at=silent)
+        # A heartbeat from the worker holding the lease keeps the job
+        transcoding.heartbeat([job])
+        self.assertEqual(transcoding.claim_jobs(5), [])
+
+        VideoTranscode.objects.filter(id=job.id).update(heartbeat_at=silent)
+        reclaimed, = transcoding.claim_jobs(5)
+        self.assertEqual((reclaimed.id, reclaimed.attempts), (job.id, 2))
+        # The first worker finishing late no longer owns the row
+        _, output_dir = transcoding.job_paths(job)
+        transcoding.complete_job(job, output_dir, {'duration': 60.0, 'renditions': ['360p']})
+        self.assertEqual(VideoTranscode.objects.get(id=job.id).locked_by, reclaimed.locked_by)
+
+        VideoTranscode.objects.filter(id=job.id).update(heartbeat_at=silent, attempts=transcoding.MAX_ATTEMPTS)
+        self.assertEqual(transcoding.claim_jobs(5), [])
+        self.assertEqual(VideoTranscode.objects.get(id=job.id).status, 'failed')
+
+    def test_failed_job_is_retried_with_backoff_then_given_up(self):
+        self.module.video_file.save('intro.mp4', ContentFile(b'video'))
+        for attempt in range(1, transcoding.MAX_ATTEMPTS + 1):
+            job, = transcoding.claim_jobs(5)
+            self.assertEqual(job.attempts, attempt)
+            transcoding.fail_job(job, transcoding.job_paths(job)[1], ffmpeg.TranscodeError('Invalid data'))
+            job.refresh_from_db()
+            if attempt == transcoding.MAX_ATTEMPTS:
+                break
+            delay = settings.TRANSCODE_RETRY_DELAY_SECONDS * 2 ** (attempt - 1)
+            self.assertEqual(job.status, 'pending')
+            self.assertAlmostEqual((job.retry_at - timezone.now()).total_seconds(), delay, delta=5)
+            # Not claimable until the delay has passed
+            self.assertEqual(transcoding.claim_jobs(5), [])
+            VideoTranscode.objects.filter(id=job.id).update(retry_at=timezone.now())
+        self.assertEqual((job.status, job.last_error), ('failed', 'Invalid data'))
+        self.assertEqual(transcoding.claim_jobs(5), [])
+
+    def test_ffmpeg_errors_do_not_stall_the_progress_pipe(self):
+        # ffmpeg that writes far more to stderr than a pipe buffers before failing
+        bin_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, bin_dir)
+        fake_ffprobe = os.path.join(bin_dir, 'ffprobe')
+        fake_ffmpeg = os.path.join(bin_dir, 'ffmpeg')
+        with open(fake_ffprobe, 'w') as f:
+            f.write(f'#!{sys.executable}\nprint(\'{{"format": {{"duration": "10"}}, '
+                    f'"streams": [{{"codec_type": "video", "height": 360}}]}}\')\n')
+        with open(fake_ffmpeg, 'w') as f:
+            f.write(f'#!{sys.executable}\nimport sys\n'
+                    "if '-frames:v' in sys.argv: sys.exit(0)\n"
+                    "sys.stderr.write('warning\\n' * 100000 + 'Conversion failed!\\n')\n"
+                    "print('out_time_us=5000000', flush=True)\nsys.exit(1)\n")
+        os.chmod(fake_ffprobe, 0o755)
+        os.chmod(fake_ffmpeg, 0o755)
+
+        progress = queue.Queue()
+        with self.assertRaisesRegex(ffmpeg.TranscodeError, 'Conversion failed!$'):
+            ffmpeg.transcode_to_hls(1, 'intro.mp4', os.path.join(settings.MEDIA_ROOT, 'hls'), progress,
+                                    ffmpeg=fake_ffmpeg, ffprobe=fake_ffprobe)
+        self.assertEqual(progress.get_nowait(), (1, 50))
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        self.module = Module.objects.create(course=self.course, title='Intro', order=1, module_type='video')
+        self.client.force_login(self.admin)
+        self.data = os.urandom(3000)
+
+    def start(self, **kwargs):
+        payload = {'kind': 'video', 'filename': 'lecture.mp4', 'size': len(self.data),
+                   'sha256': hashlib.sha256(self.data).hexdigest(), **kwargs}
+        return self.client.post('/courses/admin/uploads/', json.dumps(payload), content_type='application/json')
+
+    def put(self, url, start, end, body=None):
+        body = self.data[start:end] if body is None else body
+        return self.client.put(
+            url, body, content_type='application/octet-stream',
+            headers={'Content-Range': f'bytes {start}-{end - 1}/{len(self.data)}',
+                     'X-Chunk-SHA256': hashlib.sha256(self.data[start:end]).hexdigest()},
+        )
+
+    def test_resumable_upload_is_attached_by_the_form(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 201)
+        url = response.json()['url']
+
+        self.assertEqual(self.put(url, 0, 1000).json()['offset'], 1000)
+        # Corrupted chunk and a chunk past the offset are both refused without moving it
+        self.assertEqual(self.put(url, 1000, 2000, body=b'x' * 1000).status_code, 422)
+        self.assertEqual(self.put(url, 2000, 3000).status_code, 409)
+        # Resume: ask where to continue
+        self.assertEqual(self.client.get(url)['Upload-Offset'], '1000')
+        self.put(url, 1000, 2000)
+        self.assertEqual(self.put(url, 2000, 3000).json()['status'], 'complete')
+
+        upload_id = response.json()['id']
+        response = self.client.post(f'/courses/admin/module/{self.module.id}/edit/', {
+            'title': 'Intro', 'module_type': 'video', 'order': 1, 'duration_minutes': 5,
+            'video_file_upload': upload_id,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.module.refresh_from_db()
+        self.assertTrue(self.module.video_file.name.startswith('module_videos/lecture'))
+        with self.module.video_file.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(ChunkedUpload.objects.get().status, 'attached')
+        self.assertTrue(VideoTranscode.objects.filter(module=self.module, status='pending').exists())
+
+    def upload(self):
+        response = self.start()
+        self.put(response.json()['url'], 0, 3000)
+        return response.json()['id']
+
+    def edit_module(self, upload_id):
+        return self.client.post(f'/courses/admin/module/{self.module.id}/edit/', {
+            'title': 'Intro', 'module_type': 'video', 'order': 1, 'duration_minutes': 5,
+            'video_file_upload': upload_id,
+        })
+
+    def test_upload_is_attached_once_and_only_by_its_owner(self):
+        upload_id = self.upload()
+        other = User.objects.create_user('other', password='x', user_type='admin')
+        self.client.force_login(other)
+        response = self.edit_module(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('video_file_upload', response.context['form'].errors)
+        self.assertEqual(ChunkedUpload.objects.get().status, 'complete')
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.edit_module(upload_id).status_code, 302)
+        # Submitting the form again is a form error rather than a missing file
+        response = self.edit_module(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('video_file_upload', response.context['form'].errors)
+
+    def test_failed_attach_rolls_the_save_back(self):
+        upload_id = self.upload()
+        upload = ChunkedUpload.objects.get()
+        with mock.patch('courses.uploads.os.replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.edit_module(upload_id)
+        upload.refresh_from_db()
+        self.module.refresh_from_db()
+        self.assertEqual(upload.status, 'complete')
+        self.assertFalse(self.module.video_file)
+        self.assertTrue(os.path.exists(uploads.partial_path(upload)))
+        self.assertEqual(self.edit_module(upload_id).status_code, 302)
+
+    def test_lost_attach_race_is_a_form_error(self):
+        upload_id = self.upload()
+        form = ModuleForm({'title': 'Intro', 'module_type': 'video', 'order': 1, 'duration_minutes': 5,
+                           'video_file_upload': upload_id}, instance=self.module, user=self.admin)
+        self.assertTrue(form.is_valid())
+        # Another request attaches it between validation and save
+        ChunkedUpload.objects.update(status='attached')
+        with self.assertRaises(uploads.UploadError):
+            form.save()
+        self.module.refresh_from_db()
+        self.assertFalse(self.module.video_file)
+
+    def test_whole_file_checksum_and_validation(self):
+        self.assertEqual(self.start(filename='lecture.exe').status_code, 400)
+        url = self.start(sha256='0' * 64).json()['url']
+        self.put(url, 0, 2000)
+        response = self.put(url, 2000, 3000)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(ChunkedUpload.objects.get().status, 'failed')
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.student = User.objects.create_user('student', password='x')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.jsonl = os.path.join(directory, 'catalog.jsonl')
+        self.csv = os.path.join(directory, 'catalog.csv')
+
+    def run_import(self, path):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_catalog', path, batch_size=2, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_then_update_by_external_id(self):
+        self.assertEqual(get_snapshot().total_courses, 0)
+        with open(self.jsonl, 'w') as f:
+            f.write(json.dumps({'external_id': 'py', 'title': 'Python', 'description': 'Basics', 'modules': [
+                {'external_id': 'py-1', 'title': 'Setup', 'order': 1},
+                {'external_id': 'py-2', 'title': 'Syntax', 'order': 2, 'module_type': 'video'},
+            ]}) + '\n')
+            f.write(json.dumps({'external_id': 'bad', 'title': 'No description'}) + '\n')
+            f.write('not json\n')
+        stdout, stderr = self.run_import(self.jsonl)
+        self.assertIn('Courses: 1 created, 0 updated; modules: 2 created, 0 updated; 2 invalid', stdout)
+        self.assertIn('Line 2: description', stderr)
+        course = Course.objects.get(external_id='py')
+        self.assertEqual(course.created_by, self.admin)
+        self.assertEqual(list(course.modules.values_list('title', flat=True)), ['Setup', 'Syntax'])
+        self.assertEqual(get_snapshot().total_courses, 1)
+
+        enrollment, _ = enroll_user(self.student, course)
+        with open(self.csv, 'w') as f:
+            f.write('record,external_id,course_external_id,title,description,course_type,price,is_active,order\n')
+            f.write('course,py,,Python 3,Basics,paid,499,yes,\n')
+            f.write('module,py-3,py,Testing,,,,,3\n')
+        stdout, _ = self.run_import(self.csv)
+        self.assertIn('Courses: 0 created, 1 updated; modules: 1 created, 0 updated', stdout)
+        course.refresh_from_db()
+        self.assertEqual((course.title, course.course_type, course.price), ('Python 3', 'paid', 499))
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.total_modules, 3)
+        self.assertEqual(get_snapshot().total_courses, 1)
+
+    def test_module_before_its_course_and_module_moving_course(self):
+        with open(self.jsonl, 'w') as f:
+            for record in (
+                {'external_id': 'py-1', 'course_external_id': 'py', 'title': 'Setup', 'order': 1},
+                {'external_id': 'py-2', 'course_external_id': 'py', 'title': 'Syntax', 'order': 2},
+                {'external_id': 'js-1', 'course_external_id': 'js', 'title': 'Setup', 'order': 1},
+                {'external_id': 'x-1', 'course_external_id': 'nowhere', 'title': 'Lost', 'order': 1},
+                {'external_id': 'go', 'title': 'Go', 'description': 'Basics'},
+                {'external_id': 'js', 'title': 'JavaScript', 'description': 'Basics'},
+                {'external_id': 'py', 'title': 'Python', 'description': 'Basics'},
+            ):
+                f.write(json.dumps(record) + '\n')
+        stdout, stderr = self.run_import(self.jsonl)
+        self.assertIn('Courses: 3 created, 0 updated; modules: 3 created, 0 updated; 1 invalid', stdout)
+        self.assertIn('Line 4: Unknown course "nowhere"', stderr)
+        python, javascript = Course.objects.get(external_id='py'), Course.objects.get(external_id='js')
+        self.assertEqual(Module.objects.get(external_id='py-1').course, python)
+
+        enrollment, _ = enroll_user(self.student, python)
+        complete_module(enrollment, Module.objects.get(external_id='py-1'))
+        other, _ = enroll_user(self.student, javascript)
+
+        with open(self.jsonl, 'w') as f:
+            f.write(json.dumps({'external_id': 'py-1', 'course_external_id': 'js', 'title': 'Setup', 'order': 2}) + '\n')
+        self.run_import(self.jsonl)
+        enrollment.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((enrollment.total_modules, enrollment.completed_modules, enrollment.progress), (1, 0, 0))
+        self.assertEqual((other.total_modules, other.completed_modules), (2, 0))
+
+
+class ViewBenchmarkTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root, QUERY_BUDGET_SAMPLE_RATE=0,
+                                                   RAZORPAY_WEBHOOK_SECRET=benchmarks.WEBHOOK_SECRET)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        # The gateway reads the webhook secret when it is created
+        gateway._gateway = None
+        self.addCleanup(setattr, gateway, '_gateway', None)
+
+    def test_every_url_runs_on_generated_data(self):
+        counts = scale_data.generate(users=6, courses=4, modules_per_course=3, enrollments_per_user=2, seed=1)
+        self.assertEqual((counts['users'], counts['modules'], counts['enrollments']), (7, 12, 12))
+        self.assertEqual(Course.objects.get(id=Enrollment.objects.first().course_id).enrollment_count,
+                         Enrollment.objects.filter(course_id=Enrollment.objects.first().course_id).count())
+
+        fixtures = benchmarks.prepare_fixtures()
+        scenarios = benchmarks.build_scenarios(fixtures)
+        self.assertEqual(benchmarks.missing_scenarios(scenarios), [])
+        results = benchmarks.run_scenarios(scenarios, fixtures, repeat=1, warmup=0)
+        self.assertEqual(benchmarks.compare(results, results), [])
+        self.assertEqual(benchmarks.over_budget(results), [])
+        # These measure the real work, not a rejected request
+        self.assertEqual(results['admin_upload_start']['status'], 201)
+        self.assertEqual(results['razorpay_webhook']['status'], 200)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        self.assertEqual(Payment.objects.get(razorpay_order_id='order_benchmark').payment_status, 'completed')
+
+        slower = {name: {**result, 'queries': result['queries'] + 1} for name, result in results.items()}
+        self.assertEqual(len(benchmarks.compare(slower, results)), len(results))
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+
+    def test_srcset_of_content_hashed_variants(self):
+        upload = io.BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(upload, 'PNG')
+        course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        course.image.save(f'cover-{course.id}.png', ContentFile(upload.getvalue()), save=False)
+
+        schedule_variants(course.image).result()
+
+        html = Template('{% load images %}{% responsive_image course.image alt="Cover" %}').render(
+            Context({'course': course})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('-320.webp 320w', html)
+        # The 800px original is not upscaled to 960 or 1280
+        self.assertIn('-800.jpg 800w', html)
+        self.assertNotIn('1280w', html)
+
+        # The manifest outlives the cache and is read back from next to the original
+        self.assertTrue(os.path.exists(f'{course.image.path}.variants.json'))
+        cache.clear()
+        self.assertEqual(Template('{% load images %}{% responsive_image course.image alt="Cover" %}').render(
+            Context({'course': course})
+        ), html)
+
+    def test_variants_are_scheduled_only_for_a_new_image(self):
+        upload = io.BytesIO()
+        Image.new('RGB', (100, 100), 'red').save(upload, 'PNG')
+        course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        with mock.patch('courses.signals.schedule_variants') as schedule:
+            course.image.save('cover.png', ContentFile(upload.getvalue()))
+            course = Course.objects.get()
+            course.title = 'Python 3'
+            course.save()
+        self.assertEqual(schedule.call_count, 1)
+
+
+class ConcurrentEnrollmentTests(TransactionTestCase):
+    REQUESTS = 200
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Threads cannot share an in-memory SQLite test database')
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.student = User.objects.create_user('student', password='x')
+        self.course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+
+    def test_simultaneous_enrollments_create_one_row(self):
+        barrier = threading.Barrier(self.REQUESTS)
+
+        def enroll():
+            try:
+                barrier.wait()
+                return enroll_user(self.student, self.course)[1]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.REQUESTS) as pool:
+            results = list(pool.map(lambda _: enroll(), range(self.REQUESTS)))
+
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(Enrollment.objects.filter(user=self.student, course=self.course).count(), 1)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 1)
+
+
+class DatabaseConfigTests(TestCase):
+    def test_sqlite_pragmas_apply_on_connect(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            if not connection.is_in_memory_db():
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_environment_selects_backend(self):
+        config = database_config({'DB_ENGINE': 'sqlite', 'SQLITE_JOURNAL_MODE': 'delete'}, settings.BASE_DIR)
+        self.assertIn('PRAGMA journal_mode=DELETE', config['OPTIONS']['init_command'])
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+        config = database_config({'DB_ENGINE': 'postgresql', 'DB_NAME': 'lms', 'DB_CONN_MAX_AGE': '300'},
+                                 settings.BASE_DIR)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+        with self.assertRaises(ImproperlyConfigured):
+            database_config({'SQLITE_JOURNAL_MODE': 'WAL; DROP TABLE x'}, settings.BASE_DIR)
+        with self.assertRaises(ImproperlyConfigured):
+            database_config({'DB_ENGINE': 'oracle'}, settings.BASE_DIR)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            self.skipTest('The replication stand-in copies SQLite files')
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.student = User.objects.create_user('student', password='x')
+        course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        self.module = Module.objects.create(course=course, title='Intro', order=1)
+        enroll_user(self.student, course)
+
+        # Give the replica alias its own file, as DB_REPLICA_NAME does
+        replica, tmp = connections['replica'], tempfile.mkdtemp()
+        name = replica.settings_dict['NAME']
+        replica.close()
+        replica.settings_dict['NAME'] = os.path.join(tmp, 'replica.sqlite3')
+
+        def restore():
+            replica.close()
+            replica.settings_dict['NAME'] = name
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.addCleanup(restore)
+        replicate()
+
+    def catalog_titles(self):
+        response = self.client.get(reverse('course_list'), {'format': 'json'})
+        return sorted(course['title'] for course in response.json()['results'])
+
+    def test_reads_lag_on_the_replica_until_replicated(self):
+        Course.objects.create(title='Django', description='Web', created_by=self.admin)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.catalog_titles(), ['Python'])
+        # The streamed export is generated after the view returns and must still use the replica
+        export = b''.join(self.client.get(reverse('export_data_csv'), {'section': 'courses'}).streaming_content)
+        self.assertNotIn(b'Django', export)
+
+        replicate()
+        self.assertEqual(self.catalog_titles(), ['Django', 'Python'])
+
+    def test_writer_reads_from_the_primary_after_a_write(self):
+        self.client.force_login(self.student)
+        response = self.client.post(reverse('mark_module_complete', args=[self.module.id]))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        Course.objects.create(title='Django', description='Web', created_by=self.admin)
+        self.assertEqual(self.catalog_titles(), ['Django', 'Python'])
+        # Once the pin expires the visitor is back on the (stale) replica
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.catalog_titles(), ['Python'])
+
+
+class QueryPlanTests(TestCase):
+    """Every hot query in the views must be answered from an index, not a table scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        cls.student = User.objects.create_user('student', password='x')
+        cls.course = Course.objects.create(title='Python', description='Basics', created_by=cls.admin)
+
+    def assertUsesIndex(self, queryset):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan assertions are written against SQLite EXPLAIN QUERY PLAN output')
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            # "SCAN t" without "USING ... INDEX" is a full table scan
+            scan = re.search(r'\bSCAN (\w+)(.*)', line)
+            if scan and 'INDEX' not in scan.group(2):
+                self.fail(f'Full scan of {scan.group(1)}:\n{plan}\n{queryset.query}')
+        self.assertRegex(plan, r'USING (COVERING |INTEGER PRIMARY KEY|INDEX)')
+
+    # courses.views
+
+    def test_enrollment_lookup(self):
+        self.assertUsesIndex(Enrollment.objects.filter(user=self.student, course=self.course, is_active=True))
+
+    def test_dashboard_enrollments(self):
+        self.assertUsesIndex(Enrollment.objects.filter(user=self.student, is_active=True))
+
+    def test_completed_module_ids(self):
+        self.assertUsesIndex(ModuleProgress.objects.filter(
+            enrollment_id=1, is_completed=True
+        ).values_list('module_id', flat=True))
+
+    def test_catalog_keyset_page(self):
+        now = timezone.now()
+        self.assertUsesIndex(Course.objects.filter(is_active=True).order_by('-created_at', '-id')[:25])
+        self.assertUsesIndex(Course.objects.filter(is_active=True).filter(
+            created_at__lt=now
+        ).order_by('-created_at', '-id')[:25])
+
+    # payments.views and payments.events
+
+    def test_payment_by_order_id(self):
+        self.assertUsesIndex(Payment.objects.filter(razorpay_order_id='order_123'))
+
+    def test_stale_pending_payments(self):
+        self.assertUsesIndex(Payment.objects.filter(
+            payment_status='pending', transaction_date__lt=timezone.now() - timedelta(minutes=30)
+        ))
+
+    def test_pending_payment_events(self):
+        self.assertUsesIndex(PaymentEvent.objects.filter(status='pending').values_list('id', flat=True)[:100])
+        self.assertUsesIndex(PaymentEvent.objects.filter(locked_by='token', status='processing'))
+
+    # courses.admin_views
+
+    def test_admin_course_list_page(self):
+        self.assertUsesIndex(Course.objects.order_by('-created_at', '-id')[:25])
+
+    def test_top_courses(self):
+        self.assertUsesIndex(Course.objects.order_by('-enrollment_count')[:5])
+
+    def test_recent_enrollments_and_payments(self):
+        self.assertUsesIndex(Enrollment.objects.order_by('-enrolled_at')[:10])
+        self.assertUsesIndex(Payment.objects.order_by('-transaction_date')[:10])
+
+    def test_student_page(self):
+        self.assertUsesIndex(User.objects.filter(user_type='student').order_by('-date_joined', '-id')[:25])
+
+    def test_revenue_window(self):
+        self.assertUsesIndex(Payment.objects.filter(
+            payment_status='completed', transaction_date__gte=timezone.now() - timedelta(days=30)
+        ))
+        self.assertUsesIndex(DailyRollup.objects.filter(date__gte=timezone.localdate() - timedelta(days=30)))
+
+    def test_export_sections(self):
+        for section in ('courses', 'enrollments', 'payments'):
+            with self.subTest(section=section):
+                self.assertUsesIndex(_export_queryset(section, timezone.localdate() - timedelta(days=7)))
+
+
+class AsyncMiddlewareTests(TestCase):
+    """Middleware must stay async under ASGI, or async views are adapted onto a worker thread"""
+
+    @staticmethod
+    async def count_courses(request):
+        return HttpResponse(str(await Course.objects.acount()))
+
+    @override_settings(DEBUG=True)
+    def test_query_budget_middleware(self):
+        middleware = QueryBudgetMiddleware(self.count_courses)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(response['X-Query-Count'], '1')
+
+    def test_replica_routing_middleware_pins_after_an_async_write(self):
+        async def write(request):
+            await Course.objects.acreate(title='Python', description='Basics', created_by=admin)
+            return HttpResponse()
+
+        admin = User.objects.create_user('admin', password='x', user_type='admin')
+        for view, pinned in ((self.count_courses, False), (write, True)):
+            middleware = ReplicaRoutingMiddleware(view)
+            self.assertTrue(iscoroutinefunction(middleware))
+            response = async_to_sync(middleware)(RequestFactory().get('/'))
+            self.assertEqual(PIN_COOKIE in response.cookies, pinned)
+
+
+class AdminAnalyticsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.client.force_login(self.admin)
+
+    def test_days_window_is_validated_and_clamped(self):
+        url = reverse('admin_analytics_timeseries')
+        self.assertEqual(self.client.get(url, {'days': 100000}).json()['days'], 366)
+        self.assertEqual(self.client.get(url, {'days': -5}).json()['days'], 1)
+        self.assertFalse(self.client.get(url, {'days': 'abc'}).json()['success'])
+        self.assertFalse(self.client.get(url, {'course': 'abc'}).json()['success'])
+
+        url = reverse('admin_analytics')
+        self.assertEqual(self.client.get(url, {'days': 100000}).context['days'], 366)
+        self.assertEqual(self.client.get(url, {'days': 'abc'}).context['days'], 30)
+
+    def test_export_streams_rows_within_the_date_range(self):
+        course = Course.objects.create(title='Python', description='Basics', created_by=self.admin)
+        old = Course.objects.create(title='Fortran', description='Legacy', created_by=self.admin)
+        Course.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        today = timezone.localdate()
+
+        response = self.client.get(reverse('export_data_csv'), {'section': 'courses'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['COURSES'])
+        self.assertEqual(rows[1][:2], ['ID', 'Title'])
+        self.assertEqual([row[1] for row in rows[2:]], ['Fortran', 'Python'])
+
+        response = self.client.get(reverse('export_data_csv'), {
+            'section': 'courses', 'start_date': (today - timedelta(days=1)).isoformat(), 'end_date': today.isoformat(),
+        })
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row[:2] for row in rows[2:]], [[str(course.id), 'Python']])
+
+    def test_export_rejects_unparseable_dates(self):
+        for params in ({'start_date': 'yesterday'}, {'end_date': '2025-02-30'}, {'start_date': '01/02/2025'}):
+            self.assertEqual(self.client.get(reverse('export_data_csv'), params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_data_csv'), {'start_date': ''}).status_code, 200)
+        # Valid dates at the calendar's edges mean "no bound" rather than overflowing
+        response = self.client.get(reverse('export_data_csv'), {'start_date': '0001-01-01', 'end_date': '9999-12-31'})
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Course views stay within settings.QUERY_BUDGETS however much data the user has"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        cls.student = User.objects.create_user('student', password='x')
+        cls.courses = [
+            Course.objects.create(title=f'Course {i}', description='Basics', created_by=cls.admin)
+            for i in range(8)
+        ]
+        cls.course = cls.courses[0]
+        for course in cls.courses:
+            for order in range(3):
+                Module.objects.create(course=course, title=f'Module {order}', order=order)
+        for course in cls.courses[:5]:
+            enroll_user(cls.student, course)
+        cls.module = cls.course.modules.first()
+
+    def test_every_url_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            self.assertIn(pattern.name, settings.QUERY_BUDGETS)
+
+    def test_student_views(self):
+        self.client.force_login(self.student)
+        course_id = self.course.id
+        self.assertWithinBudget('course_list', 'get', '/courses/browse/')
+        self.assertWithinBudget('course_list', 'get', '/courses/browse/?search=course')
+        self.assertWithinBudget('course_detail', 'get', f'/courses/{course_id}/')
+        self.assertWithinBudget('course_view', 'get', f'/courses/{course_id}/learn/')
+        self.assertWithinBudget('mark_module_complete', 'post', f'/courses/module/{self.module.id}/complete/')
+        self.assertWithinBudget('finish_course', 'post', f'/courses/{course_id}/finish/')
+
+    def test_user_dashboard(self):
+        self.client.force_login(self.student)
+        response = self.assertWithinBudget('user_dashboard', 'get', '/courses/')
+        self.assertEqual(response.context['enrolled_count'], 5)
+        self.assertEqual([c.module_count for c in response.context['recommended_courses']], [3, 3, 3])
+
+        # More enrollments must not cost more queries
+        for course in self.courses[5:]:
+            enroll_user(self.student, course)
+        response = self.assertWithinBudget('user_dashboard', 'get', '/courses/')
+        self.assertEqual(response.context['enrolled_count'], 8)
+        self.assertEqual(response.context['recommended_courses'], [])
+
+    def test_admin_views(self):
+        self.client.force_login(self.admin)
+        course_id, module_id = self.course.id, self.module.id
+        self.assertWithinBudget('admin_course_list', 'get', '/courses/admin/courses/')
+        self.assertWithinBudget('admin_course_create', 'get', '/courses/admin/courses/create/')
+        self.assertWithinBudget('admin_course_edit', 'get', f'/courses/admin/courses/{course_id}/edit/')
+        self.assertWithinBudget('admin_course_delete', 'get', f'/courses/admin/courses/{course_id}/delete/')
+        self.assertWithinBudget('admin_module_create', 'get', f'/courses/admin/courses/{course_id}/module/create/')
+        self.assertWithinBudget('admin_module_edit', 'get', f'/courses/admin/module/{module_id}/edit/')
+        self.assertWithinBudget('admin_module_delete', 'get', f'/courses/admin/module/{module_id}/delete/')
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.assertWithinBudget('admin_upload_start', 'post', '/courses/admin/uploads/', data={
+                'kind': 'pdf', 'filename': 'notes.pdf', 'size': 4,
+            })
+            self.assertWithinBudget('admin_upload_chunk', 'put', response.json()['url'], data=b'%PDF',
+                                    content_type='application/pdf', headers={'Content-Range': 'bytes 0-3/4'})
+        self.assertWithinBudget('admin_analytics', 'get', '/courses/admin/analytics/')
+        self.assertWithinBudget('admin_analytics_timeseries', 'get', '/courses/admin/analytics/timeseries/')
+        self.assertWithinBudget('export_data_csv', 'get', '/courses/admin/export-csv/')
@@ -0,0 +1,124 @@
+"""
+Queue of uploaded videos waiting for HLS transcoding.
+
+courses.signals calls queue_transcode() whenever a module or course gets a new
+video_file. `manage.py transcode_videos` claims jobs, runs courses.ffmpeg in a
+bounded process pool and records the outcome here: the renditions and
+duration, the module's duration_minutes, and the previous output removed.
+While a job runs the worker heartbeats it; a job whose heartbeat is older than
+TRANSCODE_LEASE_SECONDS (the worker crashed or was killed) is claimed again.
+A job that fails is retried after TRANSCODE_RETRY_DELAY_SECONDS, doubling
+with every attempt, and marked failed after MAX_ATTEMPTS.
+"""
+import math
+import os
+import shutil
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Module, VideoTranscode
+
+MAX_ATTEMPTS = 3
+
+
+def queue_transcode(instance):
+    """(Re)queue the video of a Module or Course instance"""
+    owner = 'module' if instance._meta.model_name == 'module' else 'course'
+    VideoTranscode.objects.update_or_create(
+        **{owner: instance},
+        defaults={
+            'source_name': instance.video_file.name,
+            'status': 'pending',
+            'progress': 0,
+            'attempts': 0,
+            'locked_by': '',
+            'heartbeat_at': None,
+            'retry_at': None,
+            'last_error': '',
+        },
+    )
+
+
+def drop_transcode(instance):
+    """Forget the renditions of a Module or Course whose video was removed"""
+    owner = 'module' if instance._meta.model_name == 'module' else 'course'
+    for job in VideoTranscode.objects.filter(**{owner: instance}):
+        if job.output_dir:
+            shutil.rmtree(os.path.join(settings.MEDIA_ROOT, job.output_dir), ignore_errors=True)
+        job.delete()
+
+
+def _claimable(now):
+    lease_expired = Q(status='processing', heartbeat_at__lt=now - timedelta(seconds=settings.TRANSCODE_LEASE_SECONDS))
+    due = Q(retry_at__isnull=True) | Q(retry_at__lte=now)
+    return (Q(status='pending') & due) | lease_expired
+
+
+def claim_jobs(limit):
+    """Atomically claim up to `limit` pending or abandoned jobs for this worker"""
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    # A video that keeps killing its worker would otherwise be claimed forever
+    VideoTranscode.objects.filter(_claimable(now), status='processing', attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', locked_by='', heartbeat_at=None, last_error='Worker stopped responding'
+    )
+    ids = list(VideoTranscode.objects.filter(_claimable(now)).order_by('id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    VideoTranscode.objects.filter(_claimable(now), id__in=ids).update(
+        status='processing', locked_by=token, heartbeat_at=now, progress=0, attempts=F('attempts') + 1
+    )
+    return list(VideoTranscode.objects.filter(locked_by=token, status='processing'))
+
+
+def heartbeat(jobs):
+    """Extend the lease of jobs this worker is still running"""
+    for job in jobs:
+        VideoTranscode.objects.filter(id=job.id, locked_by=job.locked_by).update(heartbeat_at=timezone.now())
+
+
+def job_paths(job):
+    """(absolute source path, output dir relative to MEDIA_ROOT) for a claimed job"""
+    owner = f'module/{job.module_id}' if job.module_id else f'course/{job.course_id}'
+    # A fresh directory per run, so players keep the old renditions until the new ones are complete
+    output_dir = f'hls/{owner}/{uuid.uuid4().hex[:12]}'
+    return os.path.join(settings.MEDIA_ROOT, job.source_name), output_dir
+
+
+def record_progress(job_id, percent):
+    VideoTranscode.objects.filter(id=job_id, status='processing').update(progress=percent)
+
+
+def complete_job(job, output_dir, result):
+    previous = job.output_dir
+    updated = VideoTranscode.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        status='done', progress=100, locked_by='', heartbeat_at=None, last_error='',
+        output_dir=output_dir, renditions=result['renditions'], duration_seconds=result['duration'],
+    )
+    if not updated:
+        # The video was replaced while we worked; the new job owns the row
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, output_dir), ignore_errors=True)
+        return
+    if previous and previous != output_dir:
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, previous), ignore_errors=True)
+
+    if job.module_id:
+        module = Module.objects.get(id=job.module_id)
+        module.duration_minutes = max(1, math.ceil(result['duration'] / 60))
+        # save() so the outline cache and page versions follow the new duration
+        module.save(update_fields=['duration_minutes', 'updated_at'])
+
+
+def fail_job(job, output_dir, error):
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, output_dir), ignore_errors=True)
+    if job.attempts >= MAX_ATTEMPTS:
+        status, retry_at = 'failed', None
+    else:
+        # Back off so a broken source or a full disk is not retried in a tight loop
+        delay = settings.TRANSCODE_RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)
+        status, retry_at = 'pending', timezone.now() + timedelta(seconds=delay)
+    VideoTranscode.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        status=status, locked_by='', heartbeat_at=None, retry_at=retry_at, last_error=str(error)[-2000:]
+    )
@@ -0,0 +1,96 @@
+"""
+HTTP API for resumable chunked uploads (see courses.uploads).
+
+    POST   admin/uploads/            {"kind", "filename", "size", "sha256"?} -> 201 with the upload id
+    PUT    admin/uploads/<id>/       raw bytes, Content-Range: bytes start-end/total, X-Chunk-SHA256
+    GET    admin/uploads/<id>/       current offset, to resume after a disconnect
+    DELETE admin/uploads/<id>/       abandon the upload
+
+The offset is also returned in an Upload-Offset header on every response.
+"""
+import json
+import os
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST
+from .models import ChunkedUpload
+from . import uploads
+
+
+def _upload_to_dict(upload):
+    return {
+        'id': str(upload.id),
+        'kind': upload.kind,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        'url': reverse('admin_upload_chunk', args=[upload.id]),
+    }
+
+
+def _upload_response(upload, status=200):
+    response = JsonResponse(_upload_to_dict(upload), status=status)
+    response['Upload-Offset'] = str(upload.offset)
+    return response
+
+
+def _error_response(message, status, upload=None):
+    response = JsonResponse({'success': False, 'message': message, 'offset': upload.offset if upload else None},
+                            status=status)
+    if upload:
+        response['Upload-Offset'] = str(upload.offset)
+    return response
+
+
+@login_required
+@require_POST
+def admin_upload_start(request):
+    if not request.user.is_admin_user:
+        return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
+
+    try:
+        data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+        size = int(data.get('size', 0))
+    except (ValueError, TypeError):
+        return _error_response('Invalid upload request', 400)
+
+    try:
+        upload = uploads.start_upload(request.user, data.get('kind'), data.get('filename'), size, data.get('sha256', ''))
+    except uploads.UploadError as e:
+        return _error_response(str(e), e.status)
+    return _upload_response(upload, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PUT', 'DELETE'])
+def admin_upload_chunk(request, upload_id):
+    if not request.user.is_admin_user:
+        return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
+
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+
+    if request.method == 'DELETE':
+        if upload.status != 'attached':
+            try:
+                os.remove(uploads.partial_path(upload))
+            except FileNotFoundError:
+                pass
+            upload.delete()
+        return JsonResponse({'success': True})
+
+    if request.method == 'PUT':
+        if 'Content-Range' not in request.headers:
+            return _error_response('Content-Range header required', 400, upload)
+        try:
+            # Read the body as a stream; request.body would buffer the whole chunk
+            uploads.write_chunk(upload, request, request.headers['Content-Range'],
+                                request.headers.get('X-Chunk-SHA256', ''))
+        except uploads.UploadError as e:
+            return _error_response(str(e), e.status, upload)
+
+    return _upload_response(upload)
@@ -0,0 +1,188 @@
+"""
+Resumable chunked uploads for large course media.
+
+The admin forms upload videos and PDFs to courses.upload_views in
+Content-Range chunks instead of one multipart body. Each chunk carries its
+SHA-256 and is written in place in MEDIA_ROOT/uploads/partial/<id>.part, so a
+client that lost its connection asks for the current offset and carries on.
+Once the last byte arrives the whole file is checked against the checksum
+given when the upload was started (if any). The form then submits only the
+upload id; once the instance is saved, attach_upload() moves the file into the
+model field's upload_to directory with a rename.
+"""
+import hashlib
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import ChunkedUpload
+
+PARTIAL_DIR = 'uploads/partial'
+EXTENSIONS = {
+    'video': ('.mp4', '.m4v', '.mov', '.webm', '.mkv'),
+    'pdf': ('.pdf',),
+}
+WRITE_BUFFER = 1024 * 1024
+
+
+class UploadError(Exception):
+    """A chunk or upload request the client has to correct"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, PARTIAL_DIR, f'{upload.id}.part')
+
+
+def start_upload(user, kind, filename, size, sha256=''):
+    filename = os.path.basename(filename or '').strip()
+    if kind not in EXTENSIONS:
+        raise UploadError('Unknown upload kind')
+    if not filename or not filename.lower().endswith(EXTENSIONS[kind]):
+        raise UploadError(f'Allowed file types: {", ".join(EXTENSIONS[kind])}')
+    if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError('File is empty or too large', status=413 if size > 0 else 400)
+    sha256 = (sha256 or '').lower()
+    if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256)):
+        raise UploadError('sha256 must be 64 hex digits')
+
+    upload = ChunkedUpload.objects.create(user=user, kind=kind, filename=filename, size=size, sha256=sha256)
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Reserve the file; chunks are written in place at their offsets
+    with open(path, 'wb'):
+        pass
+    return upload
+
+
+def parse_content_range(header):
+    """(start, end, total) from 'bytes start-end/total', end inclusive"""
+    try:
+        unit, _, spec = header.strip().partition(' ')
+        span, _, total = spec.partition('/')
+        start, _, end = span.partition('-')
+        start, end, total = int(start), int(end), int(total)
+    except ValueError:
+        raise UploadError('Content-Range must be "bytes start-end/total"')
+    if unit != 'bytes' or start < 0 or end < start or end >= total:
+        raise UploadError('Content-Range must be "bytes start-end/total"')
+    return start, end, total
+
+
+def write_chunk(upload, stream, content_range, chunk_sha256=''):
+    """
+    Write one chunk read from `stream` and advance the upload's offset.
+
+    Chunks must arrive in order: a chunk that does not start at the current
+    offset raises a 409 so the client can re-sync with the offset it reports.
+    """
+    if upload.status != 'uploading':
+        raise UploadError('Upload is not accepting data', status=409)
+    start, end, total = parse_content_range(content_range)
+    length = end - start + 1
+    if total != upload.size:
+        raise UploadError('Content-Range total does not match the upload size')
+    if start != upload.offset:
+        raise UploadError('Chunk does not start at the current offset', status=409)
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK:
+        raise UploadError('Chunk too large', status=413)
+
+    sha = hashlib.sha256()
+    received = 0
+    with open(partial_path(upload), 'r+b') as f:
+        f.seek(start)
+        while received < length:
+            data = stream.read(min(WRITE_BUFFER, length - received))
+            if not data:
+                break
+            f.write(data)
+            sha.update(data)
+            received += len(data)
+    if received != length:
+        # The connection dropped mid-chunk; the offset stays put and the client resends
+        raise UploadError('Chunk body is shorter than its Content-Range')
+    if chunk_sha256 and sha.hexdigest() != chunk_sha256.lower():
+        raise UploadError('Chunk checksum mismatch', status=422)
+
+    # Conditional update: of two racing requests for the same chunk only one advances the offset
+    updated = ChunkedUpload.objects.filter(id=upload.id, offset=start, status='uploading').update(
+        offset=end + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        upload.refresh_from_db()
+        raise UploadError('Chunk does not start at the current offset', status=409)
+    upload.offset = end + 1
+    if upload.offset == upload.size:
+        finish_upload(upload)
+    return upload
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(WRITE_BUFFER), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def finish_upload(upload):
+    """Check the reassembled file against the expected checksum and mark the upload complete"""
+    path = partial_path(upload)
+    if upload.sha256 and file_sha256(path) != upload.sha256:
+        upload.status = 'failed'
+        upload.save(update_fields=['status', 'updated_at'])
+        os.remove(path)
+        raise UploadError('File checksum mismatch', status=422)
+    upload.status = 'complete'
+    upload.save(update_fields=['status', 'updated_at'])
+
+
+def attachable_upload(upload_id, user, kind):
+    """The user's completed upload of this kind whose file is still waiting to be attached, or None"""
+    upload = ChunkedUpload.objects.filter(id=upload_id, user=user, kind=kind, status='complete').first()
+    if upload is None or not os.path.exists(partial_path(upload)):
+        return None
+    return upload
+
+
+def upload_target_name(upload, instance, field_name):
+    """Storage name the upload will get in `instance.<field_name>`; set it on the instance before saving"""
+    field = instance._meta.get_field(field_name)
+    return field.storage.get_available_name(field.generate_filename(instance, upload.filename))
+
+
+def attach_upload(upload, instance, field_name, name):
+    """
+    Move a completed upload to `name` once the instance referencing it is saved.
+
+    Call inside the transaction that saved the instance: if another request
+    attached the upload first or the move fails, the error rolls the save back.
+    """
+    claimed = ChunkedUpload.objects.filter(id=upload.id, status='complete').update(
+        status='attached', updated_at=timezone.now()
+    )
+    if not claimed:
+        raise UploadError('The upload has already been attached', status=409)
+    target = instance._meta.get_field(field_name).storage.path(name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Same filesystem, so a multi-GB file is renamed rather than copied
+    os.replace(partial_path(upload), target)
+
+
+def purge_stale_uploads(max_age_hours=24):
+    """Delete unfinished or unused uploads older than `max_age_hours`; returns how many"""
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    stale = ChunkedUpload.objects.filter(updated_at__lt=cutoff).exclude(status='attached')
+    count = 0
+    for upload in stale.iterator():
+        try:
+            os.remove(partial_path(upload))
+        except FileNotFoundError:
+            pass
+        count += 1
+    stale.delete()
+    ChunkedUpload.objects.filter(status='attached', updated_at__lt=cutoff).delete()
+    return count
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views, admin_views
+from . import views, admin_views, media_views, upload_views
 
 urlpatterns = [
     # User-facing URLs
@@ -10,6 +10,12 @@ urlpatterns = [
     path('module/<int:module_id>/complete/', views.mark_module_complete, name='mark_module_complete'),
     path('<int:course_id>/finish/', views.finish_course, name='finish_course'),
     
+    # Access-checked media
+    path('media/module/<int:module_id>/<str:kind>/', media_views.module_media, name='module_media'),
+    path('media/course/<int:course_id>/video/', media_views.course_video, name='course_video'),
+    path('media/module/<int:module_id>/hls/<path:name>', media_views.module_hls, name='module_hls'),
+    path('media/course/<int:course_id>/hls/<path:name>', media_views.course_hls, name='course_hls'),
+    
     # Admin URLs
     path('admin/courses/', admin_views.admin_course_list, name='admin_course_list'),
     path('admin/courses/create/', admin_views.admin_course_create, name='admin_course_create'),
@@ -18,6 +24,10 @@ urlpatterns = [
     path('admin/courses/<int:course_id>/module/create/', admin_views.admin_module_create, name='admin_module_create'),
     path('admin/module/<int:module_id>/edit/', admin_views.admin_module_edit, name='admin_module_edit'),
     path('admin/module/<int:module_id>/delete/', admin_views.admin_module_delete, name='admin_module_delete'),
+    path('admin/module/<int:module_id>/transcode/', admin_views.admin_module_transcode_status, name='admin_module_transcode_status'),
+    path('admin/uploads/', upload_views.admin_upload_start, name='admin_upload_start'),
+    path('admin/uploads/<uuid:upload_id>/', upload_views.admin_upload_chunk, name='admin_upload_chunk'),
     path('admin/analytics/', admin_views.admin_analytics, name='admin_analytics'),
+    path('admin/analytics/timeseries/', admin_views.admin_analytics_timeseries, name='admin_analytics_timeseries'),
     path('admin/export-csv/', admin_views.export_data_csv, name='export_data_csv'),
 ]
@@ -2,67 +2,98 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q, Count, Avg
-from .models import Course, Module, Enrollment, ModuleProgress
+from django.db.models import Count, Max
+from .models import Course, Module, Enrollment, ModuleProgress, VideoTranscode
 from .forms import CourseForm, ModuleForm
+from .services import complete_module, enrollment_completed
+from .search import search_course_ids
+from .recommendations import recommend_courses
+from .pagination import paginate_keyset, paginate_ranked
+from .cache import get_course_outline, get_completed_module_ids, get_recommendation_candidates
+from .page_cache import cache_anonymous_page, get_version
 from payments.models import Payment
 from django.utils import timezone
+from lms_platform.routers import use_replica
+
+def course_to_dict(course):
+    return {
+        'id': course.id,
+        'title': course.title,
+        'short_description': course.short_description,
+        'course_type': course.course_type,
+        'price': str(course.price),
+        'is_free': course.is_free,
+        'image': course.image.url if course.image else None,
+        'enrollment_count': course.enrollment_count,
+        'is_active': course.is_active,
+        'created_at': course.created_at.isoformat(),
+    }
 
 # User Dashboard View
 @login_required
 def user_dashboard(request):
-    # Get enrolled courses
-    enrolled_courses = Enrollment.objects.filter(
+    # One fetch of the user's enrollments, split by progress in Python
+    enrolled_courses = list(Enrollment.objects.filter(
         user=request.user, 
         is_active=True
-    ).select_related('course')
-    
-    # Separate completed and in-progress courses
-    completed_courses = enrolled_courses.filter(progress=100)
-    in_progress_courses = enrolled_courses.filter(progress__lt=100)
-    
-    # Get all available courses
-    all_courses = Course.objects.filter(is_active=True).annotate(
-        enrollment_count=Count('enrollments')
-    )
-    
-    # Recommendations (courses not enrolled)
-    enrolled_course_ids = enrolled_courses.values_list('course_id', flat=True)
-    recommended_courses = all_courses.exclude(id__in=enrolled_course_ids)[:6]
+    ).select_related('course'))
+    completed_courses = [e for e in enrolled_courses if e.progress == 100]
+    in_progress_courses = [e for e in enrolled_courses if e.progress < 100]
+    
+    # Recommendations: co-enrollment neighbours of the user's courses, topped up
+    # with the newest courses from the shared candidate list
+    active_course_count, candidate_ids = get_recommendation_candidates()
+    enrolled_course_ids = [e.course_id for e in enrolled_courses]
+    recommended_courses = recommend_courses(enrolled_course_ids, limit=6)
+    if len(recommended_courses) < 6:
+        skip = set(enrolled_course_ids) | {c.id for c in recommended_courses}
+        fill_ids = [pk for pk in candidate_ids if pk not in skip][:6 - len(recommended_courses)]
+        fill = Course.objects.filter(id__in=fill_ids, is_active=True).annotate(module_count=Count('modules'))
+        recommended_courses += sorted(fill, key=lambda c: fill_ids.index(c.id))
     
     context = {
         'enrolled_courses': enrolled_courses,
         'in_progress_courses': in_progress_courses,
         'completed_courses': completed_courses,
-        'all_courses': all_courses,
+        'all_courses_count': active_course_count,
         'recommended_courses': recommended_courses,
-        'enrolled_count': enrolled_courses.count(),
-        'completed_count': completed_courses.count(),
+        'enrolled_count': len(enrolled_courses),
+        'completed_count': len(completed_courses),
     }
     
     return render(request, 'courses/user_dashboard.html', context)
 
 # Course List View
+@use_replica
+@cache_anonymous_page(
+    scopes=lambda: ['catalog'],
+    last_modified=lambda: Course.objects.aggregate(latest=Max('updated_at'))['latest'],
+)
 def course_list(request):
-    courses = Course.objects.filter(is_active=True).annotate(
-        enrollment_count=Count('enrollments')
-    )
-    
-    # Search functionality
-    search_query = request.GET.get('search', '')
-    if search_query:
-        courses = courses.filter(
-            Q(title__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
+    courses = Course.objects.filter(is_active=True)
     
     # Filter by type
     course_type = request.GET.get('type', '')
     if course_type:
         courses = courses.filter(course_type=course_type)
     
+    # Search functionality: ranked full-text lookup, paged in relevance order
+    search_query = request.GET.get('search', '')
+    if search_query:
+        page = paginate_ranked(request, courses, search_course_ids(search_query, queryset=courses))
+    else:
+        page = paginate_keyset(request, courses)
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [course_to_dict(course) for course in page],
+            'next_cursor': page.next_cursor,
+            'has_next': page.has_next,
+        })
+    
     context = {
-        'courses': courses,
+        'courses': page,
+        'page': page,
         'search_query': search_query,
         'course_type': course_type,
     }
@@ -70,9 +101,14 @@ def course_list(request):
     return render(request, 'courses/course_list.html', context)
 
 # Course Detail View
+@use_replica
+@cache_anonymous_page(
+    scopes=lambda course_id: [f'course:{course_id}'],
+    last_modified=lambda course_id: Course.objects.filter(id=course_id).values_list('updated_at', flat=True).first(),
+)
 def course_detail(request, course_id):
-    course = get_object_or_404(Course, id=course_id, is_active=True)
-    modules = course.modules.all()
+    course = get_object_or_404(Course.objects.select_related('created_by'), id=course_id, is_active=True)
+    modules = get_course_outline(course.id)
     
     is_enrolled = False
     enrollment = None
@@ -89,6 +125,7 @@ def course_detail(request, course_id):
         'modules': modules,
         'is_enrolled': is_enrolled,
         'enrollment': enrollment,
+        'course_version': get_version(f'course:{course.id}'),
     }
     
     return render(request, 'courses/course_detail.html', context)
@@ -96,55 +133,52 @@ def course_detail(request, course_id):
 # Course View (Learning Page)
 @login_required
 def course_view(request, course_id):
-    course = get_object_or_404(Course, id=course_id, is_active=True)
-    
-    # Check if user is enrolled
+    # Check if user is enrolled; the course comes along in the same query
     try:
-        enrollment = Enrollment.objects.get(user=request.user, course=course, is_active=True)
+        enrollment = Enrollment.objects.select_related('course').get(
+            user=request.user,
+            course_id=course_id,
+            course__is_active=True,
+            is_active=True
+        )
     except Enrollment.DoesNotExist:
+        course = get_object_or_404(Course, id=course_id, is_active=True)
         messages.error(request, 'You need to enroll in this course first.')
         return redirect('course_detail', course_id=course.id)
+    course = enrollment.course
     
-    modules = course.modules.all()
-    
-    # Get module progress and attach to modules
-    completed_module_ids = list(
-        ModuleProgress.objects.filter(
-            enrollment=enrollment,
-            is_completed=True
-        ).values_list('module_id', flat=True)
-    )
+    # Outline and completed set come from cache; everything below is in memory
+    modules = get_course_outline(course.id)
+    completed_module_ids = get_completed_module_ids(enrollment.id)
     
     # Add completed status to each module
     for module in modules:
         module.is_completed = module.id in completed_module_ids
     
     # Get current module from URL parameter or default to first incomplete
-    module_id_param = request.GET.get('module')
     current_module = None
-    
-    if module_id_param:
-        # Try to get the module specified in URL
-        try:
-            current_module = modules.filter(id=int(module_id_param)).first()
-        except (ValueError, TypeError):
-            pass
+    try:
+        requested_id = int(request.GET.get('module', ''))
+    except ValueError:
+        requested_id = None
+    if requested_id is not None:
+        current_module = next((module for module in modules if module.id == requested_id), None)
     
     # If no module specified or not found, get first incomplete module
     if not current_module:
-        for module in modules:
-            if module.id not in completed_module_ids:
-                current_module = module
-                break
+        current_module = next((module for module in modules if not module.is_completed), None)
     
     # If all modules complete, show first module
     if not current_module and modules:
-        current_module = modules.first()
+        current_module = modules[0]
     
     # Check if all modules are completed
-    total_modules = modules.count()
-    completed_count = len(completed_module_ids)
-    all_modules_completed = (total_modules > 0 and completed_count == total_modules)
+    all_modules_completed = bool(modules) and all(module.is_completed for module in modules)
+    
+    # HLS renditions, once the transcoding worker has produced them
+    transcode = None
+    if current_module and current_module.video_file:
+        transcode = VideoTranscode.objects.filter(module_id=current_module.id, status='done').only('id').first()
     
     context = {
         'course': course,
@@ -153,6 +187,7 @@ def course_view(request, course_id):
         'current_module': current_module,
         'completed_module_ids': completed_module_ids,
         'all_modules_completed': all_modules_completed,
+        'transcode': transcode,
     }
     
     return render(request, 'courses/course_view.html', context)
@@ -161,38 +196,19 @@ def course_view(request, course_id):
 @login_required
 def mark_module_complete(request, module_id):
     if request.method == 'POST':
-        module = get_object_or_404(Module, id=module_id)
+        module = get_object_or_404(Module.objects.only('id', 'course_id'), id=module_id)
         
         try:
             enrollment = Enrollment.objects.get(
                 user=request.user, 
-                course=module.course, 
+                course_id=module.course_id, 
                 is_active=True
             )
         except Enrollment.DoesNotExist:
             return JsonResponse({'success': False, 'message': 'Not enrolled'})
         
-        # Create or update module progress
-        progress, created = ModuleProgress.objects.get_or_create(
-            enrollment=enrollment,
-            module=module
-        )
-        progress.is_completed = True
-        progress.completed_at = timezone.now()
-        progress.save()
-        
-        # Update overall course progress
-        total_modules = module.course.modules.count()
-        completed_modules = ModuleProgress.objects.filter(
-            enrollment=enrollment,
-            is_completed=True
-        ).count()
-        
-        if total_modules > 0:
-            enrollment.progress = int((completed_modules / total_modules) * 100)
-            if enrollment.progress == 100:
-                enrollment.completed_at = timezone.now()
-            enrollment.save()
+        # Record completion and bump the progress counters in one UPDATE
+        complete_module(enrollment, module)
         
         return JsonResponse({
             'success': True, 
@@ -219,21 +235,17 @@ def finish_course(request, course_id):
         return redirect('course_detail', course_id=course.id)
     
     # Verify all modules are completed
-    total_modules = course.modules.count()
-    completed_modules = ModuleProgress.objects.filter(
-        enrollment=enrollment,
-        is_completed=True
-    ).count()
-    
-    if completed_modules < total_modules:
+    if enrollment.completed_modules < enrollment.total_modules:
         messages.warning(request, 'Please complete all modules before finishing the course.')
         return redirect('course_view', course_id=course.id)
     
-    # Update enrollment
-    if enrollment.progress != 100:
-        enrollment.progress = 100
-        enrollment.completed_at = timezone.now()
-        enrollment.save()
+    # Stamp completion once, e.g. after a module deletion left every remaining module done
+    if enrollment.completed_at is None:
+        now = timezone.now()
+        if Enrollment.objects.filter(pk=enrollment.pk, completed_at__isnull=True).update(progress=100, completed_at=now):
+            enrollment.progress = 100
+            enrollment.completed_at = now
+            enrollment_completed.send(sender=Enrollment, enrollment=enrollment, completed_at=now)
     
     messages.success(request, f'🎉 Congratulations! You have completed {course.title}!')
     return render(request, 'courses/course_complete.html', {
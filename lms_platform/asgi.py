@@ -2,6 +2,8 @@
 ASGI config for lms_platform project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Async views (e.g. payments.views.create_order) run on the event loop here
+instead of occupying a worker thread while waiting on the payment gateway.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_platform.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    # The lifespan owns the gateway's pooled client: opened on the server's loop, closed on shutdown
+    if scope['type'] == 'lifespan':
+        from payments.gateway import close_gateway, get_gateway
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await get_gateway().open()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_gateway()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    else:
+        await django_application(scope, receive, send)
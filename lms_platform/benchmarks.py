@@ -0,0 +1,269 @@
+"""
+Repeatable view benchmarks over the scale data from lms_platform.scale_data.
+
+Every URL in the courses, payments and accounts urlconfs has a scenario,
+which is a request made through the test client as an anonymous visitor, a
+student or an admin. run_scenarios() times each one after a few warm-up
+requests, so caches are in their steady state. It returns the p50/p95/p99
+latency and the largest query count seen. Query counts are deterministic, so
+over_budget() gates them on settings.QUERY_BUDGETS everywhere. Latency depends
+on the machine, so compare() checks it only against a baseline recorded on
+the same machine (`--update-baseline`; the file is not committed).
+`manage.py benchmark_views` runs the whole suite in a throwaway database.
+"""
+import hashlib
+import hmac
+import json
+import math
+import os
+import statistics
+import time
+import uuid
+from collections import namedtuple
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from accounts import urls as accounts_urls
+from accounts.models import User
+from courses import urls as courses_urls
+from courses.models import ChunkedUpload, Enrollment, Course, Module, VideoTranscode
+from payments import urls as payments_urls
+from payments.models import Payment
+from .query_budget import get_budget, record_queries
+from . import scale_data
+
+Scenario = namedtuple('Scenario', 'name url_name method path role kwargs')
+
+BASELINE_PATH = os.path.join(settings.BASE_DIR, 'benchmark_baseline.json')
+# Webhooks are refused without a secret, so benchmark runs sign with this one unless one is configured
+WEBHOOK_SECRET = 'benchmark-webhook-secret'
+
+BENCHMARKED_URLCONFS = (courses_urls, payments_urls, accounts_urls)
+
+
+def _scenario(name, url_name, method='get', args=(), role='anonymous', query='', request=None, **kwargs):
+    """`request`, if given, builds fresh request kwargs for every run instead of `kwargs`"""
+    return Scenario(name, url_name, method, reverse(url_name, args=args) + query, role, request or kwargs)
+
+
+def prepare_fixtures():
+    """Pick the objects the scenarios request and give one module and course some media"""
+    admin = User.objects.get(username=scale_data.ADMIN_USERNAME)
+    student = User.objects.filter(username__startswith=scale_data.USERNAME_PREFIX, user_type='student').order_by(
+        'username').first()
+    enrollment = Enrollment.objects.filter(user=student, is_active=True).select_related('course').order_by('id').first()
+    course = enrollment.course
+    module = Module.objects.filter(course=course).order_by('order').first()
+    enrolled = Enrollment.objects.filter(user=student).values('course_id')
+    paid_courses = list(Course.objects.filter(course_type='paid', is_active=True).exclude(id__in=enrolled).order_by('id')[:2])
+    paid_course = paid_courses[0] if paid_courses else course
+    # A separate course, so the verified payment's enrollment does not change the other payment scenarios
+    verified_course = paid_courses[-1] if paid_courses else course
+    payment = Payment.objects.create(user=student, course=verified_course, amount=verified_course.price,
+                                     razorpay_order_id='order_benchmark')
+
+    # Small stand-ins: the benchmark measures the views, not disk throughput
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, 'hls', 'bench'), exist_ok=True)
+    with open(os.path.join(settings.MEDIA_ROOT, 'hls', 'bench', 'master.m3u8'), 'w') as f:
+        f.write('#EXTM3U\n')
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, 'bench'), exist_ok=True)
+    with open(os.path.join(settings.MEDIA_ROOT, 'bench', 'lesson.mp4'), 'wb') as f:
+        f.write(os.urandom(256 * 1024))
+    Module.objects.filter(id=module.id).update(video_file='bench/lesson.mp4')
+    Course.objects.filter(id=course.id).update(video_file='bench/lesson.mp4')
+    for owner in ({'module': module}, {'course': course}):
+        VideoTranscode.objects.update_or_create(**owner, defaults={
+            'source_name': 'bench/lesson.mp4', 'status': 'done', 'output_dir': 'hls/bench', 'renditions': ['360p'],
+        })
+    upload = ChunkedUpload.objects.create(user=admin, kind='video', filename='lesson.mp4', size=1024)
+    return {'admin': admin, 'student': student, 'course': course, 'module': module,
+            'paid_course': paid_course, 'upload': upload, 'payment': payment}
+
+
+def _verify_payment_request(payment):
+    payment_id = 'pay_benchmark'
+    signature = hmac.new(settings.RAZORPAY_KEY_SECRET.encode(), f'{payment.razorpay_order_id}|{payment_id}'.encode(),
+                         hashlib.sha256).hexdigest()
+    return {'data': {'razorpay_order_id': payment.razorpay_order_id, 'razorpay_payment_id': payment_id,
+                     'razorpay_signature': signature}}
+
+
+def _webhook_request(payment):
+    def build():
+        # A new event id each time, so every delivery is queued rather than dropped as a duplicate
+        body = json.dumps({'id': f'evt_{uuid.uuid4().hex}', 'event': 'payment.captured', 'payload': {
+            'payment': {'entity': {'id': 'pay_benchmark', 'order_id': payment.razorpay_order_id,
+                                   'status': 'captured'}},
+        }})
+        secret = settings.RAZORPAY_WEBHOOK_SECRET or WEBHOOK_SECRET
+        signature = hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+        return {'data': body, 'content_type': 'application/json', 'headers': {'X-Razorpay-Signature': signature}}
+    return build
+
+
+def build_scenarios(fixtures):
+    course_id, module_id = fixtures['course'].id, fixtures['module'].id
+    paid_id = fixtures['paid_course'].id
+    return [
+        # Catalog and learning pages
+        _scenario('course_list', 'course_list'),
+        _scenario('course_list_search', 'course_list', query='?search=python'),
+        _scenario('course_list_student', 'course_list', role='student'),
+        _scenario('course_detail', 'course_detail', args=[course_id]),
+        _scenario('course_detail_student', 'course_detail', args=[course_id], role='student'),
+        _scenario('user_dashboard', 'user_dashboard', role='student'),
+        _scenario('course_view', 'course_view', args=[course_id], role='student'),
+        _scenario('mark_module_complete', 'mark_module_complete', 'post', [module_id], role='student'),
+        _scenario('finish_course', 'finish_course', 'post', [course_id], role='student'),
+        # Media
+        _scenario('module_media', 'module_media', args=[module_id, 'video'], role='student'),
+        _scenario('module_media_range', 'module_media', args=[module_id, 'video'], role='student',
+                  headers={'Range': 'bytes=0-65535'}),
+        _scenario('course_video', 'course_video', args=[course_id]),
+        _scenario('module_hls', 'module_hls', args=[module_id, 'master.m3u8'], role='student'),
+        _scenario('course_hls', 'course_hls', args=[course_id, 'master.m3u8']),
+        # Course administration
+        _scenario('admin_course_list', 'admin_course_list', role='admin'),
+        _scenario('admin_course_create', 'admin_course_create', role='admin'),
+        _scenario('admin_course_edit', 'admin_course_edit', args=[course_id], role='admin'),
+        _scenario('admin_course_delete', 'admin_course_delete', args=[course_id], role='admin'),
+        _scenario('admin_module_create', 'admin_module_create', args=[course_id], role='admin'),
+        _scenario('admin_module_edit', 'admin_module_edit', args=[module_id], role='admin'),
+        _scenario('admin_module_delete', 'admin_module_delete', args=[module_id], role='admin'),
+        _scenario('admin_module_transcode_status', 'admin_module_transcode_status', args=[module_id], role='admin'),
+        _scenario('admin_upload_start', 'admin_upload_start', 'post', role='admin',
+                  data={'kind': 'pdf', 'filename': 'notes.pdf', 'size': 10}),
+        _scenario('admin_upload_chunk', 'admin_upload_chunk', args=[fixtures['upload'].id], role='admin'),
+        _scenario('admin_analytics', 'admin_analytics', role='admin'),
+        _scenario('admin_analytics_timeseries', 'admin_analytics_timeseries', role='admin'),
+        _scenario('export_data_csv', 'export_data_csv', role='admin', query='?section=courses'),
+        # Payments
+        _scenario('enroll_course', 'enroll_course', args=[paid_id], role='student'),
+        _scenario('create_order', 'create_order', args=[paid_id], role='student'),
+        _scenario('verify_payment', 'verify_payment', 'post', role='student',
+                  **_verify_payment_request(fixtures['payment'])),
+        _scenario('demo_enroll', 'demo_enroll', 'post', [paid_id], role='student',
+                  data='{"order_id": "order_missing"}', content_type='application/json'),
+        _scenario('payment_success', 'payment_success', args=[paid_id], role='student'),
+        _scenario('payment_failed', 'payment_failed', role='student'),
+        _scenario('razorpay_webhook', 'razorpay_webhook', 'post', request=_webhook_request(fixtures['payment'])),
+        # Accounts
+        _scenario('admin_login', 'admin_login'),
+        _scenario('admin_dashboard', 'admin_dashboard', role='admin'),
+        _scenario('user_login', 'user_login'),
+        _scenario('user_register', 'user_register'),
+        _scenario('user_logout', 'user_logout', role='student-fresh'),
+    ]
+
+
+def missing_scenarios(scenarios):
+    """URL names in the benchmarked urlconfs without a scenario"""
+    covered = {scenario.url_name for scenario in scenarios}
+    return [
+        pattern.name for urlconf in BENCHMARKED_URLCONFS for pattern in urlconf.urlpatterns
+        if pattern.name not in covered
+    ]
+
+
+def _percentile(sorted_values, fraction):
+    # Nearest-rank, so small samples report a value that was actually observed
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_scenarios(scenarios, fixtures, repeat=30, warmup=3):
+    """{scenario name: {'url_name', 'status', 'queries', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'}}"""
+    clients = {'anonymous': Client(), 'student': Client(), 'admin': Client()}
+    clients['student'].force_login(fixtures['student'])
+    clients['admin'].force_login(fixtures['admin'])
+
+    results = {}
+    for scenario in scenarios:
+        client = clients.get(scenario.role) or Client()
+        timings, queries, status = [], 0, None
+        for run in range(warmup + repeat):
+            if scenario.role == 'student-fresh':
+                # Logging out ends the session, so every request needs a new one
+                client.force_login(fixtures['student'])
+            with record_queries() as recorder:
+                started = time.perf_counter()
+                response = client.generic(scenario.method.upper(), scenario.path, **_request_kwargs(scenario))
+                # Drain streamed bodies so file and CSV views are timed in full
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - started
+            status = response.status_code
+            if run >= warmup:
+                timings.append(elapsed * 1000)
+                queries = max(queries, recorder.count)
+        timings.sort()
+        results[scenario.name] = {
+            'url_name': scenario.url_name,
+            'status': status,
+            'queries': queries,
+            'p50_ms': round(_percentile(timings, 0.50), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'p99_ms': round(_percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+        }
+    return results
+
+
+def _request_kwargs(scenario):
+    kwargs = scenario.kwargs() if callable(scenario.kwargs) else dict(scenario.kwargs)
+    data = kwargs.pop('data', '')
+    content_type = kwargs.pop('content_type', 'application/octet-stream')
+    if isinstance(data, dict):
+        data = json.dumps(data)
+        content_type = 'application/json'
+    return {'data': data, 'content_type': content_type, **kwargs}
+
+
+def over_budget(results):
+    """Scenarios that ran more queries than the QUERY_BUDGETS entry of their URL, as messages"""
+    regressions = []
+    for name, result in results.items():
+        budget = get_budget(result['url_name'])
+        if budget is not None and result['queries'] > budget:
+            regressions.append(f'{name}: {result["queries"]} queries (budget {budget})')
+    return regressions
+
+
+def compare(results, baseline, tolerance=0.5, min_delta_ms=5.0):
+    """
+    Regressions of `results` against `baseline` (both {scenario: metrics}) as messages.
+
+    More queries than the baseline is always a regression. Latency is gated on
+    the median: with a few dozen samples p95/p99 are one or two requests, and a
+    single GC pause or scheduler hiccup moves them. A slower p50 counts once it
+    is both `tolerance` (a fraction) and `min_delta_ms` above the baseline, so
+    sub-millisecond jitter does not fail a run.
+    """
+    regressions = []
+    for name, current in results.items():
+        if current['status'] >= 500:
+            regressions.append(f'{name}: HTTP {current["status"]}')
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f'{name}: {current["queries"]} queries (baseline {previous["queries"]})')
+        limit = max(previous['p50_ms'] * (1 + tolerance), previous['p50_ms'] + min_delta_ms)
+        if current['p50_ms'] > limit:
+            regressions.append(f'{name}: p50 {current["p50_ms"]:.1f}ms (baseline {previous["p50_ms"]:.1f}ms)')
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
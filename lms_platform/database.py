@@ -0,0 +1,116 @@
+"""
+Environment-driven DATABASES['default'] configuration.
+
+DB_ENGINE=sqlite (the default) keeps the file database. Every new connection
+gets these pragmas:
+
+    journal_mode=WAL   readers no longer block the writer, nor it them
+    synchronous=NORMAL fsync at checkpoints rather than every commit (safe with WAL)
+    busy_timeout       wait for the write lock instead of failing at once
+
+Transactions also start with BEGIN IMMEDIATE. A deferred transaction that
+reads and then writes cannot wait out a concurrent writer, because SQLite
+refuses the lock upgrade with "database is locked" and ignores busy_timeout.
+
+DB_ENGINE=postgresql reads DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT.
+Connections are persistent (DB_CONN_MAX_AGE seconds) and health-checked
+before reuse. Setting DB_POOL_MAX_SIZE switches to psycopg's connection pool,
+which checks each connection as it is handed out.
+
+`manage.py benchmark_db_writes` compares the write throughput of these setups.
+
+The `replica` alias (see lms_platform.routers) copies these settings with
+DB_REPLICA_NAME, and for PostgreSQL DB_REPLICA_HOST/DB_REPLICA_PORT/
+DB_REPLICA_USER/DB_REPLICA_PASSWORD, swapped in. With none of them set it
+is the primary under a second name, and nothing is routed to it. The test
+runner only repoints a mirror's NAME, so leave DB_REPLICA_HOST unset when
+running the suite against PostgreSQL.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_JOURNAL_MODES = {'WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'OFF'}
+SQLITE_SYNCHRONOUS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+SQLITE_TRANSACTION_MODES = {'DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'}
+
+
+def _choice(env, name, default, allowed):
+    value = env.get(name, default).upper()
+    if value not in allowed:
+        raise ImproperlyConfigured(f'{name} must be one of {", ".join(sorted(allowed))}')
+    return value
+
+
+def sqlite_config(env, base_dir):
+    journal_mode = _choice(env, 'SQLITE_JOURNAL_MODE', 'WAL', SQLITE_JOURNAL_MODES)
+    synchronous = _choice(env, 'SQLITE_SYNCHRONOUS', 'NORMAL', SQLITE_SYNCHRONOUS)
+    transaction_mode = _choice(env, 'SQLITE_TRANSACTION_MODE', 'IMMEDIATE', SQLITE_TRANSACTION_MODES)
+    busy_timeout = int(env.get('SQLITE_BUSY_TIMEOUT', 5000))
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env.get('DB_NAME') or base_dir / 'db.sqlite3',
+        'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                f'PRAGMA journal_mode={journal_mode}; PRAGMA synchronous={synchronous}; '
+                f'PRAGMA busy_timeout={busy_timeout}'
+            ),
+            'transaction_mode': transaction_mode,
+        },
+        # File-backed test database so threaded tests can open several connections
+        'TEST': {'NAME': env.get('DB_TEST_NAME') or base_dir / 'test_db.sqlite3'},
+    }
+
+
+def postgresql_config(env):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DB_NAME', 'lms'),
+        'USER': env.get('DB_USER', ''),
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': env.get('DB_HOST', 'localhost'),
+        'PORT': env.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 600)),
+        # Ping a reused connection before the request gets it, instead of failing mid-request
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+        'TEST': {'NAME': env.get('DB_TEST_NAME')},
+    }
+    if env.get('DB_SSLMODE'):
+        config['OPTIONS']['sslmode'] = env['DB_SSLMODE']
+
+    pool_size = int(env.get('DB_POOL_MAX_SIZE', 0))
+    if pool_size:
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            raise ImproperlyConfigured('DB_POOL_MAX_SIZE needs psycopg[pool] installed')
+        config['OPTIONS']['pool'] = {
+            'min_size': int(env.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': pool_size,
+            'timeout': float(env.get('DB_POOL_TIMEOUT', 10)),
+            'check': ConnectionPool.check_connection,
+        }
+        # The pool owns connection lifetime; Django refuses persistent connections alongside it
+        config['CONN_MAX_AGE'] = 0
+    return config
+
+
+def database_config(env, base_dir):
+    engine = env.get('DB_ENGINE', 'sqlite').lower()
+    if engine in ('sqlite', 'sqlite3'):
+        return sqlite_config(env, base_dir)
+    if engine in ('postgres', 'postgresql'):
+        return postgresql_config(env)
+    raise ImproperlyConfigured(f'Unsupported DB_ENGINE "{engine}"; use sqlite or postgresql')
+
+
+def replica_config(env, primary):
+    replica = {**primary, 'OPTIONS': dict(primary['OPTIONS']), 'TEST': {'MIRROR': 'default'}}
+    for key in ('NAME', 'HOST', 'PORT', 'USER', 'PASSWORD'):
+        if env.get(f'DB_REPLICA_{key}'):
+            replica[key] = env[f'DB_REPLICA_{key}']
+    if replica['ENGINE'] == 'django.db.backends.sqlite3' and str(replica['NAME']) != str(primary['NAME']):
+        # Writes belong on the primary; fail loudly if one is ever routed here
+        replica['OPTIONS']['init_command'] += '; PRAGMA query_only=1'
+    return replica
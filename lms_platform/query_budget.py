@@ -0,0 +1,137 @@
+"""
+Per-view SQL query budgets.
+
+QueryRecorder hooks connection.execute_wrapper to count queries, total SQL
+time and repeated statements (same SQL text, usually an N+1 loop).
+QueryBudgetMiddleware records a sample of requests and logs a report, with a
+warning when a view exceeds the budget declared in settings.QUERY_BUDGETS.
+QueryBudgetTestMixin enforces the same budgets in the test suite.
+"""
+import logging
+import random
+import time
+from collections import Counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('lms.query_budget')
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total_time += time.perf_counter() - started
+            self.count += 1
+            # Parameters are passed separately, so the SQL text is already a fingerprint
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: n for sql, n in self.statements.items() if n > 1}
+
+    def report(self, url_name):
+        budget = get_budget(url_name)
+        return {
+            'url_name': url_name,
+            'queries': self.count,
+            'sql_ms': round(self.total_time * 1000, 2),
+            'duplicates': len(self.duplicates),
+            'budget': budget,
+            'over_budget': budget is not None and self.count > budget,
+        }
+
+
+@contextmanager
+def record_queries(using=None):
+    """Record every query issued on the given (or all) database connections"""
+    recorder = QueryRecorder()
+    aliases = [using] if using else list(connections)
+    wrappers = [connections[alias].execute_wrapper(recorder) for alias in aliases]
+    for wrapper in wrappers:
+        wrapper.__enter__()
+    try:
+        yield recorder
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+
+
+def get_budget(url_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+
+
+class QueryBudgetMiddleware:
+    """Sample requests and log their query count against the view's budget"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_BUDGET_SAMPLE_RATE', 0.0)
+        # Under ASGI, stay async so async views don't get pinned to a worker thread
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return settings.DEBUG or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self._report(request, recorder, response)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        # Connections are per thread: hook the ones on the thread the request's ORM calls run on
+        recording = record_queries()
+        recorder = await sync_to_async(recording.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.__exit__)(None, None, None)
+        return self._report(request, recorder, response)
+
+    def _report(self, request, recorder, response):
+        match = getattr(request, 'resolver_match', None)
+        report = recorder.report(match.url_name if match else None)
+        if report['over_budget'] or report['duplicates']:
+            logger.warning('Query budget report: %s', report)
+        else:
+            logger.info('Query budget report: %s', report)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(report['queries'])
+        return response
+
+
+class QueryBudgetTestMixin:
+    """assertWithinBudget() for TestCase classes driving views through self.client"""
+
+    def assertWithinBudget(self, url_name, method, path, **kwargs):
+        budget = get_budget(url_name)
+        if budget is None:
+            self.fail(f'No query budget declared for {url_name!r} in settings.QUERY_BUDGETS')
+        with record_queries() as recorder:
+            response = getattr(self.client, method)(path, **kwargs)
+        statements = '\n'.join(f'{n}x {sql}' for sql, n in recorder.statements.items())
+        self.assertLessEqual(
+            recorder.count, budget, f'{url_name} ran {recorder.count} queries (budget {budget}):\n{statements}'
+        )
+        self.assertFalse(recorder.duplicates, f'{url_name} repeated statements:\n{statements}')
+        return response
@@ -0,0 +1,25 @@
+"""
+Replication stand-in for running the replica setup locally on SQLite.
+
+replicate() copies the committed state of the primary database file onto the
+replica file with SQLite's online backup API. The copy is a consistent
+snapshot and writers on the primary are not blocked (WAL mode). Replica
+readers see the new snapshot on their next query. `manage.py
+replicate_sqlite --interval 1` keeps doing this, which gives the replica a
+realistic lag of up to a second.
+"""
+import sqlite3
+from contextlib import closing
+from django.db import DEFAULT_DB_ALIAS, connections
+from .routers import REPLICA
+
+
+def replicate(source=DEFAULT_DB_ALIAS, target=REPLICA):
+    source_settings, target_settings = connections[source].settings_dict, connections[target].settings_dict
+    if connections[source].vendor != 'sqlite' or connections[target].vendor != 'sqlite':
+        raise ValueError('The replication stand-in only copies SQLite databases')
+    if str(source_settings['NAME']) == str(target_settings['NAME']):
+        raise ValueError(f'"{target}" is the same database as "{source}"; set DB_REPLICA_NAME')
+    with closing(sqlite3.connect(source_settings['NAME'])) as primary, \
+            closing(sqlite3.connect(target_settings['NAME'], timeout=30)) as replica:
+        primary.backup(replica)
@@ -0,0 +1,153 @@
+"""
+Read-replica routing for the heavy read-only views.
+
+Views decorated with @use_replica read from the `replica` database alias
+while every write, and every other view, uses `default`. Routing is off
+when `replica` points at the same database as `default`, which is the case
+when no DB_REPLICA_* variable is set (see lms_platform.database).
+
+Read-your-writes: ReplicaRoutingMiddleware tracks whether a request wrote
+anything. If it did, the response sets a short-lived cookie, and that
+visitor's reads stay on the primary until the replica has had time to
+catch up (REPLICA_PIN_SECONDS). Unsafe methods and reads after a write in
+the same request use the primary too.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+PIN_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.replica = False  # inside a @use_replica view
+        self.pinned = pinned  # this visitor must read their own writes
+        self.wrote = False
+        self.token = None
+
+
+def replica_enabled():
+    """True when the replica alias is a separate database rather than the primary under another name"""
+    if REPLICA not in connections.settings:
+        return False
+    replica, primary = connections[REPLICA].settings_dict, connections[DEFAULT_DB_ALIAS].settings_dict
+    return any(str(replica.get(key)) != str(primary.get(key)) for key in ('NAME', 'HOST', 'PORT'))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica and not state.pinned and replica_enabled():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Scope routing to the request and pin the visitor to the primary after a write"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(state.token)
+        return self._finish(state, response)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so ORM calls in the view see (and update) this state
+        state = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(state.token)
+        return self._finish(state, response)
+
+    def _start(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES or request.method not in SAFE_METHODS)
+        state.token = _state.set(state)
+        return state
+
+    def _finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
+
+
+@contextmanager
+def _routing(state, replica):
+    token = _state.set(state)
+    previous, state.replica = state.replica, replica
+    try:
+        yield
+    finally:
+        state.replica = previous
+        _state.reset(token)
+
+
+def use_replica(view_func):
+    """Send the view's reads to the replica, including those made while a streamed body is generated"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        # Resolve the session user on the primary: someone who just signed up may not be on the replica yet
+        if hasattr(request, 'user'):
+            request.user.is_authenticated
+        state = _state.get() or RoutingState(pinned=request.method not in SAFE_METHODS)
+        with _routing(state, True):
+            response = view_func(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _stream_from_replica(state, response.streaming_content)
+        return response
+    return wrapper
+
+
+def _stream_from_replica(state, content):
+    # The body is generated after the middleware has returned, one chunk at a time
+    iterator = iter(content)
+    while True:
+        with _routing(state, True):
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside a @use_replica view, e.g. for results that get cached"""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    with _routing(state, False):
+        yield
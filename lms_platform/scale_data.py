@@ -0,0 +1,179 @@
+"""
+Deterministic synthetic data for load and benchmark runs.
+
+generate() fills the database with users, courses, modules, enrollments,
+module progress and payments through bulk inserts. The same seed and sizes
+always produce the same rows; only the timestamps move with the current
+date, so the analytics windows ("last 30 days") stay populated. Course
+popularity follows a Zipf-like curve so a few courses carry most
+enrollments, as in a real catalog.
+
+bulk_create() skips the model signals, so the denormalized counters are
+computed here and the search index, analytics tables and catalog caches are
+rebuilt at the end, along with the course recommendations.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from accounts.models import User
+from analytics.services import rebuild_rollups, refresh_snapshot
+from courses import search
+from courses.cache import invalidate_recommendation_candidates
+from courses.models import Course, Enrollment, Module, ModuleProgress
+from courses.page_cache import bump_version
+from courses.recommendations import rebuild_recommendations
+from payments.models import Payment
+
+SCALES = {
+    'small': {'users': 200, 'courses': 20, 'modules_per_course': 8, 'enrollments_per_user': 3},
+    'medium': {'users': 2_000, 'courses': 200, 'modules_per_course': 12, 'enrollments_per_user': 5},
+    'large': {'users': 20_000, 'courses': 1_000, 'modules_per_course': 20, 'enrollments_per_user': 8},
+}
+USERNAME_PREFIX = 'scale_'
+ADMIN_USERNAME = f'{USERNAME_PREFIX}admin'
+PASSWORD = 'scale-password'
+MODULE_TYPES = ('video', 'video', 'text', 'pdf', 'quiz')
+TOPICS = ('Python', 'Django', 'Data Science', 'Machine Learning', 'Web Development', 'JavaScript',
+          'React', 'SQL', 'Cloud', 'DevOps', 'Design', 'Marketing', 'Finance', 'Statistics')
+LEVELS = ('Beginner', 'Intermediate', 'Advanced', 'Complete', 'Practical')
+
+
+def _backdate(model, field_name, values):
+    """Set an auto_now_add column, which bulk_create always stamps with now, for (pk, value) pairs"""
+    field = model._meta.get_field(field_name)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(model._meta.db_table)} SET {quote(field.column)} = %s WHERE {quote(model._meta.pk.column)} = %s',
+            [(field.get_db_prep_value(value, connection), pk) for pk, value in values],
+        )
+
+
+def generate(users, courses, modules_per_course, enrollments_per_user, seed=42, batch_size=2000):
+    """Insert one scale's worth of data; returns the number of rows created per model"""
+    if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+        raise ValueError('Scale data already exists in this database')
+    rng = random.Random(seed)
+    now = timezone.now()
+    # Hashing once keeps 20k users from costing 20k password hashes
+    password = make_password(PASSWORD)
+
+    def ago(max_days):
+        return now - timedelta(days=rng.random() * max_days)
+
+    with transaction.atomic():
+        admin = User.objects.create(username=ADMIN_USERNAME, email='admin@scale.test', password=password,
+                                    user_type='admin', is_staff=True)
+        students = User.objects.bulk_create([
+            User(username=f'{USERNAME_PREFIX}student{i:06d}', email=f'student{i}@scale.test', password=password,
+                 first_name=f'Student{i}', date_joined=ago(365))
+            for i in range(users)
+        ], batch_size=batch_size)
+
+        course_objects = []
+        for i in range(courses):
+            topic, level = TOPICS[i % len(TOPICS)], rng.choice(LEVELS)
+            paid = rng.random() < 0.4
+            course_objects.append(Course(
+                title=f'{level} {topic} {i}',
+                short_description=f'{level} course on {topic}',
+                description=f'A {level.lower()} course covering {topic}. ' * 5,
+                course_type='paid' if paid else 'free',
+                price=Decimal(rng.choice((499, 999, 1499, 2499))) if paid else Decimal(0),
+                created_by=admin,
+            ))
+        course_objects = Course.objects.bulk_create(course_objects, batch_size=batch_size)
+        course_dates = {course.pk: ago(400) for course in course_objects}
+        _backdate(Course, 'created_at', course_dates.items())
+
+        modules = Module.objects.bulk_create([
+            Module(course=course, title=f'Lesson {order + 1}', order=order + 1,
+                   module_type=MODULE_TYPES[order % len(MODULE_TYPES)],
+                   text_content=f'Lesson {order + 1} of {course.title}. ' * 10,
+                   duration_minutes=rng.randint(5, 45), is_preview=order == 0)
+            for course in course_objects for order in range(modules_per_course)
+        ], batch_size=batch_size)
+        modules_by_course = {}
+        for module in modules:
+            modules_by_course.setdefault(module.course_id, []).append(module.pk)
+
+        # Zipf-like popularity: course i is picked in proportion to 1 / (i + 1)
+        weights = [1 / (i + 1) for i in range(len(course_objects))]
+        enrollment_objects, enrolled_dates = [], []
+        for student in students:
+            picked = set()
+            for course in rng.choices(course_objects, weights=weights, k=enrollments_per_user * 2):
+                if len(picked) == min(enrollments_per_user, len(course_objects)):
+                    break
+                if course.pk in picked:
+                    continue
+                picked.add(course.pk)
+                enrolled_at = max(ago(365), course_dates[course.pk], student.date_joined)
+                completed = rng.randint(0, modules_per_course)
+                enrollment_objects.append(Enrollment(
+                    user=student, course=course, is_active=rng.random() < 0.95,
+                    total_modules=modules_per_course, completed_modules=completed,
+                    progress=completed * 100 // modules_per_course if modules_per_course else 0,
+                    completed_at=min(enrolled_at + timedelta(days=rng.randint(1, 30)), now)
+                    if completed == modules_per_course and modules_per_course else None,
+                ))
+                enrolled_dates.append(enrolled_at)
+        enrollment_objects = Enrollment.objects.bulk_create(enrollment_objects, batch_size=batch_size)
+        _backdate(Enrollment, 'enrolled_at', ((e.pk, d) for e, d in zip(enrollment_objects, enrolled_dates)))
+
+        counters = {}
+        for enrollment in enrollment_objects:
+            total, active = counters.get(enrollment.course_id, (0, 0))
+            counters[enrollment.course_id] = (total + 1, active + enrollment.is_active)
+        for course in course_objects:
+            course.enrollment_count, course.active_enrollment_count = counters.get(course.pk, (0, 0))
+        Course.objects.bulk_update(course_objects, ['enrollment_count', 'active_enrollment_count'],
+                                   batch_size=batch_size)
+
+        progress_count = 0
+        progress_batch = []
+        for enrollment, enrolled_at in zip(enrollment_objects, enrolled_dates):
+            for module_id in modules_by_course[enrollment.course_id][:enrollment.completed_modules]:
+                completed_at = min(enrolled_at + timedelta(hours=rng.randint(1, 500)), now)
+                progress_batch.append(ModuleProgress(enrollment=enrollment, module_id=module_id,
+                                                     is_completed=True, completed_at=completed_at))
+            if len(progress_batch) >= batch_size:
+                ModuleProgress.objects.bulk_create(progress_batch)
+                progress_count += len(progress_batch)
+                progress_batch = []
+        ModuleProgress.objects.bulk_create(progress_batch)
+        progress_count += len(progress_batch)
+
+        prices = {course.pk: course.price for course in course_objects}
+        payment_objects, paid_dates = [], []
+        for i, (enrollment, enrolled_at) in enumerate(zip(enrollment_objects, enrolled_dates)):
+            if not prices[enrollment.course_id]:
+                continue
+            status = 'refunded' if rng.random() < 0.03 else 'completed'
+            payment_objects.append(Payment(
+                user_id=enrollment.user_id, course_id=enrollment.course_id, amount=prices[enrollment.course_id],
+                razorpay_order_id=f'order_scale{seed}_{i:08d}', razorpay_payment_id=f'pay_scale{seed}_{i:08d}',
+                payment_status=status,
+            ))
+            paid_dates.append(enrolled_at)
+        payment_objects = Payment.objects.bulk_create(payment_objects, batch_size=batch_size)
+        _backdate(Payment, 'transaction_date', ((p.pk, d) for p, d in zip(payment_objects, paid_dates)))
+
+    search.rebuild_index()
+    rebuild_recommendations()
+    rebuild_rollups()
+    refresh_snapshot()
+    invalidate_recommendation_candidates()
+    bump_version('catalog', *(f'course:{course.pk}' for course in course_objects))
+
+    return {
+        'users': len(students) + 1,
+        'courses': len(course_objects),
+        'modules': len(modules),
+        'enrollments': len(enrollment_objects),
+        'module_progress': progress_count,
+        'payments': len(payment_objects),
+    }
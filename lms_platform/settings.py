@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+from .database import database_config, replica_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,14 +42,18 @@ INSTALLED_APPS = [
     'accounts',
     'courses',
     'payments',
+    'analytics',
 ]
 
 MIDDLEWARE = [
+    # First, so session and auth queries count towards the view's budget
+    'lms_platform.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'lms_platform.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,13 +83,56 @@ WSGI_APPLICATION = 'lms_platform.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DB_ENGINE=sqlite (default) or postgresql; see lms_platform/database.py for the other DB_* / SQLITE_* variables
 DATABASES = {
+    'default': database_config(os.environ, BASE_DIR),
+}
+DATABASES['replica'] = replica_config(os.environ, DATABASES['default'])
+DATABASE_ROUTERS = ['lms_platform.routers.ReplicaRouter']
+# How long a visitor reads from the primary after writing; keep it above the replica lag
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    # Course outlines, completed-module sets, recommendation candidates (courses.cache)
+    # and image variant manifests. Invalidation only reaches the cache it runs against, so
+    # DEFAULT_CACHE_DIR is required when running several worker processes; without it
+    # a worker keeps serving what another one has invalidated.
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['DEFAULT_CACHE_DIR'],
+    } if os.environ.get('DEFAULT_CACHE_DIR') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lms-default',
+    },
+    # Rendered catalog pages and fragments (courses.page_cache). Set PAGE_CACHE_DIR
+    # to share them between worker processes through the filesystem.
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['PAGE_CACHE_DIR'],
+    } if os.environ.get('PAGE_CACHE_DIR') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lms-pages',
+    },
+    # Sessions and user snapshots (accounts.cache). Every worker process must see the
+    # same entries, or a logout or password change in one leaves the session valid in
+    # the others, so this is a directory shared by the processes on this host. Point
+    # SESSION_CACHE_DIR at shared storage when workers run on several hosts. A
+    # per-process (LocMem) cache is refused at startup (accounts.cache.check_shared_cache).
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SESSION_CACHE_DIR') or str(BASE_DIR / 'cache' / 'sessions'),
+    },
 }
 
+# Sessions are read from the cache and written through to it and the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+PAGE_CACHE_TIMEOUT = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,6 +176,36 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Only these directories of MEDIA_ROOT may be served as-is at MEDIA_URL (by the
+# front end, or by Django when DEBUG is on).
+PUBLIC_MEDIA_DIRS = ('course_images/', 'profile_pics/', 'derivatives/')
+
+# Module videos and PDFs, course videos and HLS renditions are served by
+# courses.media_views after an access check. Set MEDIA_OFFLOAD to 'x-accel-redirect'
+# (nginx, with an `internal` location at MEDIA_ACCEL_PREFIX; see courses.media_views)
+# or 'x-sendfile' to let the front end stream the file.
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Resized image variants (courses.images); backfill with `manage.py generate_image_variants`
+IMAGE_VARIANT_WORKERS = 2
+
+# Video transcoding (see `manage.py transcode_videos`)
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.environ.get('FFPROBE_BINARY', 'ffprobe')
+TRANSCODE_WORKERS = 2
+TRANSCODE_FFMPEG_THREADS = 0  # 0 lets ffmpeg pick; lower it when running several workers
+# Running jobs are heartbeated; one whose worker went silent this long is claimed again
+TRANSCODE_LEASE_SECONDS = 300
+# A failed job waits this long before its next attempt, doubling each time
+TRANSCODE_RETRY_DELAY_SECONDS = 60
+
+# Resumable chunked uploads of course media (courses.uploads); clear out
+# abandoned ones with `manage.py purge_uploads`
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_CHUNK = 32 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 20 * 1024 ** 3))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -139,7 +218,90 @@ LOGOUT_REDIRECT_URL = '/'
 
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    # Sessions from before the cached backend still name this one
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 # Razorpay Configuration
 RAZORPAY_KEY_ID = 'rzp_test_RUuGPDMr5Tpljw'
 RAZORPAY_KEY_SECRET = 'tU97fVv8kmJ1A2c73Rq9L1XH'
+
+# Payment gateway client (point RAZORPAY_API_BASE at `manage.py fake_gateway` for offline load tests)
+PAYMENT_GATEWAY = 'payments.gateway.RazorpayGateway'
+RAZORPAY_API_BASE = os.environ.get('RAZORPAY_API_BASE', 'https://api.razorpay.com/v1')
+PAYMENT_GATEWAY_TIMEOUT = 10.0
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = 3.0
+PAYMENT_GATEWAY_MAX_RETRIES = 2
+PAYMENT_GATEWAY_MAX_CONNECTIONS = 20
+
+# Webhook reconciliation (see `manage.py process_payment_events`)
+RAZORPAY_WEBHOOK_SECRET = os.environ.get('RAZORPAY_WEBHOOK_SECRET', '')
+PAYMENT_PENDING_STALE_MINUTES = 30
+PAYMENT_PENDING_EXPIRE_HOURS = 24
+# A worker that dies mid-batch leaves its events 'processing'; they are re-claimed after the lease
+PAYMENT_EVENT_LEASE_SECONDS = 300
+# A pending payment the sweep could not resolve waits this long before being checked again
+PAYMENT_SWEEP_BACKOFF_MINUTES = 30
+
+# Query budgets: maximum SQL queries per request, keyed by URL name.
+# Enforced by QueryBudgetTestMixin in the test suite; in production the
+# middleware logs a sampled report to the `lms.query_budget` logger and warns
+# when a view goes over budget or repeats a statement.
+QUERY_BUDGET_SAMPLE_RATE = float(os.environ.get('QUERY_BUDGET_SAMPLE_RATE', '0.01'))
+QUERY_BUDGETS = {
+    # courses
+    'user_dashboard': 7,
+    'course_list': 5,
+    'course_detail': 6,
+    'course_view': 7,
+    'mark_module_complete': 8,
+    'finish_course': 5,
+    'admin_course_list': 4,
+    'admin_course_create': 3,
+    'admin_course_edit': 4,
+    'admin_course_delete': 3,
+    'admin_module_create': 4,
+    'admin_module_edit': 5,
+    'admin_module_delete': 3,
+    'admin_upload_start': 3,
+    'admin_upload_chunk': 5,
+    'admin_analytics': 10,
+    'admin_analytics_timeseries': 3,
+    'export_data_csv': 6,
+    'module_media': 4,
+    'course_video': 3,
+    'module_hls': 5,
+    'course_hls': 3,
+    'admin_module_transcode_status': 3,
+    # payments
+    'enroll_course': 14,
+    'create_order': 3,
+    'verify_payment': 15,
+    'demo_enroll': 3,
+    'payment_success': 3,
+    'payment_failed': 2,
+    'razorpay_webhook': 3,
+    # accounts
+    'admin_login': 2,
+    'admin_dashboard': 4,
+    'user_login': 2,
+    'user_register': 2,
+    'user_logout': 4,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'lms.query_budget': {
+            'handlers': ['console'],
+            'level': os.environ.get('QUERY_BUDGET_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
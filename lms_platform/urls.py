@@ -28,7 +28,9 @@ urlpatterns = [
     path('payments/', include('payments.urls')),
 ]
 
-# Serve media files in development
+# Serve the public media directories in development. Module files, course videos,
+# HLS renditions and partial uploads only go out through courses.media_views.
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    for directory in settings.PUBLIC_MEDIA_DIRS:
+        urlpatterns += static(settings.MEDIA_URL + directory, document_root=settings.MEDIA_ROOT / directory)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
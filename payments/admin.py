@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, PaymentEvent
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -7,3 +7,10 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ('payment_status', 'transaction_date')
     search_fields = ('user__username', 'course__title', 'razorpay_order_id', 'razorpay_payment_id')
     readonly_fields = ('transaction_date', 'updated_at')
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id',)
+    readonly_fields = ('received_at', 'processed_at')
@@ -0,0 +1,234 @@
+"""
+Database-backed queue of gateway events.
+
+The webhook view only verifies the signature and calls enqueue_event(); the
+`process_payment_events` worker claims pending events in batches, applies the
+resulting payment and enrollment state changes and periodically sweeps stale
+pending payments by asking the gateway for the order's payments.
+"""
+import asyncio
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from courses.models import Enrollment
+from courses.services import enroll_user
+from .gateway import GatewayError, get_gateway
+from .models import Payment, PaymentEvent
+
+MAX_ATTEMPTS = 5
+
+# Gateway payment/order status -> our payment_status
+STATUS_MAP = {
+    'captured': 'completed',
+    'paid': 'completed',
+    'failed': 'failed',
+    'refunded': 'refunded',
+}
+
+# Transitions a (possibly late or out-of-order) event may apply
+ALLOWED_TRANSITIONS = {
+    'pending': {'completed', 'failed'},
+    'failed': {'completed'},
+    'completed': {'refunded'},
+    'refunded': set(),
+}
+
+
+def enqueue_event(event_id, event_type, payload):
+    """Store an event once; returns False if the event id was already queued"""
+    try:
+        with transaction.atomic():
+            PaymentEvent.objects.create(event_id=event_id, event_type=event_type, payload=payload)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _claimable(now):
+    # Pending events, and events whose worker's lease ran out (it crashed or was killed)
+    lease_expired = Q(status='processing', claimed_at__lt=now - timedelta(seconds=settings.PAYMENT_EVENT_LEASE_SECONDS))
+    return Q(status='pending') | lease_expired
+
+
+def claim_events(batch_size):
+    """Atomically claim up to batch_size pending or abandoned events for this worker"""
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    # An event that keeps killing its worker would otherwise be re-claimed forever
+    PaymentEvent.objects.filter(_claimable(now), status='processing', attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', locked_by='', claimed_at=None, last_error='Worker lease expired'
+    )
+    ids = list(PaymentEvent.objects.filter(_claimable(now)).order_by('received_at').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    # Rows another worker claimed in the meantime no longer match and are skipped
+    PaymentEvent.objects.filter(_claimable(now), id__in=ids).update(
+        status='processing', locked_by=token, claimed_at=now, attempts=F('attempts') + 1
+    )
+    return list(PaymentEvent.objects.filter(locked_by=token, status='processing'))
+
+
+def _extract_change(event):
+    """Return (order_id, payment_id, new_status) for an event, or None if irrelevant"""
+    payload = event.payload.get('payload', {})
+    payment = payload.get('payment', {}).get('entity', {})
+    order = payload.get('order', {}).get('entity', {})
+
+    if event.event_type == 'refund.processed' or event.event_type == 'payment.refunded':
+        new_status = 'refunded'
+    elif event.event_type == 'order.expired':
+        new_status = 'failed'
+    else:
+        new_status = STATUS_MAP.get(payment.get('status') or order.get('status'))
+    order_id = payment.get('order_id') or order.get('id')
+    if not order_id or not new_status:
+        return None
+    return order_id, payment.get('id'), new_status
+
+
+def apply_events(events):
+    """
+    Apply claimed events in order, each in its own savepoint.
+
+    Returns (payments changed, [(event, exception)] for the events that
+    failed); a failing event is rolled back alone and the rest of the batch
+    still commits.
+    """
+    changed, failures, changes = 0, [], {}
+    for event in events:
+        try:
+            changes[event.id] = _extract_change(event)
+        except Exception as e:
+            # Malformed payload
+            failures.append((event, e))
+    order_ids = {change[0] for change in changes.values() if change}
+
+    with transaction.atomic():
+        payments = {
+            payment.razorpay_order_id: payment
+            for payment in Payment.objects.select_related('user', 'course').filter(razorpay_order_id__in=order_ids)
+        }
+        enrolled = set(Enrollment.objects.filter(
+            user_id__in={payment.user_id for payment in payments.values()},
+            course_id__in={payment.course_id for payment in payments.values()},
+            is_active=True,
+        ).values_list('user_id', 'course_id'))
+
+        for event in events:
+            if event.id not in changes:
+                continue
+            change = changes[event.id]
+            payment = payments.get(change[0]) if change else None
+            try:
+                with transaction.atomic():
+                    if payment is not None and _apply_change(payment, change, enrolled):
+                        changed += 1
+                    # Only if our lease still holds; otherwise the worker that re-claimed it finishes it
+                    PaymentEvent.objects.filter(id=event.id, locked_by=event.locked_by).update(
+                        status='done', processed_at=timezone.now(), locked_by='', claimed_at=None, last_error=''
+                    )
+            except Exception as e:
+                failures.append((event, e))
+                if payment is not None:
+                    # The savepoint undid the row; reload it so later events in the batch start from the stored state
+                    payments[payment.razorpay_order_id] = Payment.objects.select_related('user', 'course').get(pk=payment.pk)
+    return changed, failures
+
+
+def _apply_change(payment, change, enrolled):
+    """Move the payment to the event's status if that transition is allowed; returns whether it moved"""
+    _, payment_id, new_status = change
+    if new_status not in ALLOWED_TRANSITIONS.get(payment.payment_status, set()):
+        return False
+    payment.payment_status = new_status
+    if payment_id:
+        payment.razorpay_payment_id = payment_id
+    # Per-row save keeps the analytics signal receivers in step
+    payment.save()
+    if new_status == 'completed' and (payment.user_id, payment.course_id) not in enrolled:
+        enroll_user(payment.user, payment.course)
+        enrolled.add((payment.user_id, payment.course_id))
+    return True
+
+
+def release_failed(events, error):
+    """Return events to the queue after a failed batch, parking them after MAX_ATTEMPTS"""
+    ids = [event.id for event in events]
+    PaymentEvent.objects.filter(id__in=ids, attempts__lt=MAX_ATTEMPTS).update(
+        status='pending', locked_by='', claimed_at=None, last_error=str(error)
+    )
+    PaymentEvent.objects.filter(id__in=ids, attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', locked_by='', claimed_at=None, last_error=str(error)
+    )
+
+
+def sweep_stale_payments(limit=200, concurrency=10):
+    """
+    Reconcile payments stuck in 'pending' by querying the gateway.
+
+    Orders with a captured or failed payment get a synthetic event queued; orders
+    with no attempt after PAYMENT_PENDING_EXPIRE_HOURS are queued as expired.
+    Every checked payment is stamped with swept_at and skipped for
+    PAYMENT_SWEEP_BACKOFF_MINUTES, so payments the gateway cannot resolve yet
+    (errors, attempts still 'created' or 'authorized') don't hold the first
+    `limit` slots and starve the rest. Oldest unchecked payments go first.
+    Returns the number of events queued.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(minutes=settings.PAYMENT_PENDING_STALE_MINUTES)
+    expire_before = now - timedelta(hours=settings.PAYMENT_PENDING_EXPIRE_HOURS)
+    swept_before = now - timedelta(minutes=settings.PAYMENT_SWEEP_BACKOFF_MINUTES)
+    stale = list(Payment.objects.filter(
+        Q(swept_at__isnull=True) | Q(swept_at__lt=swept_before),
+        payment_status='pending',
+        transaction_date__lt=stale_before,
+        razorpay_order_id__isnull=False,
+    ).order_by(F('swept_at').asc(nulls_first=True), 'transaction_date').values_list(
+        'id', 'razorpay_order_id', 'transaction_date')[:limit])
+    if not stale:
+        return 0
+    Payment.objects.filter(id__in=[pk for pk, _, _ in stale]).update(swept_at=now)
+
+    async def fetch_all():
+        gateway = get_gateway()
+        semaphore = asyncio.Semaphore(concurrency)
+        # One pooled client for the whole sweep
+        await gateway.open()
+
+        async def fetch(order_id):
+            async with semaphore:
+                try:
+                    return order_id, await gateway.fetch_order_payments(order_id)
+                except GatewayError:
+                    return order_id, None
+
+        try:
+            return await asyncio.gather(*(fetch(order_id) for _, order_id, _ in stale))
+        finally:
+            await gateway.close()
+
+    created_at = {order_id: created for _, order_id, created in stale}
+    queued = 0
+    for order_id, attempts in asyncio.run(fetch_all()):
+        if attempts is None:
+            continue
+        statuses = {attempt.get('status') for attempt in attempts}
+        if 'captured' in statuses:
+            attempt = next(a for a in attempts if a.get('status') == 'captured')
+        elif attempts and statuses <= {'failed'}:
+            attempt = attempts[0]
+        elif not attempts and created_at[order_id] < expire_before:
+            queued += enqueue_event(f'sweep:{order_id}:expired', 'order.expired', {
+                'payload': {'order': {'entity': {'id': order_id, 'status': 'expired'}}}
+            })
+            continue
+        else:
+            continue
+        attempt.setdefault('order_id', order_id)
+        queued += enqueue_event(f'sweep:{order_id}:{attempt.get("id")}:{attempt.get("status")}', 'sweep.payment', {
+            'payload': {'payment': {'entity': attempt}}
+        })
+    return queued
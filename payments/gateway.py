@@ -0,0 +1,187 @@
+"""
+Payment gateway abstraction.
+
+Views talk to a PaymentGateway instead of the Razorpay SDK directly. The
+default RazorpayGateway is async: it bounds every call with timeouts and
+retries transient failures with the same idempotency key, so a slow gateway
+never pins a worker thread.
+
+httpx clients are bound to the event loop that created them. Under ASGI the
+lifespan handler opens one pooled, keep-alive client for the server's loop and
+closes it on shutdown; long-running async jobs (the reconciliation sweep) do
+the same for their own loop. Anywhere else, e.g. async_to_sync() under WSGI,
+where every call runs on a fresh loop, each call uses a client of its own
+that is closed when the call returns.
+"""
+import asyncio
+import hashlib
+import hmac
+import random
+import uuid
+from contextlib import asynccontextmanager
+from django.conf import settings
+from django.utils.module_loading import import_string
+import httpx
+
+
+class GatewayError(Exception):
+    """The gateway could not complete the request"""
+
+
+class SignatureVerificationError(GatewayError):
+    """The payment signature does not match"""
+
+
+class PaymentGateway:
+    """Interface every gateway implementation provides"""
+
+    async def create_order(self, amount, currency='INR', idempotency_key=None, notes=None):
+        """Create an order for amount (in paise) and return the gateway's order dict"""
+        raise NotImplementedError
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        """Raise SignatureVerificationError unless the checkout signature is valid"""
+        raise NotImplementedError
+
+    def verify_webhook_signature(self, body, signature):
+        """Raise SignatureVerificationError unless the webhook body signature is valid"""
+        raise NotImplementedError
+
+    async def fetch_order_payments(self, order_id):
+        """Return the list of payment dicts attempted against an order"""
+        raise NotImplementedError
+
+    async def open(self):
+        """Keep pooled connections for the running event loop until close()"""
+
+    async def close(self):
+        pass
+
+
+class RazorpayGateway(PaymentGateway):
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, key_id, key_secret, base_url, timeout=10.0, connect_timeout=3.0,
+                 max_retries=2, max_connections=20, webhook_secret='', backoff=0.2, transport=None):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.webhook_secret = webhook_secret
+        self.base_url = base_url.rstrip('/')
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.transport = transport
+        # The long-lived client opened by open(), and the loop it belongs to
+        self._client = None
+        self._client_loop = None
+
+    def _new_client(self):
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            auth=(self.key_id, self.key_secret),
+            timeout=self.timeout,
+            limits=self.limits,
+            transport=self.transport,
+        )
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._client_loop is loop:
+            return
+        # A client left behind by a loop that has since finished cannot be closed from this one
+        self._client, self._client_loop = self._new_client(), loop
+
+    @asynccontextmanager
+    async def _session(self):
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            yield self._client
+        else:
+            async with self._new_client() as client:
+                yield client
+
+    async def _request(self, method, path, payload=None, idempotency_key=None):
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else {}
+        last_error = None
+        async with self._session() as client:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    # Exponential backoff with jitter: ~0.2s, 0.4s, 0.8s ...
+                    await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+                try:
+                    response = await client.request(method, path, json=payload, headers=headers)
+                except httpx.TransportError as e:
+                    last_error = e
+                    continue
+                if response.status_code in self.RETRY_STATUSES:
+                    last_error = GatewayError(f'Gateway returned {response.status_code}')
+                    continue
+                if response.status_code >= 400:
+                    try:
+                        description = response.json()['error']['description']
+                    except (ValueError, KeyError, TypeError):
+                        description = response.text
+                    raise GatewayError(description)
+                return response.json()
+        raise GatewayError(f'Payment gateway unavailable: {last_error}')
+
+    async def create_order(self, amount, currency='INR', idempotency_key=None, notes=None):
+        idempotency_key = idempotency_key or uuid.uuid4().hex
+        return await self._request('POST', '/orders', {
+            'amount': amount,
+            'currency': currency,
+            'receipt': idempotency_key[:40],
+            'payment_capture': 1,
+            'notes': notes or {},
+        }, idempotency_key)
+
+    async def fetch_order_payments(self, order_id):
+        response = await self._request('GET', f'/orders/{order_id}/payments')
+        return response.get('items', [])
+
+    @staticmethod
+    def _check_signature(secret, message, signature):
+        expected = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+        if not secret or not signature or not hmac.compare_digest(expected, signature):
+            raise SignatureVerificationError('Razorpay signature verification failed')
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        self._check_signature(self.key_secret, f'{order_id}|{payment_id}'.encode(), signature)
+
+    def verify_webhook_signature(self, body, signature):
+        self._check_signature(self.webhook_secret, body, signature)
+
+    async def close(self):
+        client, loop = self._client, self._client_loop
+        self._client = self._client_loop = None
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+
+_gateway = None
+
+
+def get_gateway():
+    """Return the process-wide gateway configured by PAYMENT_GATEWAY"""
+    global _gateway
+    if _gateway is None:
+        gateway_class = import_string(settings.PAYMENT_GATEWAY)
+        _gateway = gateway_class(
+            key_id=settings.RAZORPAY_KEY_ID,
+            key_secret=settings.RAZORPAY_KEY_SECRET,
+            base_url=settings.RAZORPAY_API_BASE,
+            timeout=settings.PAYMENT_GATEWAY_TIMEOUT,
+            connect_timeout=settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT,
+            max_retries=settings.PAYMENT_GATEWAY_MAX_RETRIES,
+            max_connections=settings.PAYMENT_GATEWAY_MAX_CONNECTIONS,
+            webhook_secret=settings.RAZORPAY_WEBHOOK_SECRET,
+        )
+    return _gateway
+
+
+async def close_gateway():
+    global _gateway
+    if _gateway is not None:
+        await _gateway.close()
+        _gateway = None
@@ -0,0 +1,59 @@
+import asyncio
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from payments.gateway import GatewayError
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent create_order calls through the gateway client and report throughput'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--base-url', default='http://127.0.0.1:8765/v1',
+                            help='Gateway URL (defaults to `manage.py fake_gateway`)')
+    
+    def handle(self, *args, **options):
+        gateway = import_string(settings.PAYMENT_GATEWAY)(
+            key_id=settings.RAZORPAY_KEY_ID,
+            key_secret=settings.RAZORPAY_KEY_SECRET,
+            base_url=options['base_url'],
+            timeout=settings.PAYMENT_GATEWAY_TIMEOUT,
+            connect_timeout=settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT,
+            max_retries=settings.PAYMENT_GATEWAY_MAX_RETRIES,
+            max_connections=options['concurrency'],
+        )
+        latencies, failures, elapsed = asyncio.run(self.run(gateway, options['requests'], options['concurrency']))
+        
+        latencies.sort()
+        self.stdout.write(f"{options['requests']} requests, concurrency {options['concurrency']}: "
+                          f"{len(latencies) / elapsed:.1f} orders/s, {failures} failed")
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(f'latency ms: median {statistics.median(latencies):.1f}, '
+                              f'p95 {p95:.1f}, max {latencies[-1]:.1f}')
+    
+    async def run(self, gateway, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+        
+        async def one(index):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await gateway.create_order(49900, idempotency_key=f'bench_{index}')
+                except GatewayError:
+                    failures += 1
+                    return
+                latencies.append((time.perf_counter() - started) * 1000)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        await gateway.close()
+        return latencies, failures, elapsed
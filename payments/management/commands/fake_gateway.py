@@ -0,0 +1,100 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+from django.core.management.base import BaseCommand
+
+
+class FakeGatewayServer:
+    """Minimal keep-alive HTTP/1.1 server mimicking Razorpay's POST /orders"""
+    
+    def __init__(self, latency_ms=0, fail_rate=0.0):
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.orders_by_key = {}
+        self.requests = 0
+    
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                
+                status, payload = await self.respond(method, path, headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                    f'Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n'.encode() + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def respond(self, method, path, headers, body):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == 'GET' and path.rstrip('/').endswith('/payments'):
+            # No checkout attempts: lets the reconciliation sweep exercise its expiry path
+            return '200 OK', {'entity': 'collection', 'count': 0, 'items': []}
+        if method != 'POST' or not path.rstrip('/').endswith('/orders'):
+            return '404 Not Found', {'error': {'description': 'Not found'}}
+        if random.random() < self.fail_rate:
+            return '503 Service Unavailable', {'error': {'description': 'Injected failure'}}
+        
+        # Same idempotency key -> same order, like a real gateway replaying a retried request
+        key = headers.get('idempotency-key') or uuid.uuid4().hex
+        if key not in self.orders_by_key:
+            data = json.loads(body or b'{}')
+            self.orders_by_key[key] = {
+                'id': f'order_fake{uuid.uuid4().hex[:14]}',
+                'entity': 'order',
+                'amount': data.get('amount'),
+                'currency': data.get('currency', 'INR'),
+                'receipt': data.get('receipt'),
+                'status': 'created',
+                'created_at': int(time.time()),
+            }
+        return '200 OK', self.orders_by_key[key]
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake Razorpay order API for offline load testing'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=int, default=50, help='Simulated gateway latency')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    
+    def handle(self, *args, **options):
+        server = FakeGatewayServer(options['latency_ms'], options['fail_rate'])
+        
+        async def serve():
+            listener = await asyncio.start_server(server.handle, options['host'], options['port'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Fake gateway on http://{options['host']}:{options['port']}/v1 "
+                f"(set RAZORPAY_API_BASE to this URL)"
+            ))
+            async with listener:
+                await listener.serve_forever()
+        
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            self.stdout.write(f'Served {server.requests} request(s)')
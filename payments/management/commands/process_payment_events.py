@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand
+from payments import events
+
+
+class Command(BaseCommand):
+    help = 'Drain the queued payment events and periodically reconcile stale pending payments'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--sweep-interval', type=float, default=300.0,
+                            help='Seconds between stale pending payment sweeps (0 disables)')
+    
+    def handle(self, *args, **options):
+        last_sweep = 0.0
+        while True:
+            if options['sweep_interval'] and time.monotonic() - last_sweep >= options['sweep_interval']:
+                queued = events.sweep_stale_payments()
+                last_sweep = time.monotonic()
+                if queued:
+                    self.stdout.write(f'Sweep queued {queued} reconciliation event(s)')
+            
+            drained = self.drain(options['batch_size'])
+            if options['once']:
+                return
+            if not drained:
+                time.sleep(options['poll_interval'])
+    
+    def drain(self, batch_size):
+        total = 0
+        while True:
+            batch = events.claim_events(batch_size)
+            if not batch:
+                return total
+            try:
+                changed, failures = events.apply_events(batch)
+            except Exception as e:
+                events.release_failed(batch, e)
+                self.stderr.write(self.style.ERROR(f'Batch of {len(batch)} event(s) failed: {e}'))
+                return total
+            for event, error in failures:
+                events.release_failed([event], error)
+                self.stderr.write(self.style.ERROR(f'Event {event.event_id} failed: {error}'))
+            total += len(batch)
+            self.stdout.write(f'Processed {len(batch)} event(s), {changed} payment(s) updated')
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='swept_at',
+            field=models.DateTimeField(blank=True, help_text='Last reconciliation sweep that checked this payment', null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentevent',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text="Start of the worker's lease while processing", null=True),
+        ),
+    ]
@@ -16,7 +16,7 @@ class Payment(models.Model):
     currency = models.CharField(max_length=3, default='INR')
     
     # Razorpay fields
-    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)
+    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
     razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
     razorpay_signature = models.CharField(max_length=255, blank=True, null=True)
     
@@ -24,9 +24,56 @@ class Payment(models.Model):
     transaction_date = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True)
+    swept_at = models.DateTimeField(blank=True, null=True, help_text="Last reconciliation sweep that checked this payment")
     
     class Meta:
         ordering = ['-transaction_date']
+        indexes = [
+            models.Index(fields=['payment_status', 'transaction_date'], name='payment_status_date_idx'),
+            models.Index(fields=['-transaction_date'], name='payment_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.course.title} - {self.amount}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so signal receivers can detect transitions
+        instance._loaded_payment_status = dict(zip(field_names, values)).get('payment_status')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_payment_status = self.payment_status
+
+
+class PaymentEvent(models.Model):
+    """Queued gateway event (webhook or reconciliation sweep) awaiting a worker"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    event_id = models.CharField(max_length=100, unique=True, help_text="Gateway event id, used to drop duplicates")
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    locked_by = models.CharField(max_length=64, blank=True)
+    claimed_at = models.DateTimeField(blank=True, null=True, help_text="Start of the worker's lease while processing")
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at'], name='payment_event_status_idx'),
+            models.Index(fields=['locked_by'], name='payment_event_locked_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id}) - {self.status}"
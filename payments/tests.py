@@ -1,3 +1,289 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-# Create your tests here.
+from accounts.models import User
+from analytics.models import DailyRollup
+from analytics.services import get_snapshot, refresh_snapshot
+from courses.models import Course, Enrollment
+from lms_platform.query_budget import QueryBudgetTestMixin
+from . import events, gateway, urls
+from .gateway import GatewayError, RazorpayGateway
+from .models import Payment, PaymentEvent
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        cls.student = User.objects.create_user('student', password='x')
+        cls.free_course = Course.objects.create(title='Python', description='Basics', created_by=cls.admin)
+        cls.paid_course = Course.objects.create(
+            title='Django', description='Web', created_by=cls.admin, course_type='paid', price=499
+        )
+
+    def test_every_url_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            self.assertIn(pattern.name, settings.QUERY_BUDGETS)
+
+    def test_payment_views(self):
+        self.client.force_login(self.student)
+        paid_id = self.paid_course.id
+        self.assertWithinBudget('enroll_course', 'get', f'/payments/enroll/{paid_id}/')
+        self.assertWithinBudget('enroll_course', 'get', f'/payments/enroll/{self.free_course.id}/')
+        self.assertWithinBudget('create_order', 'get', f'/payments/create-order/{paid_id}/')
+        self.assertWithinBudget('verify_payment', 'get', '/payments/verify-payment/')
+        self.assertWithinBudget('payment_success', 'get', f'/payments/success/{paid_id}/')
+        self.assertWithinBudget('payment_failed', 'get', '/payments/failed/')
+        self.assertWithinBudget('demo_enroll', 'post', f'/payments/demo-enroll/{paid_id}/')
+
+    def test_webhook_rejects_unsigned_body_without_queries(self):
+        response = self.assertWithinBudget('razorpay_webhook', 'post', '/payments/webhook/razorpay/',
+                                           data='{}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(RAZORPAY_WEBHOOK_SECRET='whsec_test')
+    def test_webhook_rejects_signed_body_that_is_not_an_object(self):
+        gateway._gateway = None
+        self.addCleanup(setattr, gateway, '_gateway', None)
+        for body in (b'[]', b'"payment.captured"', b'null'):
+            signature = hmac.new(b'whsec_test', body, hashlib.sha256).hexdigest()
+            response = self.assertWithinBudget('razorpay_webhook', 'post', '/payments/webhook/razorpay/', data=body,
+                                               content_type='application/json',
+                                               headers={'X-Razorpay-Signature': signature})
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+
+class StubGateway:
+    def __init__(self, attempts):
+        self.attempts = attempts
+        self.fetched = []
+
+    async def fetch_order_payments(self, order_id):
+        self.fetched.append(order_id)
+        return self.attempts.get(order_id, [])
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def payment_event(event_id, order_id, status, payment_id='pay_1'):
+    return events.enqueue_event(event_id, f'payment.{status}', {
+        'payload': {'payment': {'entity': {'id': payment_id, 'order_id': order_id, 'status': status}}}
+    })
+
+
+class PaymentEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        cls.student = User.objects.create_user('student', password='x')
+        cls.course = Course.objects.create(
+            title='Django', description='Web', created_by=cls.admin, course_type='paid', price=499
+        )
+
+    def create_payment(self, order_id, status='pending', course=None):
+        return Payment.objects.create(user=self.student, course=course or self.course, amount=499,
+                                      razorpay_order_id=order_id, payment_status=status)
+
+    def test_duplicate_event_is_dropped(self):
+        self.assertTrue(payment_event('evt_1', 'order_1', 'captured'))
+        self.assertFalse(payment_event('evt_1', 'order_1', 'captured'))
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+
+    def test_claims_do_not_overlap(self):
+        for i in range(3):
+            payment_event(f'evt_{i}', f'order_{i}', 'captured')
+        first = events.claim_events(2)
+        second = events.claim_events(2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({e.id for e in first} & {e.id for e in second})
+        self.assertEqual(events.claim_events(2), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        payment_event('evt_1', 'order_1', 'captured')
+        [event] = events.claim_events(10)
+        self.assertEqual(events.claim_events(10), [])
+        lease = timedelta(seconds=settings.PAYMENT_EVENT_LEASE_SECONDS + 1)
+        PaymentEvent.objects.filter(id=event.id).update(claimed_at=timezone.now() - lease)
+        [reclaimed] = events.claim_events(10)
+        self.assertEqual(reclaimed.id, event.id)
+        self.assertNotEqual(reclaimed.locked_by, event.locked_by)
+        self.assertEqual(reclaimed.attempts, 2)
+        # The first worker finishing late leaves the event to the worker that holds the lease now
+        self.create_payment('order_1')
+        events.apply_events([event])
+        self.assertEqual(PaymentEvent.objects.get(id=event.id).status, 'processing')
+        events.apply_events([reclaimed])
+        self.assertEqual(PaymentEvent.objects.get(id=event.id).status, 'done')
+
+    def test_expired_lease_after_max_attempts_fails_the_event(self):
+        payment_event('evt_1', 'order_1', 'captured')
+        stale = timezone.now() - timedelta(seconds=settings.PAYMENT_EVENT_LEASE_SECONDS + 1)
+        PaymentEvent.objects.update(status='processing', locked_by='dead', claimed_at=stale,
+                                    attempts=events.MAX_ATTEMPTS)
+        self.assertEqual(events.claim_events(10), [])
+        self.assertEqual(PaymentEvent.objects.get().status, 'failed')
+
+    def test_captured_payment_completes_and_enrolls(self):
+        payment = self.create_payment('order_1')
+        payment_event('evt_1', 'order_1', 'captured', payment_id='pay_9')
+        changed, failures = events.apply_events(events.claim_events(10))
+        self.assertEqual((changed, failures), (1, []))
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'completed')
+        self.assertEqual(payment.razorpay_payment_id, 'pay_9')
+        self.assertTrue(Enrollment.objects.filter(user=self.student, course=self.course, is_active=True).exists())
+        event = PaymentEvent.objects.get()
+        self.assertEqual((event.status, event.locked_by, event.claimed_at), ('done', '', None))
+
+    def test_disallowed_transition_is_ignored(self):
+        payment = self.create_payment('order_1', status='refunded')
+        payment_event('evt_1', 'order_1', 'captured')
+        changed, failures = events.apply_events(events.claim_events(10))
+        self.assertEqual((changed, failures), (0, []))
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'refunded')
+        self.assertEqual(PaymentEvent.objects.get().status, 'done')
+
+    def test_failing_event_does_not_fail_the_batch(self):
+        self.create_payment('order_1')
+        payment_event('evt_1', 'order_1', 'captured')
+        events.enqueue_event('evt_bad', 'payment.captured', {'payload': 'not an object'})
+        self.create_payment('order_2')
+        payment_event('evt_2', 'order_2', 'failed')
+        changed, failures = events.apply_events(events.claim_events(10))
+        self.assertEqual(changed, 2)
+        self.assertEqual([event.event_id for event, _ in failures], ['evt_bad'])
+        statuses = dict(PaymentEvent.objects.values_list('event_id', 'status'))
+        self.assertEqual(statuses, {'evt_1': 'done', 'evt_bad': 'processing', 'evt_2': 'done'})
+        events.release_failed([failures[0][0]], failures[0][1])
+        self.assertEqual(PaymentEvent.objects.get(event_id='evt_bad').status, 'pending')
+
+    def test_sweep_checks_oldest_first_and_backs_off(self):
+        stale = timezone.now() - timedelta(minutes=settings.PAYMENT_PENDING_STALE_MINUTES + 5)
+        for i in range(3):
+            self.create_payment(f'order_{i}')
+            Payment.objects.filter(razorpay_order_id=f'order_{i}').update(
+                transaction_date=stale - timedelta(minutes=i))
+        self.create_payment('order_new')
+        stub = StubGateway({'order_1': [{'id': 'pay_1', 'status': 'captured'}]})
+        gateway._gateway = stub
+        self.addCleanup(setattr, gateway, '_gateway', None)
+
+        self.assertEqual(events.sweep_stale_payments(limit=2), 1)
+        self.assertEqual(stub.fetched, ['order_2', 'order_1'])
+        # Payments just checked wait out the backoff, so the next sweep reaches the rest
+        events.sweep_stale_payments(limit=2)
+        self.assertEqual(stub.fetched[2:], ['order_0'])
+        events.sweep_stale_payments(limit=2)
+        self.assertEqual(len(stub.fetched), 3)
+        self.assertTrue(PaymentEvent.objects.filter(event_id='sweep:order_1:pay_1:captured').exists())
+
+
+class PaymentAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        cls.student = User.objects.create_user('student', password='x')
+        cls.course = Course.objects.create(
+            title='Django', description='Web', created_by=cls.admin, course_type='paid', price=499
+        )
+
+    def totals(self):
+        rollup = DailyRollup.objects.filter(course=self.course).aggregate(revenue=Sum('revenue'), refunds=Sum('refunds'))
+        return get_snapshot().total_revenue, rollup['revenue'] or 0, rollup['refunds'] or 0
+
+    def test_refund_of_pending_payment_is_recorded(self):
+        payment = Payment.objects.create(user=self.student, course=self.course, amount=499)
+        payment.payment_status = 'refunded'
+        payment.save()
+        self.assertEqual(self.totals(), (0, 0, 499))
+
+    def test_deleting_payments_reverses_their_totals(self):
+        completed = Payment.objects.create(user=self.student, course=self.course, amount=499,
+                                           payment_status='completed')
+        refunded = Payment.objects.create(user=self.student, course=self.course, amount=299,
+                                          payment_status='completed')
+        refunded.payment_status = 'refunded'
+        refunded.save()
+        self.assertEqual(self.totals(), (499, 499, 299))
+        Payment.objects.get(pk=completed.pk).delete()
+        Payment.objects.get(pk=refunded.pk).delete()
+        self.assertEqual(self.totals(), (0, 0, 0))
+        self.assertEqual(self.totals()[0], refresh_snapshot().total_revenue)
+
+
+class RazorpayGatewayTests(TestCase):
+    def gateway(self, handler, max_retries=2):
+        return RazorpayGateway('key', 'secret', 'https://gateway.test/v1', max_retries=max_retries,
+                               backoff=0, transport=httpx.MockTransport(handler))
+
+    def test_retries_reuse_the_idempotency_key(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if len(requests) < 3:
+                return httpx.Response(503)
+            return httpx.Response(200, json={'id': 'order_1'})
+
+        order = async_to_sync(self.gateway(handler).create_order)(49900, idempotency_key='key-1')
+        self.assertEqual(order, {'id': 'order_1'})
+        self.assertEqual([request.headers['Idempotency-Key'] for request in requests], ['key-1'] * 3)
+        self.assertEqual(json.loads(requests[0].content)['amount'], 49900)
+
+    def test_timeout_is_a_gateway_error(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ReadTimeout('timed out', request=request)
+
+        with self.assertRaisesMessage(GatewayError, 'Payment gateway unavailable'):
+            async_to_sync(self.gateway(handler).fetch_order_payments)('order_1')
+        self.assertEqual(len(calls), 3)
+
+    def test_client_errors_are_not_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(400, json={'error': {'description': 'Invalid amount'}})
+
+        with self.assertRaisesMessage(GatewayError, 'Invalid amount'):
+            async_to_sync(self.gateway(handler).create_order)(0)
+        self.assertEqual(len(calls), 1)
+
+    def test_clients_do_not_outlive_their_loop(self):
+        gateway = self.gateway(lambda request: httpx.Response(200, json={'items': []}))
+        # Each async_to_sync call runs on a loop of its own, as under WSGI
+        for _ in range(3):
+            self.assertEqual(async_to_sync(gateway.fetch_order_payments)('order_1'), [])
+        self.assertIsNone(gateway._client)
+
+        async def on_one_loop():
+            await gateway.open()
+            client = gateway._client
+            await gateway.fetch_order_payments('order_1')
+            await gateway.fetch_order_payments('order_2')
+            self.assertIs(gateway._client, client)
+            await gateway.close()
+            return client
+
+        client = asyncio.run(on_one_loop())
+        self.assertTrue(client.is_closed)
+        self.assertIsNone(gateway._client)
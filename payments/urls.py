@@ -8,4 +8,5 @@ urlpatterns = [
     path('demo-enroll/<int:course_id>/', views.demo_enroll, name='demo_enroll'),
     path('success/<int:course_id>/', views.payment_success, name='payment_success'),
     path('failed/', views.payment_failed, name='payment_failed'),
+    path('webhook/razorpay/', views.razorpay_webhook, name='razorpay_webhook'),
 ]
@@ -1,16 +1,17 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from courses.models import Course, Enrollment
+from courses.services import enroll_user
 from .models import Payment
-import razorpay
+from .gateway import get_gateway, GatewayError, SignatureVerificationError
+from .events import enqueue_event
 import json
-
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+import uuid
 
 @login_required
 def enroll_course(request, course_id):
@@ -30,10 +31,7 @@ def enroll_course(request, course_id):
     # If free course, enroll directly (handle both GET and POST)
     if course.is_free:
         if request.method == 'POST' or request.method == 'GET':
-            enrollment = Enrollment.objects.create(
-                user=request.user,
-                course=course
-            )
+            enroll_user(request.user, course)
             messages.success(request, 'Successfully enrolled in the course!')
             return redirect('course_view', course_id=course.id)
     
@@ -46,50 +44,51 @@ def enroll_course(request, course_id):
     return render(request, 'payments/enroll_course.html', context)
 
 @login_required
-def create_order(request, course_id):
+async def create_order(request, course_id):
     if request.method == 'POST':
-        course = get_object_or_404(Course, id=course_id, is_active=True)
+        course = await aget_object_or_404(Course, id=course_id, is_active=True)
+        user = await request.auser()
         
         # Check if already enrolled
-        existing_enrollment = Enrollment.objects.filter(
-            user=request.user,
+        already_enrolled = await Enrollment.objects.filter(
+            user=user,
             course=course,
             is_active=True
-        ).first()
+        ).aexists()
         
-        if existing_enrollment:
+        if already_enrolled:
             return JsonResponse({'success': False, 'message': 'Already enrolled'})
         
         # Create Razorpay order
         amount = int(course.price * 100)  # Convert to paise
         
-        # Use real Razorpay integration
+        # Non-blocking gateway call; retries reuse the same idempotency key
         try:
-            razorpay_order = razorpay_client.order.create({
-                'amount': amount,
-                'currency': 'INR',
-                'payment_capture': 1
-            })
-            
-            # Create payment record
-            payment = Payment.objects.create(
-                user=request.user,
-                course=course,
-                amount=course.price,
-                razorpay_order_id=razorpay_order['id'],
-                payment_status='pending'
+            razorpay_order = await get_gateway().create_order(
+                amount,
+                currency='INR',
+                idempotency_key=f'order_{user.id}_{course.id}_{uuid.uuid4().hex[:16]}',
+                notes={'user_id': str(user.id), 'course_id': str(course.id)},
             )
-            
-            return JsonResponse({
-                'success': True,
-                'order_id': razorpay_order['id'],
-                'amount': amount,
-                'currency': 'INR',
-                'key_id': settings.RAZORPAY_KEY_ID,
-            })
-        
-        except Exception as e:
+        except GatewayError as e:
             return JsonResponse({'success': False, 'message': str(e)})
+        
+        # Create payment record
+        await Payment.objects.acreate(
+            user=user,
+            course=course,
+            amount=course.price,
+            razorpay_order_id=razorpay_order['id'],
+            payment_status='pending'
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'order_id': razorpay_order['id'],
+            'amount': amount,
+            'currency': 'INR',
+            'key_id': settings.RAZORPAY_KEY_ID,
+        })
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
 
@@ -105,27 +104,20 @@ def verify_payment(request):
             razorpay_signature = data.get('razorpay_signature')
             
             # Verify signature
-            params_dict = {
-                'razorpay_order_id': razorpay_order_id,
-                'razorpay_payment_id': razorpay_payment_id,
-                'razorpay_signature': razorpay_signature
-            }
-            
             try:
-                razorpay_client.utility.verify_payment_signature(params_dict)
+                get_gateway().verify_payment_signature(
+                    razorpay_order_id, razorpay_payment_id, razorpay_signature
+                )
                 
                 # Update payment record
-                payment = Payment.objects.get(razorpay_order_id=razorpay_order_id)
+                payment = Payment.objects.select_related('course').get(razorpay_order_id=razorpay_order_id)
                 payment.razorpay_payment_id = razorpay_payment_id
                 payment.razorpay_signature = razorpay_signature
                 payment.payment_status = 'completed'
                 payment.save()
                 
-                # Create enrollment
-                enrollment = Enrollment.objects.create(
-                    user=request.user,
-                    course=payment.course
-                )
+                # Create enrollment (no-op if a retried callback already did)
+                enroll_user(request.user, payment.course)
                 
                 return JsonResponse({
                     'success': True,
@@ -133,7 +125,7 @@ def verify_payment(request):
                     'course_id': payment.course.id
                 })
             
-            except razorpay.errors.SignatureVerificationError:
+            except SignatureVerificationError:
                 # Update payment as failed
                 payment = Payment.objects.get(razorpay_order_id=razorpay_order_id)
                 payment.payment_status = 'failed'
@@ -192,10 +184,7 @@ def demo_enroll(request, course_id):
             payment.save()
             
             # Create enrollment
-            enrollment = Enrollment.objects.create(
-                user=request.user,
-                course=payment.course
-            )
+            enroll_user(request.user, payment.course)
             
             return JsonResponse({
                 'success': True,
@@ -207,3 +196,26 @@ def demo_enroll(request, course_id):
             return JsonResponse({'success': False, 'message': str(e)})
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
+
+@csrf_exempt
+@require_POST
+def razorpay_webhook(request):
+    """Verify and enqueue a Razorpay webhook; `process_payment_events` applies it"""
+    try:
+        get_gateway().verify_webhook_signature(request.body, request.headers.get('X-Razorpay-Signature'))
+    except SignatureVerificationError:
+        return HttpResponse('Invalid signature', status=400)
+    
+    try:
+        event = json.loads(request.body)
+    except ValueError:
+        return HttpResponse('Invalid payload', status=400)
+    if not isinstance(event, dict):
+        return HttpResponse('Invalid payload', status=400)
+    
+    # Razorpay retries deliveries with the same event id; duplicates are dropped on insert
+    event_id = request.headers.get('X-Razorpay-Event-Id') or event.get('id')
+    if not event_id:
+        return HttpResponse('Missing event id', status=400)
+    enqueue_event(event_id, event.get('event', ''), event)
+    return HttpResponse(status=200)